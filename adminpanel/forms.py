@@ -2,7 +2,8 @@ from django import forms
 from django.forms import formset_factory
 
 from billing.models import PaymentDetails, PaymentItems
-from core.models import House
+from core.models import Floor, Flat, House, Section
+from support.models import Message
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -25,6 +26,9 @@ class HouseForm(forms.ModelForm):
 
 # ---- Вкладка «Секции»
 class SectionItemForm(forms.Form):
+    # id существующей секции: по нему сохранение узнаёт, что переименовано,
+    # а что удалено (core.structure.apply_house_structure)
+    id = forms.IntegerField(required=False, widget=forms.HiddenInput)
     name = forms.CharField(
         label="Название",
         max_length=255,
@@ -188,3 +192,95 @@ class PaymentItemForm(forms.ModelForm):
                 attrs={"class": "form-select"},
             ),
         }
+
+
+TARGET_LABELS = {
+    "section": lambda s: s.section_name,
+    "floor": lambda f: f"{f.section.section_name}, этаж {f.number}",
+    "flat": lambda f: f"кв. {f.number_flat} (этаж {f.floor.number})",
+}
+
+
+def message_targets(house_id):
+    """Секции, этажи и квартиры дома для адресации сообщения."""
+    if house_id is None:
+        return Section.objects.none(), Floor.objects.none(), Flat.objects.none()
+    return (
+        Section.objects.filter(house_id=house_id).order_by("id"),
+        Floor.objects.filter(section__house_id=house_id)
+        .select_related("section")
+        .order_by("section_id", "number"),
+        Flat.objects.filter(floor__section__house_id=house_id)
+        .select_related("floor__section")
+        .order_by("floor__section_id", "floor__number", "id"),
+    )
+
+
+class MessageForm(forms.ModelForm):
+    class Meta:
+        model = Message
+        fields = [
+            "Subject",
+            "Body",
+            "house",
+            "section",
+            "floor",
+            "flat",
+            "only_debtors",
+        ]
+        labels = {
+            "Subject": "Тема",
+            "Body": "Текст",
+            "house": "Дом",
+            "section": "Секция",
+            "floor": "Этаж",
+            "flat": "Квартира",
+            "only_debtors": "Только должникам",
+        }
+        widgets = {
+            "Subject": forms.TextInput(attrs={"class": "form-control"}),
+            "Body": forms.Textarea(attrs={"class": "form-control", "rows": 6}),
+            "house": forms.Select(attrs={"class": "form-select"}),
+            "section": forms.Select(attrs={"class": "form-select"}),
+            "floor": forms.Select(attrs={"class": "form-select"}),
+            "flat": forms.Select(attrs={"class": "form-select"}),
+            "only_debtors": forms.CheckboxInput(attrs={"class": "form-check-input"}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # в списках только секции/этажи/квартиры выбранного дома — в больших
+        # домах полный список давал бы десятки тысяч <option>
+        sections, floors, flats = message_targets(self._house_id())
+        self.fields["section"].queryset = sections
+        self.fields["floor"].queryset = floors
+        self.fields["flat"].queryset = flats
+        for name, label in TARGET_LABELS.items():
+            self.fields[name].label_from_instance = label
+
+    def _house_id(self):
+        if self.is_bound:
+            value = self.data.get(self.add_prefix("house"))
+        else:
+            value = self.initial.get("house") or self.instance.house_id
+        value = getattr(value, "pk", value)
+        return int(value) if str(value or "").isdigit() else None
+
+    def clean(self):
+        data = super().clean()
+        # каждое уточнение адресата должно лежать внутри предыдущих
+        house, section = data.get("house"), data.get("section")
+        floor, flat = data.get("floor"), data.get("flat")
+        if section and house and section.house_id != house.pk:
+            self.add_error("section", "Секция не из выбранного дома.")
+        if floor and house and floor.section.house_id != house.pk:
+            self.add_error("floor", "Этаж не из выбранного дома.")
+        elif floor and section and floor.section_id != section.pk:
+            self.add_error("floor", "Этаж не из выбранной секции.")
+        if flat and house and flat.floor.section.house_id != house.pk:
+            self.add_error("flat", "Квартира не из выбранного дома.")
+        elif flat and section and flat.floor.section_id != section.pk:
+            self.add_error("flat", "Квартира не из выбранной секции.")
+        elif flat and floor and flat.floor_id != floor.pk:
+            self.add_error("flat", "Квартира не с выбранного этажа.")
+        return data
@@ -0,0 +1,78 @@
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from billing import cashbox
+from billing.models import Debtor, PersonalAccount
+from core import background
+from core.models import Flat, House
+from support.models import MasterRequest
+
+# Снимок показателей дашборда: считается целиком в фоне или командой
+# refresh_dashboard и отдаётся из общего кэша (CACHES, Redis) — снимок,
+# записанный командой, видят все веб-воркеры; страница не трогает большие таблицы.
+SNAPSHOT_KEY = "adminpanel:dashboard:snapshot"
+LOCK_KEY = "adminpanel:dashboard:refreshing"
+LOCK_TIMEOUT = 10 * 60
+MONTHS = 12
+
+
+def _max_age():
+    return getattr(settings, "DASHBOARD_MAX_AGE", 5 * 60)
+
+
+def compute_snapshot():
+    today = timezone.localdate()
+    # первое число месяца, с которого начинаются последние MONTHS месяцев
+    year, month = divmod(today.year * 12 + today.month - MONTHS, 12)
+    first_month = date(year, month + 1, 1)
+    debt = Debtor.objects.aggregate(total=Sum("amount"), count=Count("pk"))
+    return {
+        "computed_at": timezone.now(),
+        "houses": House.objects.count(),
+        "flats": Flat.objects.count(),
+        "accounts": PersonalAccount.objects.count(),
+        "active_accounts": PersonalAccount.objects.filter(status=True).count(),
+        "debtors": debt["count"],
+        "total_debt": debt["total"] or 0,
+        "cash_balance": cashbox.cash_balance(),
+        "monthly": cashbox.monthly(first_month, today),
+        "open_requests": MasterRequest.objects.exclude(
+            status__in=MasterRequest.CLOSED_STATUSES
+        ).count(),
+    }
+
+
+def refresh():
+    """Пересчитать снимок и положить в кэш (без срока — его заменяет новый)."""
+    started = time.monotonic()
+    snapshot = compute_snapshot()
+    snapshot["compute_seconds"] = round(time.monotonic() - started, 3)
+    cache.set(SNAPSHOT_KEY, snapshot, None)
+    return snapshot
+
+
+def _refresh_in_background():
+    try:
+        refresh()
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def get_snapshot():
+    """Снимок из кэша; устаревший отдаётся сразу, а пересчёт уходит в фон.
+
+    Синхронно считается только самый первый снимок (пустой кэш).
+    """
+    snapshot = cache.get(SNAPSHOT_KEY)
+    if snapshot is None:
+        return refresh()
+    age = (timezone.now() - snapshot["computed_at"]).total_seconds()
+    # cache.add — чтобы пересчёт запускал только один запрос
+    if age > _max_age() and cache.add(LOCK_KEY, True, LOCK_TIMEOUT):
+        background.submit(_refresh_in_background)
+    return snapshot
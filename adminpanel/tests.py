@@ -1 +1,187 @@
-# Create your tests here.
+from datetime import timedelta
+from importlib import import_module
+from unittest import mock
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from adminpanel import metrics
+from core import permissions
+from core.models import House, Permission, Role, Section, User
+
+
+# ---------- Доступ к разделам админки по правам роли
+class SectionAccessTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.role = Role.objects.create(name="Бухгалтер")
+        cls.user = User.objects.create(username="accountant", role=cls.role)
+        cls.url = reverse("adminpanel:payment_items_list")
+
+    def setUp(self):
+        permissions.invalidate()
+
+    def test_anonymous_is_refused(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_role_without_permission_is_refused(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.assertEqual(
+            self.client.get(reverse("adminpanel:cashdesk")).status_code, 403
+        )
+
+    def test_role_with_permission_is_allowed(self):
+        self.role.permissions.add(Permission.objects.get(code="payment_items"))
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        # право на один раздел не открывает остальные
+        self.assertEqual(
+            self.client.get(reverse("adminpanel:user_list")).status_code, 403
+        )
+
+    def test_existing_roles_keep_access_after_migration(self):
+        migration = import_module("core.migrations.0010_adminpanel_permissions")
+        migration.delete_permissions(apps, None)
+        migration.create_permissions(apps, None)
+        codes = set(self.role.permissions.values_list("code", flat=True))
+        self.assertEqual(codes, set(migration.SECTIONS))
+
+
+# ---------- Матрица ролей
+class RoleMatrixTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username="admin", is_superuser=True)
+        cls.roles = [Role.objects.create(name=f"Роль {i}") for i in range(3)]
+        cls.perms = list(Permission.objects.order_by("id")[:3])
+        cls.url = reverse("adminpanel:role_matrix")
+
+    def setUp(self):
+        permissions.invalidate()
+        self.client.force_login(self.admin)
+
+    def pairs(self):
+        through = Role.permissions.through.objects.filter(role__in=self.roles)
+        return set(through.values_list("role_id", "permission_id"))
+
+    def post(self, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, data)
+
+    def test_saves_diff_against_current_matrix(self):
+        first, second, third = self.roles
+        first.permissions.add(self.perms[0], self.perms[1])
+        third.permissions.add(self.perms[2])
+
+        response = self.post(
+            {
+                f"perm_{first.pk}": [self.perms[1].pk],
+                f"perm_{second.pk}": [self.perms[0].pk, self.perms[2].pk],
+            }
+        )
+
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+        self.assertEqual(
+            self.pairs(),
+            {
+                (first.pk, self.perms[1].pk),
+                (second.pk, self.perms[0].pk),
+                (second.pk, self.perms[2].pk),
+            },
+        )
+
+    def test_ignores_unknown_roles_and_permissions(self):
+        role = self.roles[0]
+        self.post(
+            {
+                f"perm_{role.pk}": [self.perms[0].pk, 999999, "x"],
+                "perm_999999": [self.perms[1].pk],
+                "perm_x": [self.perms[1].pk],
+            }
+        )
+        self.assertEqual(self.pairs(), {(role.pk, self.perms[0].pk)})
+
+    def test_invalidates_cached_role_permissions(self):
+        role = self.roles[0]
+        self.assertEqual(permissions.role_permissions(role.pk), frozenset())
+        self.post({f"perm_{role.pk}": [self.perms[0].pk]})
+        self.assertEqual(permissions.role_permissions(role.pk), {self.perms[0].code})
+
+    def test_query_count_does_not_depend_on_matrix_size(self):
+        def count_queries(data):
+            with CaptureQueriesContext(connection) as ctx:
+                self.post(data)
+            return len(ctx)
+
+        small = count_queries({f"perm_{self.roles[0].pk}": [self.perms[0].pk]})
+        large = count_queries(
+            {f"perm_{role.pk}": [perm.pk for perm in self.perms] for role in self.roles}
+        )
+        self.assertEqual(small, large)
+
+
+# ---------- Снимок показателей дашборда
+class DashboardSnapshotTests(TestCase):
+    def setUp(self):
+        cache.delete_many([metrics.SNAPSHOT_KEY, metrics.LOCK_KEY])
+        patcher = mock.patch.object(metrics.background, "submit")
+        self.submit = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def age(self, seconds):
+        snapshot = cache.get(metrics.SNAPSHOT_KEY)
+        snapshot["computed_at"] = timezone.now() - timedelta(seconds=seconds)
+        cache.set(metrics.SNAPSHOT_KEY, snapshot, None)
+        return snapshot
+
+    def test_first_snapshot_is_computed_synchronously(self):
+        House.objects.create(house_name="Дом", address="ул. 1")
+        snapshot = metrics.get_snapshot()
+        self.assertEqual(snapshot["houses"], 1)
+        self.assertEqual(cache.get(metrics.SNAPSHOT_KEY)["houses"], 1)
+        self.submit.assert_not_called()
+
+    def test_fresh_snapshot_is_served_from_cache(self):
+        metrics.get_snapshot()
+        House.objects.create(house_name="Дом", address="ул. 1")
+        with self.assertNumQueries(0):
+            self.assertEqual(metrics.get_snapshot()["houses"], 0)
+        self.submit.assert_not_called()
+
+    @override_settings(DASHBOARD_MAX_AGE=60)
+    def test_stale_snapshot_is_served_while_one_refresh_runs(self):
+        metrics.get_snapshot()
+        House.objects.create(house_name="Дом", address="ул. 1")
+        stale = self.age(120)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(metrics.get_snapshot(), stale)
+            self.assertEqual(metrics.get_snapshot(), stale)
+        # пересчёт запущен один раз, второй запрос упёрся в блокировку
+        self.submit.assert_called_once_with(metrics._refresh_in_background)
+
+        metrics._refresh_in_background()
+        self.assertEqual(metrics.get_snapshot()["houses"], 1)
+        self.assertIsNone(cache.get(metrics.LOCK_KEY))
+
+    def test_dashboard_queries_do_not_depend_on_data_size(self):
+        admin = User.objects.create(username="admin", is_superuser=True)
+        self.client.force_login(admin)
+        url = reverse("adminpanel:dashboard")
+        self.client.get(url)  # первый снимок
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            return len(ctx)
+
+        before = count_queries()
+        house = House.objects.create(house_name="Дом", address="ул. 1")
+        Section.objects.create(house=house, section_name="1")
+        self.assertEqual(count_queries(), before)
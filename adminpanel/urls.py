@@ -18,6 +18,11 @@ urlpatterns = [
     path("admin/house/<int:pk>", HouseDetailView.as_view(), name="house_detail"),
     path("admin/house/<int:pk>/edit", HouseUpdateView.as_view(), name="house_edit"),
     path("admin/house/<int:pk>/delete", HouseDeleteView.as_view(), name="house_delete"),
+    path(
+        "admin/house/<int:pk>/invoices.zip",
+        views.HouseInvoicesZipView.as_view(),
+        name="house_invoices_zip",
+    ),
     path(
         "transaction-purpose/<int:pk>/edit",
         views.PaymentItemUpdateView.as_view(),
@@ -41,12 +46,14 @@ urlpatterns = [
     path(
         "users/", views.UsersPageView.as_view(), name="user_list"
     ),  # страница со столом
+    path("users/data/", views.UsersDataView.as_view(), name="user_data"),
     path("users/<int:pk>/edit/", views.UserUpdateView.as_view(), name="user_edit"),
     path("users/<int:pk>/delete/", views.UserDeleteView.as_view(), name="user_delete"),
     path("users/create/", views.UserCreateView.as_view(), name="user_add"),
     path("users/<int:pk>/", views.UserDetailView.as_view(), name="user_detail"),
     path("roles/", views.RoleMatrixView.as_view(), name="role_matrix"),
     path("roles/<int:pk>/", views.RoleEditView.as_view(), name="role_edit"),
+    path("export/<str:kind>/", views.ExportView.as_view(), name="export"),
     path("requisites/", views.PaymentDetailsUpdateView.as_view(), name="requisites"),
     path("", views.dashboard, name="dashboard"),
     path("cashdesk/", views.cashdesk, name="cashdesk"),
@@ -56,6 +63,17 @@ urlpatterns = [
     path("owners/", views.owners, name="owners"),
     path("houses/", views.houses, name="houses"),
     path("messages/", views.messages1, name="messages"),
+    path("messages/create/", views.MessageCreateView.as_view(), name="message_create"),
+    path(
+        "messages/targets/",
+        views.MessageTargetsView.as_view(),
+        name="message_targets",
+    ),
+    path(
+        "messages/<int:pk>/progress/",
+        views.MessageProgressView.as_view(),
+        name="message_progress",
+    ),
     path("requests/", views.requests, name="requests"),
     path("meters/", views.meters, name="meters"),
     path("site/", views.site, name="site"),
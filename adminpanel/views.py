@@ -4,6 +4,7 @@ from django.db import transaction
 from django.db.models import ProtectedError
 from django.shortcuts import redirect, get_object_or_404, render
 from django.urls import reverse_lazy, reverse
+from django.utils import timezone
 from django.views import View
 from django.views.generic import (
     CreateView,
@@ -14,9 +15,25 @@ from django.views.generic import (
     DeleteView,
 )
 from django.contrib import messages
-from django.db.models import Count
-from billing.models import PaymentDetails, PaymentItems
+from django.contrib.auth.decorators import login_required
+from django.db.models import Count, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.http import Http404, HttpResponseBadRequest, JsonResponse
+from billing import cashbox, exports
+from billing.invoice_pdf import iter_invoice_pdfs
+from billing.models import Invoice, PaymentDetails, PaymentItems
+from billing.periods import parse_month
 from core.models import User, Role, Permission, House, Section, Gallery, Floor
+from core import permissions as role_permissions
+from core.permissions import RolePermissionRequiredMixin, role_permission_required
+from core.pagination import EstimatedCountPaginator, keyset_page
+from core.images import discard_on_error, schedule_variants
+from core.structure import apply_house_structure
+from core.streaming import streaming_response
+from core.zipstream import stream_zip
+from support import fanout
+from support.models import Message
+from . import metrics
 from .forms import (
     UserCreateForm,
     UserUpdateForm,
@@ -27,31 +44,116 @@ from .forms import (
     SectionFormSet,
     GalleryForm,
     HouseForm,
+    MessageForm,
+    TARGET_LABELS,
+    message_targets,
 )
 
 
-class UsersPageView(TemplateView):
+class UsersPageView(RolePermissionRequiredMixin, TemplateView):
+    permission_code = "users"
     template_name = "adminpanel/users/list_ajax.html"
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         ctx["roles"] = Role.objects.order_by("name")
-        ctx["users"] = (
-            User.objects.select_related("role")
-            .filter(is_staff=True)  # только персонал
-            .order_by("id")
-        )
         return ctx
 
 
-class UserDetailView(DetailView):
+# ---------- Данные таблицы пользователей (server-side, keyset-пагинация)
+class UsersDataView(RolePermissionRequiredMixin, View):
+    permission_code = "users"
+    page_size = 10
+    max_page_size = 100
+    # колонка таблицы -> поля сортировки (последнее уникальное)
+    orderings = {
+        "id": ("id",),
+        "name": ("last_name", "first_name", "id"),
+        "role": ("role_name", "id"),
+        "phone": ("phone", "id"),
+        "email": ("email", "id"),
+        "status": ("is_active", "id"),
+    }
+
+    def get_queryset(self):
+        params = self.request.GET
+        qs = User.objects.filter(is_staff=True).annotate(
+            role_name=Coalesce("role__name", Value(""))
+        )
+        name = params.get("name", "").strip()
+        if name:
+            qs = qs.filter(
+                Q(last_name__icontains=name)
+                | Q(first_name__icontains=name)
+                | Q(username__icontains=name)
+            )
+        if params.get("phone"):
+            qs = qs.filter(phone__icontains=params["phone"].strip())
+        if params.get("email"):
+            qs = qs.filter(email__icontains=params["email"].strip())
+        if params.get("role", "").isdigit():
+            qs = qs.filter(role_id=params["role"])
+        status = params.get("status")
+        if status in ("active", "disabled"):
+            qs = qs.filter(is_active=status == "active")
+        return qs
+
+    def get(self, request):
+        ordering = self.orderings.get(request.GET.get("order"), ("id",))
+        if request.GET.get("dir") == "desc":
+            ordering = tuple(f"-{f}" for f in ordering)
+        try:
+            size = min(
+                int(request.GET.get("length", self.page_size)), self.max_page_size
+            )
+        except ValueError:
+            size = self.page_size
+
+        users, next_cursor = keyset_page(
+            self.get_queryset().values(
+                "id",
+                "first_name",
+                "last_name",
+                "username",
+                "email",
+                "phone",
+                "is_active",
+                "role_id",
+                "role_name",
+            ),
+            ordering,
+            cursor=request.GET.get("cursor"),
+            size=max(size, 1),
+        )
+        rows = [
+            {
+                "id": u["id"],
+                "name": f"{u['first_name']} {u['last_name']}".strip()
+                or u["username"]
+                or u["email"],
+                "role": u["role_name"],
+                "phone": u["phone"],
+                "email": u["email"],
+                "is_active": u["is_active"],
+                "detail_url": reverse("adminpanel:user_detail", args=[u["id"]]),
+                "edit_url": reverse("adminpanel:user_edit", args=[u["id"]]),
+                "delete_url": reverse("adminpanel:user_delete", args=[u["id"]]),
+            }
+            for u in users
+        ]
+        return JsonResponse({"data": rows, "next": next_cursor})
+
+
+class UserDetailView(RolePermissionRequiredMixin, DetailView):
+    permission_code = "users"
     model = User
     template_name = "adminpanel/users/detail.html"
     context_object_name = "user"
     login_url = reverse_lazy("login")
 
 
-class UserCreateView(CreateView):
+class UserCreateView(RolePermissionRequiredMixin, CreateView):
+    permission_code = "users"
     model = User
     form_class = UserCreateForm
     template_name = "adminpanel/users/create.html"
@@ -59,7 +161,8 @@ class UserCreateView(CreateView):
     login_url = reverse_lazy("login")
 
 
-class UserUpdateView(UpdateView):
+class UserUpdateView(RolePermissionRequiredMixin, UpdateView):
+    permission_code = "users"
     model = User
     form_class = UserUpdateForm
     template_name = "adminpanel/users/edit.html"
@@ -70,7 +173,8 @@ class UserUpdateView(UpdateView):
         return super().form_valid(form)
 
 
-class UserDeleteView(View):
+class UserDeleteView(RolePermissionRequiredMixin, View):
+    permission_code = "users"
     success_url = reverse_lazy("adminpanel:user_list")
 
     def post(self, request, pk):
@@ -80,7 +184,8 @@ class UserDeleteView(View):
         return redirect(self.success_url)
 
 
-class RoleMatrixView(TemplateView):
+class RoleMatrixView(RolePermissionRequiredMixin, TemplateView):
+    permission_code = "roles"
     template_name = "adminpanel/roles/matrix.html"
 
     def get_context_data(self, **kwargs):
@@ -90,24 +195,50 @@ class RoleMatrixView(TemplateView):
         return ctx
 
     def post(self, request, *args, **kwargs):
-        # очищаем все связи
-        for r in Role.objects.all():
-            r.permissions.clear()
+        RolePermission = Role.permissions.through
+        role_ids = set(Role.objects.values_list("id", flat=True))
+        perm_ids = set(Permission.objects.values_list("id", flat=True))
 
-        # сохраняем новые чекбоксы
+        # отмеченные чекбоксы: perm_<role_id> = [permission_id, ...]
+        wanted = set()
         for key, values in request.POST.lists():
-            if key.startswith("perm_"):
-                role_id = key.split("_", 1)[1]
-                try:
-                    role = Role.objects.get(pk=role_id)
-                except Role.DoesNotExist:
-                    continue
-                role.permissions.set(values)
+            if not key.startswith("perm_"):
+                continue
+            role_id = key.split("_", 1)[1]
+            if not role_id.isdigit() or int(role_id) not in role_ids:
+                continue
+            wanted.update(
+                (int(role_id), int(v))
+                for v in values
+                if v.isdigit() and int(v) in perm_ids
+            )
+
+        # применяем разницу с текущей матрицей одним удалением и одной вставкой
+        with transaction.atomic():
+            current = {
+                (role_id, perm_id): pk
+                for pk, role_id, perm_id in RolePermission.objects.select_for_update().values_list(
+                    "id", "role_id", "permission_id"
+                )
+            }
+            removed = [pk for pair, pk in current.items() if pair not in wanted]
+            if removed:
+                RolePermission.objects.filter(pk__in=removed).delete()
+            RolePermission.objects.bulk_create(
+                [
+                    RolePermission(role_id=role_id, permission_id=perm_id)
+                    for role_id, perm_id in wanted - current.keys()
+                ]
+            )
+            # массовые операции не шлют m2m_changed — сбрасываем кэш прав сами
+            transaction.on_commit(role_permissions.invalidate)
+
         messages.success(request, "Изменения сохранены ✅")  # ✅ теперь ок
         return redirect("adminpanel:role_matrix")
 
 
-class RoleEditView(UpdateView):
+class RoleEditView(RolePermissionRequiredMixin, UpdateView):
+    permission_code = "roles"
     model = Role
     fields = ["name", "permissions"]
     template_name = "adminpanel/roles/edit.html"
@@ -119,7 +250,8 @@ class RoleEditView(UpdateView):
         return ctx
 
 
-class PaymentDetailsUpdateView(UpdateView):
+class PaymentDetailsUpdateView(RolePermissionRequiredMixin, UpdateView):
+    permission_code = "payment_details"
     model = PaymentDetails
     form_class = PaymentDetailsForm
     template_name = "adminpanel/requisites.html"
@@ -129,20 +261,23 @@ class PaymentDetailsUpdateView(UpdateView):
         return PaymentDetails.objects.first()
 
 
-class PaymentItemListView(ListView):
+class PaymentItemListView(RolePermissionRequiredMixin, ListView):
+    permission_code = "payment_items"
     model = PaymentItems
     template_name = "adminpanel/payment_items/payment_items.html"
     context_object_name = "items"
 
 
-class PaymentItemCreateView(CreateView):
+class PaymentItemCreateView(RolePermissionRequiredMixin, CreateView):
+    permission_code = "payment_items"
     model = PaymentItems
     form_class = PaymentItemForm
     template_name = "adminpanel/payment_items/payment_items_form.html"
     success_url = reverse_lazy("adminpanel:payment_items_list")
 
 
-class PaymentItemUpdateView(UpdateView):
+class PaymentItemUpdateView(RolePermissionRequiredMixin, UpdateView):
+    permission_code = "payment_items"
     model = PaymentItems
     form_class = PaymentItemForm
     template_name = "adminpanel/payment_items/payment_items_edit.html"
@@ -153,7 +288,8 @@ class PaymentItemUpdateView(UpdateView):
         return super().form_valid(form)
 
 
-class PaymentItemDeleteView(View):
+class PaymentItemDeleteView(RolePermissionRequiredMixin, View):
+    permission_code = "payment_items"
     success_url = reverse_lazy("adminpanel:payment_items_list")
 
     def post(self, request, pk):
@@ -163,11 +299,14 @@ class PaymentItemDeleteView(View):
         return redirect(self.success_url)
 
 
-class HouseListView(ListView):
+class HouseListView(RolePermissionRequiredMixin, ListView):
+    permission_code = "houses"
     template_name = "adminpanel/houses/index.html"
     model = House
     context_object_name = "houses"
     paginate_by = 25
+    # без фильтров на большой таблице — оценка количества вместо COUNT(*)
+    paginator_class = EstimatedCountPaginator
 
     def get_queryset(self):
         qs = House.objects.all()  # <- убрал annotate(staff_count=...)
@@ -201,7 +340,8 @@ class HouseListView(ListView):
 #
 #     def get_success_url(self):
 #         return reverse("adminpanel:house_detail", args=[self.object.pk])
-class HouseUpdateView(UpdateView):
+class HouseUpdateView(RolePermissionRequiredMixin, UpdateView):
+    permission_code = "houses"
     model = House
     form_class = HouseForm
     template_name = "adminpanel/houses/create.html"
@@ -217,7 +357,7 @@ class HouseUpdateView(UpdateView):
 
     def _initial_section_names(self, house):
         return [
-            {"name": s.section_name}
+            {"id": s.pk, "name": s.section_name}
             for s in Section.objects.filter(house=house).order_by("id")
         ]
 
@@ -248,7 +388,7 @@ class HouseUpdateView(UpdateView):
 
         # === 2) Галерея: URL уже загруженных изображений для превью ===
         imgs = list(Gallery.objects.filter(house=house).order_by("id")[:5])
-        ctx["gallery_urls"] = [img.image.url for img in imgs] + [""] * (5 - len(imgs))
+        ctx["gallery_urls"] = [img.resized_url for img in imgs] + [""] * (5 - len(imgs))
 
         # === 3) Связанные формы, если их не передали при невалидном POST ===
         ctx.setdefault(
@@ -303,51 +443,66 @@ class HouseUpdateView(UpdateView):
             return self.render_to_response(context)
 
         # Сохранение
-        with transaction.atomic():
-            house = form.save()
-
-            # Галерея: если прислан хоть один новый файл — заменяем всю галерею
-            new_files = [
-                gallery_form.cleaned_data.get(n)
-                for n in ["img1", "img2", "img3", "img4", "img5"]
-            ]
-            if any(new_files):
-                Gallery.objects.filter(house=house).delete()
-                for f in new_files:
-                    if f:
-                        Gallery.objects.create(house=house, image=f)
-
-            # Секции и этажи: пересобрать по введённым значениям
-            new_section_names = [
-                f.cleaned_data["name"]
-                for f in sections_fs.forms
-                if f.cleaned_data and not f.cleaned_data.get("DELETE")
-            ]
-            new_floor_numbers = [
-                f.cleaned_data["number"]
-                for f in floors_fs.forms
-                if f.cleaned_data and not f.cleaned_data.get("DELETE")
-            ]
-
-            # удалить старые этажи и секции, затем создать новые
-            Floor.objects.filter(section__house=house).delete()
-            Section.objects.filter(house=house).delete()
-
-            created_sections = [
-                Section.objects.create(house=house, section_name=nm)
-                for nm in new_section_names
-            ]
-            for s in created_sections:
-                for num in new_floor_numbers:
-                    Floor.objects.create(section=s, number=num)
-
-            # Пользователи (M2M)
-            users = [
-                f.cleaned_data["user"]
-                for f in staff_fs.forms
-                if f.cleaned_data and not f.cleaned_data.get("DELETE")
-            ]
-            house.staff.set(users)
+        try:
+            with discard_on_error([]) as saved, transaction.atomic():
+                house = form.save()
+
+                # Галерея: если прислан хоть один новый файл — заменяем всю галерею
+                new_files = [
+                    gallery_form.cleaned_data.get(n)
+                    for n in ["img1", "img2", "img3", "img4", "img5"]
+                ]
+                if any(new_files):
+                    Gallery.objects.filter(house=house).delete()
+                    created = []
+                    for slot, f in enumerate(new_files, start=1):
+                        if f:
+                            created.append(
+                                Gallery.objects.create(house=house, image=f, slot=slot)
+                            )
+                            saved.append(created[-1].image)
+                    # ресайз и WebP — в фоне, после коммита
+                    ids = [g.pk for g in created]
+                    transaction.on_commit(lambda: schedule_variants(ids))
+
+                # Секции и этажи по введённым значениям
+                new_sections = [
+                    (f.cleaned_data.get("id"), f.cleaned_data["name"])
+                    for f in sections_fs.forms
+                    if f.cleaned_data and not f.cleaned_data.get("DELETE")
+                ]
+                new_floor_numbers = [
+                    f.cleaned_data["number"]
+                    for f in floors_fs.forms
+                    if f.cleaned_data and not f.cleaned_data.get("DELETE")
+                ]
+
+                # применить разницу к текущей сетке: этажи и квартиры сохраняются
+                apply_house_structure(house, new_sections, new_floor_numbers)
+
+                # Пользователи (M2M)
+                users = [
+                    f.cleaned_data["user"]
+                    for f in staff_fs.forms
+                    if f.cleaned_data and not f.cleaned_data.get("DELETE")
+                ]
+                house.staff.set(users)
+        except ProtectedError:
+            # на удаляемых секциях/этажах есть квартиры или сообщения
+            form.add_error(
+                None,
+                "Нельзя удалить секцию или этаж: в них есть квартиры "
+                "или связанные данные.",
+            )
+            messages.error(request, "Дом не сохранён: есть связанные данные.")
+            context = self.get_context_data(
+                form=form,
+                gallery_form=gallery_form,
+                sections_fs=sections_fs,
+                floors_fs=floors_fs,
+                staff_fs=staff_fs,
+            )
+            return self.render_to_response(context)
 
         messages.success(request, "Дом сохранён.")
         return redirect(self.get_success_url())
@@ -357,7 +512,8 @@ class HouseUpdateView(UpdateView):
 
 
 # ---------- Карточка дома
-class HouseDetailView(DetailView):
+class HouseDetailView(RolePermissionRequiredMixin, DetailView):
+    permission_code = "houses"
     template_name = "adminpanel/houses/detail.html"
     model = House
     context_object_name = "house"
@@ -384,8 +540,9 @@ class HouseDetailView(DetailView):
         return ctx
 
 
-# ---------- Создание дома (одним POST, без ресайза)
-class HouseCreateView(View):
+# ---------- Создание дома (одним POST, ресайз — в фоне)
+class HouseCreateView(RolePermissionRequiredMixin, View):
+    permission_code = "houses"
     template_name = "adminpanel/houses/create.html"
 
     def get(self, request):
@@ -447,37 +604,37 @@ class HouseCreateView(View):
                 },
             )
 
-        with transaction.atomic():
+        with discard_on_error([]) as saved, transaction.atomic():
             # 1) Дом
             house = house_form.save()
 
-            # 2) Галерея — сохраняем как есть (макс. 5 фото)
+            # 2) Галерея — оригиналы сохраняем сразу (макс. 5 фото),
+            #    ресайз и WebP делаются в фоне после коммита
             slots = ["img1", "img2", "img3", "img4", "img5"]
-            for name in slots:
+            gallery_ids = []
+            for slot, name in enumerate(slots, start=1):
                 f = gallery_form.cleaned_data.get(name)
                 if f:
-                    g = Gallery(house=house)
+                    g = Gallery(house=house, slot=slot)
                     g.image.save(f.name, f, save=True)
+                    saved.append(g.image)
+                    gallery_ids.append(g.pk)
+            transaction.on_commit(lambda: schedule_variants(gallery_ids))
 
             # 3) Секции
-            section_names = [
-                f.cleaned_data["name"]
+            sections = [
+                (None, f.cleaned_data["name"])
                 for f in sections_fs.forms
                 if f.cleaned_data and not f.cleaned_data.get("DELETE")
             ]
-            sections = []
-            for nm in section_names:
-                sections.append(Section.objects.create(house=house, section_name=nm))
 
-            # 4) Этажи: S секций × F этажей
+            # 4) Этажи: S секций × F этажей (пачкой)
             floor_numbers = [
                 f.cleaned_data["number"]
                 for f in floors_fs.forms
                 if f.cleaned_data and not f.cleaned_data.get("DELETE")
             ]
-            for s in sections:
-                for num in floor_numbers:
-                    Floor.objects.create(section=s, number=num)
+            apply_house_structure(house, sections, floor_numbers)
 
             # 5) Пользователи (M2M staff)
             users = [
@@ -493,7 +650,8 @@ class HouseCreateView(View):
 
 
 # ---------- Удаление дома
-class HouseDeleteView(DeleteView):
+class HouseDeleteView(RolePermissionRequiredMixin, DeleteView):
+    permission_code = "houses"
     model = House
     template_name = "adminpanel/houses/confirm_delete.html"
     success_url = reverse_lazy("adminpanel:house_index")
@@ -509,66 +667,251 @@ class HouseDeleteView(DeleteView):
             return redirect(reverse("adminpanel:house_detail", args=[self.object.pk]))
 
 
+# Выгрузки отдают журнал, показания и квитанции целиком — только с правом роли
+DATA_EXPORT_PERMISSION = "data_export"
+
+
+# ---------- Квитанции дома одним архивом (PDF рендерятся пулом, ZIP — потоком)
+class HouseInvoicesZipView(RolePermissionRequiredMixin, View):
+    permission_code = DATA_EXPORT_PERMISSION
+
+    def get(self, request, pk):
+        house = get_object_or_404(House, pk=pk)
+        invoices = Invoice.objects.filter(house=house)
+        period = request.GET.get("period")  # ГГГГ-ММ
+        if period:
+            try:
+                first, last = parse_month(period)
+            except ValueError as exc:
+                return HttpResponseBadRequest(str(exc))
+            invoices = invoices.filter(period_from__range=(first, last))
+
+        response = streaming_response(
+            request,
+            stream_zip(iter_invoice_pdfs(invoices)),
+            content_type="application/zip",
+        )
+        suffix = f"_{period}" if period else ""
+        response["Content-Disposition"] = (
+            f'attachment; filename="invoices_house_{house.pk}{suffix}.zip"'
+        )
+        return response
+
+
+# ---------- Выгрузка квитанций/транзакций/показаний (CSV или XLSX потоком)
+class ExportView(RolePermissionRequiredMixin, View):
+    permission_code = DATA_EXPORT_PERMISSION
+
+    def get(self, request, kind):
+        if kind not in exports.EXPORTS:
+            raise Http404
+        fmt = request.GET.get("format", "csv")
+        if fmt not in exports.FORMATS:
+            return HttpResponseBadRequest("Формат: csv или xlsx")
+
+        params = request.GET
+        try:
+            date_from = parse_month(params["from"])[0] if params.get("from") else None
+            date_to = parse_month(params["to"])[1] if params.get("to") else None
+            house = int(params["house"]) if params.get("house") else None
+            payment_item = None
+            if params.get("payment_item"):
+                payment_item = get_object_or_404(
+                    PaymentItems, pk=int(params["payment_item"])
+                ).name
+            headers, rows = exports.export_rows(
+                kind,
+                house=house,
+                date_from=date_from,
+                date_to=date_to,
+                payment_item=payment_item,
+            )
+        except ValueError as exc:
+            return HttpResponseBadRequest(str(exc))
+
+        stream, content_type = exports.FORMATS[fmt]
+        response = streaming_response(
+            request, stream(headers, rows), content_type=content_type
+        )
+        response["Content-Disposition"] = f'attachment; filename="{kind}.{fmt}"'
+        return response
+
+
+@role_permission_required("statistics")
 def dashboard(request):
-    return render(request, "adminpanel/placeholder.html", {"title": "Дашборд"})
+    # показатели — из кэшированного снимка (adminpanel.metrics)
+    snapshot = metrics.get_snapshot()
+    chart = {
+        "labels": [f"{row['month']:%m.%Y}" for row in snapshot["monthly"]],
+        "income": [float(row["income"]) for row in snapshot["monthly"]],
+        "expense": [float(row["expense"]) for row in snapshot["monthly"]],
+    }
+    return render(request, "adminpanel/dashboard.html", {**snapshot, "chart": chart})
 
 
+@role_permission_required("cashbox")
 def cashdesk(request):
-    return render(request, "adminpanel/placeholder.html", {"title": "Касса"})
+    # итоги читаются из дневного свода (billing.cashbox), не из журнала
+    today = timezone.localdate()
+    try:
+        date_from = parse_month(request.GET.get("from") or f"{today:%Y-%m}")[0]
+        date_to = parse_month(request.GET.get("to") or f"{today:%Y-%m}")[1]
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    data = cashbox.summary(date_from, date_to)
+    chart = {
+        "labels": [row["label"].isoformat() for row in data["by_day"]],
+        "income": [float(row["income"]) for row in data["by_day"]],
+        "expense": [float(row["expense"]) for row in data["by_day"]],
+    }
+    return render(
+        request,
+        "adminpanel/cashdesk.html",
+        {
+            **data,
+            "chart": chart,
+            "period_from": f"{date_from:%Y-%m}",
+            "period_to": f"{date_to:%Y-%m}",
+        },
+    )
 
 
+@role_permission_required("invoices")
 def pay_receipts(request):
     return render(
         request, "adminpanel/placeholder.html", {"title": "Квитанции на оплату"}
     )
 
 
+@role_permission_required("accounts")
 def accounts(request):
     return render(request, "adminpanel/placeholder.html", {"title": "Лицевые счета"})
 
 
+@role_permission_required("flats")
 def apartments(request):
     return render(request, "adminpanel/placeholder.html", {"title": "Квартиры"})
 
 
+@role_permission_required("owners")
 def owners(request):
     return render(
         request, "adminpanel/placeholder.html", {"title": "Владельцы квартир"}
     )
 
 
+@role_permission_required("houses")
 def houses(request):
     return render(request, "adminpanel/placeholder.html", {"title": "Дома"})
 
 
+# ---------- Сообщения жителям (рассылка — support.fanout)
+@role_permission_required("messages")
 def messages1(request):
-    return render(request, "adminpanel/placeholder.html", {"title": "Сообщения"})
+    through = Message.recipients.through
+    recipients_count = (
+        through.objects.filter(message=OuterRef("pk"))
+        .order_by()
+        .values("message")
+        .annotate(n=Count("id"))
+        .values("n")
+    )
+    rows = (
+        Message.objects.select_related("house", "section", "floor", "flat")
+        .annotate(recipients_count=Coalesce(Subquery(recipients_count), 0))
+        .order_by("-created_at", "-id")[:50]
+    )
+    return render(
+        request,
+        "adminpanel/messages/list.html",
+        {"rows": rows, "sent": request.GET.get("sent")},
+    )
+
+
+class MessageCreateView(RolePermissionRequiredMixin, View):
+    permission_code = "messages"
+    template_name = "adminpanel/messages/create.html"
+
+    def get(self, request):
+        form = MessageForm(initial={"house": request.GET.get("house")})
+        return render(request, self.template_name, {"form": form})
+
+    def post(self, request):
+        form = MessageForm(request.POST)
+        if not form.is_valid():
+            return render(request, self.template_name, {"form": form})
+        with transaction.atomic():
+            message = form.save(commit=False)
+            message.created_at = timezone.now()
+            message.save()
+            state = fanout.deliver(message)
+        if state["status"] == "done":
+            messages.success(
+                request, f"Сообщение отправлено: {state['done']} получателей."
+            )
+        else:
+            messages.info(
+                request, f"Рассылка на {state['total']} получателей идёт в фоне."
+            )
+        return redirect(f"{reverse('adminpanel:messages')}?sent={message.pk}")
+
+
+class MessageTargetsView(RolePermissionRequiredMixin, View):
+    """Варианты секций/этажей/квартир для выбранного дома (форма сообщения)."""
+
+    permission_code = "messages"
+
+    def get(self, request):
+        house = request.GET.get("house")
+        querysets = message_targets(int(house) if house and house.isdigit() else None)
+        return JsonResponse(
+            {
+                name: [{"id": obj.pk, "label": TARGET_LABELS[name](obj)} for obj in qs]
+                for name, qs in zip(("section", "floor", "flat"), querysets)
+            }
+        )
+
+
+class MessageProgressView(RolePermissionRequiredMixin, View):
+    permission_code = "messages"
+
+    def get(self, request, pk):
+        state = fanout.progress(pk)
+        if state is None:
+            get_object_or_404(Message, pk=pk)
+            state = {"status": "unknown"}
+        return JsonResponse(state)
 
 
+@role_permission_required("master_requests")
 def requests(request):
     return render(
         request, "adminpanel/placeholder.html", {"title": "Заявки вызова мастера"}
     )
 
 
+@role_permission_required("meters")
 def meters(request):
     return render(
         request, "adminpanel/placeholder.html", {"title": "Показания счётчиков"}
     )
 
 
+@role_permission_required("site_management")
 def site(request):
     return render(
         request, "adminpanel/placeholder.html", {"title": "Управление сайтом"}
     )
 
 
+@role_permission_required("system_settings")
 def settings(request):
     return render(
         request, "adminpanel/placeholder.html", {"title": "Настройки системы"}
     )
 
 
+@login_required
 def profile(request):
     return render(
         request, "adminpanel/placeholder.html", {"title": "Профиль администратора"}
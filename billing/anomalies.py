@@ -0,0 +1,127 @@
+from datetime import timedelta
+
+from django.db import transaction
+
+from billing.models import MeterReading
+from billing.timeseries import EPOCH, SCALE, ReadingSeries, require_numpy, np
+
+HISTORY_DAYS = 365
+MIN_HISTORY = 3  # меньше интервалов в истории — показание не оцениваем
+SPIKE_THRESHOLD = 6.0  # (расход - медиана) в единицах масштабированного MAD
+MIN_SCALE = 0.01  # нижняя граница разброса, ед./сутки
+TYPO_RATIO = (9.5, 10.5)  # значение ≈ ×10 от ожидаемого — лишняя цифра
+UPDATE_CHUNK = 10000
+
+
+def _group_median(groups, values, n_groups):
+    """Медиана values по группам — сортировкой, без цикла по счётчикам."""
+    order = np.lexsort((values, groups))
+    g, v = groups[order], values[order]
+    counts = np.bincount(g, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    median = np.full(n_groups, np.nan)
+    has = counts > 0
+    lo = starts[has] + (counts[has] - 1) // 2
+    hi = starts[has] + counts[has] // 2
+    median[has] = (v[lo] + v[hi]) / 2
+    return median, counts
+
+
+def score_readings(series, period_start, period_end, pending_ids):
+    """Оценка новых показаний относительно истории их счётчиков.
+
+    Расход нормируется на сутки между показаниями; для каждого счётчика
+    по истории до периода считаются медиана и MAD суточного расхода.
+    Всплеском считается только расход выше обычного: пустующая квартира
+    с нулевым расходом не подозрительна. Показания счётчиков с короткой
+    историей (меньше MIN_HISTORY интервалов) не оцениваются и остаются
+    новыми — кроме отката, который виден и без истории.
+    Возвращает (id проверенных, id подозрительных, счётчики причин).
+    """
+    delta, valid = series.deltas()
+    gaps = np.ones(len(series), dtype=np.int64)
+    gaps[1:] = np.maximum(np.diff(series.days), 1)
+    rate = delta / SCALE / gaps
+    meter_idx = series.meter_index
+    n_meters = len(series.meter_ids)
+
+    start_day = period_start.toordinal() - EPOCH
+    end_day = period_end.toordinal() - EPOCH
+    in_period = (series.days >= start_day) & (series.days <= end_day)
+    pending = in_period & np.isin(series.reading_ids, pending_ids)
+
+    history = valid & ~in_period
+    median, counts = _group_median(meter_idx[history], rate[history], n_meters)
+    deviation = np.abs(rate[history] - median[meter_idx[history]])
+    mad, _ = _group_median(meter_idx[history], deviation, n_meters)
+    scale = np.fmax(1.4826 * mad, np.fmax(0.1 * np.abs(median), MIN_SCALE))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        score = (rate - median[meter_idx]) / scale[meter_idx]
+        # ожидаемое значение: предыдущее + обычный расход за прошедшие сутки
+        prev = np.zeros(len(series), dtype=np.int64)
+        prev[1:] = series.values[:-1]
+        expected = prev + median[meter_idx] * gaps * SCALE
+        ratio = np.where(
+            expected > 0, series.values / np.where(expected > 0, expected, 1), 0
+        )
+
+    rollback = pending & valid & (delta < 0)
+    scored = pending & valid & ~rollback & (counts[meter_idx] >= MIN_HISTORY)
+    typo = scored & (ratio >= TYPO_RATIO[0]) & (ratio <= TYPO_RATIO[1])
+    spike = scored & ~typo & (score > SPIKE_THRESHOLD)
+    suspicious = rollback | typo | spike
+
+    reasons = {
+        "rollback": int(rollback.sum()),
+        "typo": int(typo.sum()),
+        "spike": int(spike.sum()),
+    }
+    return (
+        series.reading_ids[scored & ~suspicious].tolist(),
+        series.reading_ids[suspicious].tolist(),
+        reasons,
+    )
+
+
+def _set_status(ids, status):
+    for i in range(0, len(ids), UPDATE_CHUNK):
+        MeterReading.objects.filter(pk__in=ids[i : i + UPDATE_CHUNK]).update(
+            status=status
+        )
+
+
+def detect_anomalies(period_start, period_end, house=None, dry_run=False):
+    """Проверяет новые показания периода и помечает подозрительные."""
+    require_numpy()
+    pending = MeterReading.objects.filter(
+        date__gte=period_start,
+        date__lte=period_end,
+        status=MeterReading.STATUS_NEW,
+    )
+    if house is not None:
+        pending = pending.filter(meter__house=house)
+    pending_ids = np.fromiter(pending.values_list("id", flat=True), dtype=np.int64)
+
+    # история без уже отбракованных показаний
+    series = ReadingSeries.load(
+        house=house,
+        date_from=period_start - timedelta(days=HISTORY_DAYS),
+        date_to=period_end,
+        queryset=MeterReading.objects.exclude(status=MeterReading.STATUS_SUSPICIOUS),
+    )
+    checked, suspicious, reasons = score_readings(
+        series, period_start, period_end, pending_ids
+    )
+
+    if not dry_run:
+        with transaction.atomic():
+            _set_status(checked, MeterReading.STATUS_CHECKED)
+            _set_status(suspicious, MeterReading.STATUS_SUSPICIOUS)
+
+    return {
+        "checked": len(checked),
+        "suspicious": len(suspicious),
+        "skipped": len(pending_ids) - len(checked) - len(suspicious),
+        **reasons,
+    }
@@ -0,0 +1,169 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from billing.models import AccountTransaction, CashboxDaily, PaymentItems
+
+ZERO = Decimal("0.00")
+INCOME = "Приход"
+EXPENSE = "Расход"
+
+
+# ---------- Вклад одной транзакции в свод
+def cashbox_entry(tx):
+    """Ключ строки свода и сумма; непроведённые транзакции в кассу не входят."""
+    if not tx.is_approved:
+        return None
+    return (tx.date, tx.type, tx.manager_id), tx.amount
+
+
+def _add(key, amount, count):
+    day, item, manager_id = key
+    lookup = {"date": day, "item": item, "manager_id": manager_id}
+    rows = CashboxDaily.objects.filter(**lookup)
+    if rows.update(amount=F("amount") + amount, count=F("count") + count):
+        if count < 0:
+            rows.filter(count__lte=0).delete()
+        return
+    # Строки нет: первая транзакция дня по статье и менеджеру или свод
+    # разошёлся с журналом. Приращение тогда не к чему прибавлять —
+    # собираем строку по журналу, где изменение уже сохранено.
+    totals = AccountTransaction.objects.filter(
+        is_approved=True, date=day, type=item, manager_id=manager_id
+    ).aggregate(amount=Sum("amount"), count=Count("id"))
+    if not totals["count"]:
+        return
+    try:
+        with transaction.atomic():
+            CashboxDaily.objects.create(**lookup, **totals)
+    except IntegrityError:
+        # строку создали параллельно — по журналу без этого изменения
+        rows.update(amount=F("amount") + amount, count=F("count") + count)
+
+
+def apply_change(old, new):
+    """old/new — результаты cashbox_entry до и после изменения транзакции."""
+    if old == new:
+        return
+    if old and new and old[0] == new[0]:
+        _add(new[0], new[1] - old[1], 0)
+        return
+    if old:
+        _add(old[0], -old[1], -1)
+    if new:
+        _add(new[0], new[1], 1)
+
+
+def rebuild(date_from=None, date_to=None):
+    """Пересчёт свода за период (или целиком) по журналу транзакций."""
+    txs = AccountTransaction.objects.filter(is_approved=True)
+    rollups = CashboxDaily.objects.all()
+    if date_from is not None:
+        txs = txs.filter(date__gte=date_from)
+        rollups = rollups.filter(date__gte=date_from)
+    if date_to is not None:
+        txs = txs.filter(date__lte=date_to)
+        rollups = rollups.filter(date__lte=date_to)
+    rows = (
+        txs.values("date", "type", "manager_id")
+        .annotate(s=Sum("amount"), n=Count("id"))
+        .order_by()
+    )
+    with transaction.atomic():
+        rollups.delete()
+        CashboxDaily.objects.bulk_create(
+            (
+                CashboxDaily(
+                    date=r["date"],
+                    item=r["type"],
+                    manager_id=r["manager_id"],
+                    amount=r["s"],
+                    count=r["n"],
+                )
+                for r in rows.iterator(chunk_size=2000)
+            ),
+            batch_size=1000,
+        )
+
+
+# ---------- Чтение для страницы кассы
+def _direction(item, amount, kinds):
+    kind = kinds.get(item)
+    if kind not in (INCOME, EXPENSE):
+        # статьи нет в справочнике — по знаку суммы
+        kind = INCOME if amount >= 0 else EXPENSE
+    return "income" if kind == INCOME else "expense"
+
+
+def summary(date_from=None, date_to=None):
+    """Итоги кассы за период: всего, по дням, по статьям и по менеджерам."""
+    rollups = CashboxDaily.objects.all()
+    if date_from is not None:
+        rollups = rollups.filter(date__gte=date_from)
+    if date_to is not None:
+        rollups = rollups.filter(date__lte=date_to)
+    kinds = dict(PaymentItems.objects.values_list("name", "operation_type"))
+
+    totals = {"income": ZERO, "expense": ZERO}
+    by_day, by_item, by_manager = {}, {}, {}
+    rows = rollups.order_by("date").values_list(
+        "date", "item", "manager_id", "manager__username", "amount", "count"
+    )
+    for day, item, manager_id, username, amount, count in rows:
+        kind = _direction(item, amount, kinds)
+        amount = abs(amount)
+        totals[kind] += amount
+        for bucket, key, label in (
+            (by_day, day, day),
+            (by_item, item, item),
+            (by_manager, manager_id, username),
+        ):
+            row = bucket.setdefault(
+                key, {"label": label, "income": ZERO, "expense": ZERO, "count": 0}
+            )
+            row[kind] += amount
+            row["count"] += count
+
+    return {
+        **totals,
+        "balance": totals["income"] - totals["expense"],
+        "by_day": list(by_day.values()),
+        "by_item": sorted(by_item.values(), key=lambda r: r["label"]),
+        "by_manager": sorted(by_manager.values(), key=lambda r: str(r["label"])),
+    }
+
+
+def _signed_totals(rows, kinds):
+    totals = {"income": ZERO, "expense": ZERO}
+    for item, amount in rows:
+        totals[_direction(item, amount, kinds)] += abs(amount)
+    return totals
+
+
+def monthly(date_from, date_to):
+    """Приход и расход по месяцам периода — агрегатом по своду."""
+    kinds = dict(PaymentItems.objects.values_list("name", "operation_type"))
+    rows = (
+        CashboxDaily.objects.filter(date__gte=date_from, date__lte=date_to)
+        .annotate(month=TruncMonth("date"))
+        .values_list("month", "item")
+        .annotate(s=Sum("amount"))
+        .order_by("month")
+    )
+    months = {}
+    for month, item, amount in rows:
+        months.setdefault(month, []).append((item, amount))
+    return [
+        {"month": month, **_signed_totals(items, kinds)}
+        for month, items in months.items()
+    ]
+
+
+def cash_balance():
+    """Остаток кассы за всю историю: приход минус расход."""
+    kinds = dict(PaymentItems.objects.values_list("name", "operation_type"))
+    rows = CashboxDaily.objects.values_list("item").annotate(s=Sum("amount"))
+    totals = _signed_totals(rows.order_by(), kinds)
+    return totals["income"] - totals["expense"]
@@ -0,0 +1,93 @@
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from billing.models import AccountBalance, Debtor, Invoice, PersonalAccount
+
+
+def debt_since(account_ids):
+    """Дата старейшей неоплаченной проведённой квитанции по каждому счёту."""
+    return dict(
+        Invoice.objects.filter(
+            personal_account_id__in=account_ids,
+            is_posted=True,
+            payment_status__in=Invoice.OPEN_STATUSES,
+        )
+        .values("personal_account_id")
+        .annotate(since=Min("create_date"))
+        .values_list("personal_account_id", "since")
+    )
+
+
+def sync(account_ids):
+    """Приводит индекс должников в соответствие с балансами указанных счетов."""
+    account_ids = list(account_ids)
+    owing = dict(
+        AccountBalance.objects.filter(pk__in=account_ids, balance__lt=0).values_list(
+            "pk", "balance"
+        )
+    )
+    with transaction.atomic():
+        Debtor.objects.filter(pk__in=account_ids).exclude(pk__in=owing).delete()
+        if not owing:
+            return
+
+        # долг — с даты старейшей неоплаченной квитанции; без неё — с сегодня
+        today = timezone.localdate()
+        since = debt_since(list(owing))
+        existing = {d.pk: d for d in Debtor.objects.filter(pk__in=owing)}
+        for pk, debtor in existing.items():
+            debtor.amount = -owing[pk]
+            debtor.debt_since = since.get(pk, debtor.debt_since)
+        Debtor.objects.bulk_update(
+            existing.values(), ["amount", "debt_since"], batch_size=1000
+        )
+
+        new = PersonalAccount.objects.filter(
+            pk__in=set(owing) - set(existing)
+        ).values_list("pk", "house_id", "section_id", "flat__floor_id", "flat_id")
+        Debtor.objects.bulk_create(
+            [
+                Debtor(
+                    personal_account_id=pk,
+                    house_id=house_id,
+                    section_id=section_id,
+                    floor_id=floor_id,
+                    flat_id=flat_id,
+                    amount=-owing[pk],
+                    debt_since=since.get(pk, today),
+                )
+                for pk, house_id, section_id, floor_id, flat_id in new
+            ],
+            batch_size=1000,
+        )
+
+
+def update_since(account_ids):
+    """Пересчитать debt_since после смены статусов оплаты квитанций.
+
+    Счета не из индекса должников bulk_update просто не затронет.
+    """
+    rows = [
+        Debtor(pk=pk, debt_since=since)
+        for pk, since in debt_since(list(account_ids)).items()
+    ]
+    Debtor.objects.bulk_update(rows, ["debt_since"], batch_size=1000)
+
+
+def debtors_in(house=None, section=None, floor=None, flat=None):
+    """Должники в доме / секции / этаже / квартире — выборка по индексу."""
+    qs = Debtor.objects.all()
+    for field, value in (
+        ("house", house),
+        ("section", section),
+        ("floor", floor),
+        ("flat", flat),
+    ):
+        if value is not None:
+            qs = qs.filter(**{field: value})
+    return qs
+
+
+def debtor_flat_ids(house=None, section=None, floor=None, flat=None):
+    return debtors_in(house, section, floor, flat).values_list("flat_id", flat=True)
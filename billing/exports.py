@@ -0,0 +1,206 @@
+import csv
+import re
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from billing.models import AccountTransaction, Invoice, MeterReading
+from core.zipstream import stream_zip
+
+# Строк на одну выборку серверного курсора и на один отдаваемый кусок файла
+CHUNK_SIZE = 2000
+
+# ---------- Описание выгрузок
+# вид -> (модель, поле даты для периода, путь к дому, колонки (поле, заголовок))
+EXPORTS = {
+    "invoices": (
+        Invoice,
+        "period_from",
+        "house",
+        [
+            ("id", "ID"),
+            ("invoice_number", "Номер"),
+            ("create_date", "Дата"),
+            ("period_from", "Период с"),
+            ("period_to", "Период по"),
+            ("house__house_name", "Дом"),
+            ("section__section_name", "Секция"),
+            ("flat__number_flat", "Квартира"),
+            ("personal_account__number", "Лицевой счёт"),
+            ("tariff__tariff_name", "Тариф"),
+            ("is_posted", "Проведена"),
+            ("total_amount", "Сумма"),
+        ],
+    ),
+    "transactions": (
+        AccountTransaction,
+        "date",
+        "personal_account__house",
+        [
+            ("id", "ID"),
+            ("number", "Номер"),
+            ("date", "Дата"),
+            ("type", "Статья"),
+            ("personal_account__house__house_name", "Дом"),
+            ("personal_account__number", "Лицевой счёт"),
+            ("amount", "Сумма"),
+            ("is_approved", "Проведена"),
+            ("user__username", "Пользователь"),
+            ("manager__username", "Менеджер"),
+            ("comment", "Комментарий"),
+        ],
+    ),
+    "readings": (
+        MeterReading,
+        "date",
+        "meter__house",
+        [
+            ("id", "ID"),
+            ("number", "Номер"),
+            ("date", "Дата"),
+            ("meter__house__house_name", "Дом"),
+            ("meter__flat__number_flat", "Квартира"),
+            ("meter__serial_number", "Счётчик"),
+            ("meter__service__Service_name", "Услуга"),
+            ("value", "Показание"),
+            ("status", "Статус"),
+        ],
+    ),
+}
+
+
+def export_rows(kind, house=None, date_from=None, date_to=None, payment_item=None):
+    """Заголовки и ленивый поток строк выгрузки.
+
+    Строки читаются серверным курсором порциями по CHUNK_SIZE, в памяти
+    одновременно — только текущая порция. payment_item (название статьи
+    PaymentItems) применим только к транзакциям.
+    """
+    model, date_field, house_field, columns = EXPORTS[kind]
+    qs = model.objects.all()
+    if house is not None:
+        qs = qs.filter(**{house_field: house})
+    if date_from is not None:
+        qs = qs.filter(**{f"{date_field}__gte": date_from})
+    if date_to is not None:
+        qs = qs.filter(**{f"{date_field}__lte": date_to})
+    if payment_item is not None:
+        if model is not AccountTransaction:
+            raise ValueError("Фильтр по статье применим только к транзакциям")
+        qs = qs.filter(type=payment_item)
+
+    fields = [field for field, _ in columns]
+    rows = qs.order_by("id").values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+    return [title for _, title in columns], rows
+
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == CHUNK_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ---------- CSV
+class Echo:
+    """«Файл» для csv.writer: возвращает записанное вместо хранения."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(headers, rows):
+    # BOM и «;» — чтобы Excel сам открыл файл в UTF-8 по колонкам
+    writer = csv.writer(Echo(), delimiter=";")
+    yield ("\ufeff" + writer.writerow(headers)).encode()
+    for batch in _batches(rows):
+        yield "".join(writer.writerow(row) for row in batch).encode()
+
+
+# ---------- XLSX (минимальная книга из одного листа, пишется потоком)
+_ILLEGAL_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" '
+    'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/'
+    'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/'
+    'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    "</Types>"
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/'
+    '2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    "</Relationships>"
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Выгрузка" sheetId="1" r:id="rId1"/></sheets>'
+    "</workbook>"
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/'
+    '2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    "</Relationships>"
+)
+
+
+def _cell(value):
+    if value is None:
+        return "<c/>"
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    if isinstance(value, bool):
+        value = "да" if value else "нет"
+    text = escape(_ILLEGAL_XML.sub("", str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _row(values):
+    return "<row>" + "".join(_cell(v) for v in values) + "</row>"
+
+
+def _sheet(headers, rows):
+    yield (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        "<sheetData>" + _row(headers)
+    ).encode()
+    for batch in _batches(rows):
+        yield "".join(_row(row) for row in batch).encode()
+    yield b"</sheetData></worksheet>"
+
+
+def stream_xlsx(headers, rows):
+    return stream_zip(
+        [
+            ("[Content_Types].xml", _CONTENT_TYPES.encode()),
+            ("_rels/.rels", _ROOT_RELS.encode()),
+            ("xl/workbook.xml", _WORKBOOK.encode()),
+            ("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS.encode()),
+            ("xl/worksheets/sheet1.xml", _sheet(headers, rows)),
+        ]
+    )
+
+
+# формат -> (поток, MIME-тип)
+FORMATS = {
+    "csv": (stream_csv, "text/csv; charset=utf-8"),
+    "xlsx": (
+        stream_xlsx,
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ),
+}
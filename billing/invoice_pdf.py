@@ -0,0 +1,280 @@
+import hashlib
+import io
+import json
+import os
+import posixpath
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageDraw, ImageFont
+
+from billing.models import InvoiceService, PaymentDetails
+from core.parallel import imap_bounded, shared_pool
+
+# Версия оформления: меняется вместе с render_pdf, чтобы не отдавать старые рендеры
+RENDER_VERSION = 2
+CACHE_DIR = "invoices/pdf"
+PAYLOAD_CHUNK = 500
+
+# A4 при 150 dpi
+DPI = 150
+PAGE_SIZE = (1240, 1754)
+MARGIN = 90
+LINE = 34
+FONT_CANDIDATES = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+    "DejaVuSans.ttf",
+]
+# колонки таблицы услуг: (заголовок, x, выравнивание по правому краю)
+COLUMNS = [
+    ("№", MARGIN, False),
+    ("Услуга", MARGIN + 50, False),
+    ("Ед.", 610, False),
+    ("Кол-во", 820, True),
+    ("Цена", 960, True),
+    ("Сумма", PAGE_SIZE[0] - MARGIN, True),
+]
+
+
+# ---------- Данные квитанций
+def _payload(invoice, lines, requisites):
+    flat = invoice.flat
+    owner = flat.user
+    return {
+        "id": invoice.pk,
+        "number": invoice.invoice_number,
+        "create_date": invoice.create_date.isoformat(),
+        "period": [invoice.period_from.isoformat(), invoice.period_to.isoformat()],
+        "house": invoice.house.house_name,
+        "address": invoice.house.address,
+        "section": invoice.section.section_name,
+        "floor": flat.floor.number,
+        "flat": flat.number_flat,
+        "owner": " ".join(
+            filter(None, [owner.last_name, owner.first_name, owner.patronymic])
+        )
+        or owner.username,
+        "account": invoice.personal_account.number,
+        "tariff": invoice.tariff.tariff_name,
+        "is_posted": invoice.is_posted,
+        "total": str(invoice.total_amount),
+        "lines": lines,
+        "company": requisites.name_company if requisites else "",
+        "requisites": requisites.payment_details if requisites else "",
+    }
+
+
+def invoice_payloads(invoices):
+    """Всё, что печатается в квитанции, в виде простых данных для воркеров."""
+    requisites = PaymentDetails.objects.first()
+    invoices = invoices.select_related(
+        "house", "section", "flat__floor", "flat__user", "personal_account", "tariff"
+    ).order_by("invoice_number", "id")
+    chunk = []
+    for invoice in invoices.iterator(chunk_size=PAYLOAD_CHUNK):
+        chunk.append(invoice)
+        if len(chunk) == PAYLOAD_CHUNK:
+            yield from _with_lines(chunk, requisites)
+            chunk = []
+    if chunk:
+        yield from _with_lines(chunk, requisites)
+
+
+def _with_lines(invoices, requisites):
+    lines = {invoice.pk: [] for invoice in invoices}
+    rows = (
+        InvoiceService.objects.filter(invoice_id__in=lines.keys())
+        .order_by("invoice_id", "id")
+        .values_list(
+            "invoice_id",
+            "service__Service_name",
+            "unit",
+            "quantity",
+            "price",
+            "currency",
+            "total",
+        )
+    )
+    for invoice_id, *line in rows:
+        lines[invoice_id].append([str(v) for v in line])
+    for invoice in invoices:
+        yield _payload(invoice, lines[invoice.pk], requisites)
+
+
+def content_key(payload):
+    raw = json.dumps([RENDER_VERSION, payload], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def cache_name(key):
+    return posixpath.join(CACHE_DIR, key[:2], f"{key}.pdf")
+
+
+def archive_name(payload):
+    return f"invoice_{payload['number']}_{payload['id']}.pdf"
+
+
+# ---------- Рендеринг (выполняется в воркерах, без обращений к БД)
+@lru_cache
+def _font(size):
+    # встроенный шрифт Pillow не содержит кириллицы — без TrueType-шрифта
+    # квитанция вышла бы пустыми квадратами, поэтому не рендерим вовсе
+    paths = [getattr(settings, "INVOICE_PDF_FONT", None), *FONT_CANDIDATES]
+    for path in filter(None, paths):
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            continue
+    raise ImproperlyConfigured(
+        "Не найден шрифт с кириллицей для квитанций: установите DejaVuSans "
+        "или укажите путь к .ttf в INVOICE_PDF_FONT"
+    )
+
+
+def _wrap(draw, text, font, width):
+    lines = []
+    for paragraph in str(text).splitlines() or [""]:
+        line = ""
+        for word in paragraph.split():
+            candidate = f"{line} {word}".strip()
+            if line and draw.textlength(candidate, font=font) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+
+class _Pages:
+    """Листы квитанции; новый лист начинается, когда текущий заполнен."""
+
+    def __init__(self):
+        self.pages = []
+        self._new_page()
+
+    def _new_page(self):
+        self.image = Image.new("L", PAGE_SIZE, 255)
+        self.draw = ImageDraw.Draw(self.image)
+        self.pages.append(self.image)
+        self.y = MARGIN
+
+    def reserve(self, height):
+        if self.y + height > PAGE_SIZE[1] - MARGIN:
+            self._new_page()
+
+    def text(self, x, text, size=22, right=False):
+        font = _font(size)
+        if right:
+            x -= self.draw.textlength(text, font=font)
+        self.draw.text((x, self.y), text, font=font, fill=0)
+
+    def rule(self):
+        y = self.y + LINE // 4
+        self.draw.line((MARGIN, y, PAGE_SIZE[0] - MARGIN, y), fill=0, width=2)
+        self.y += LINE // 2
+
+    def paragraph(self, text, size=22):
+        width = PAGE_SIZE[0] - 2 * MARGIN
+        for line in _wrap(self.draw, text, _font(size), width):
+            self.reserve(LINE)
+            self.text(MARGIN, line, size)
+            self.y += LINE
+
+    def table_header(self):
+        for title, x, right in COLUMNS:
+            self.text(x, title, right=right)
+        self.y += LINE
+        self.rule()
+
+
+def render_pdf(payload):
+    """PDF квитанции (растровые листы A4) из данных invoice_payloads."""
+    doc = _Pages()
+    doc.text(MARGIN, f"Квитанция № {payload['number']} от {payload['create_date']}", 34)
+    doc.y += LINE * 2
+    period_from, period_to = payload["period"]
+    for label, value in [
+        ("Период", f"{period_from} — {period_to}"),
+        ("Лицевой счёт", payload["account"]),
+        ("Плательщик", payload["owner"]),
+        ("Адрес", f"{payload['house']}, {payload['address']}"),
+        (
+            "Помещение",
+            f"{payload['section']}, этаж {payload['floor']}, кв. {payload['flat']}",
+        ),
+        ("Тариф", payload["tariff"]),
+    ]:
+        doc.paragraph(f"{label}: {value}")
+    doc.y += LINE
+
+    doc.reserve(LINE * 3)
+    doc.table_header()
+    for i, (service, unit, quantity, price, currency, total) in enumerate(
+        payload["lines"], 1
+    ):
+        doc.reserve(LINE)
+        if doc.y == MARGIN:
+            doc.table_header()
+        cells = [str(i), service, unit, quantity, price, f"{total} {currency}"]
+        for (_, x, right), value in zip(COLUMNS, cells):
+            doc.text(x, value, right=right)
+        doc.y += LINE
+    doc.rule()
+    doc.reserve(LINE * 2)
+    doc.text(
+        PAGE_SIZE[0] - MARGIN, f"Итого к оплате: {payload['total']}", 28, right=True
+    )
+    doc.y += LINE * 2
+
+    if payload["company"] or payload["requisites"]:
+        doc.reserve(LINE * 3)
+        doc.paragraph("Реквизиты для оплаты", 26)
+        doc.paragraph(payload["company"])
+        doc.paragraph(payload["requisites"])
+
+    buf = io.BytesIO()
+    first, *rest = doc.pages
+    first.save(buf, "PDF", save_all=True, append_images=rest, resolution=DPI)
+    return buf.getvalue()
+
+
+# ---------- Пакетная выдача
+def _workers():
+    # пул общий для всех запросов процесса — по умолчанию не больше 4 воркеров
+    default = min(4, os.cpu_count() or 1)
+    return getattr(settings, "INVOICE_PDF_WORKERS", None) or default
+
+
+def iter_invoice_pdfs(invoices, workers=None):
+    """Пары (имя файла, PDF) для квитанций queryset'а.
+
+    Неизменившиеся квитанции берутся из хранилища по хешу содержимого и
+    отдаются сразу, остальные рендерятся пулом процессов и отдаются по мере
+    готовности, попутно сохраняясь в кеш.
+    """
+    pending = []
+    for payload in invoice_payloads(invoices):
+        name = cache_name(content_key(payload))
+        if default_storage.exists(name):
+            with default_storage.open(name, "rb") as fh:
+                yield archive_name(payload), fh.read()
+        else:
+            pending.append((payload, name))
+
+    workers = workers or _workers()
+    if workers <= 1 or len(pending) <= 1:
+        rendered = map(render_pdf, (p for p, _ in pending))
+    else:
+        # один пул на процесс сервера: запросы не форкают свои пулы, а в работе
+        # у каждого не больше 2×workers документов
+        pool = shared_pool("invoice_pdf", workers)
+        rendered = imap_bounded(pool, render_pdf, (p for p, _ in pending), 2 * workers)
+    for (payload, name), data in zip(pending, rendered):
+        if not default_storage.exists(name):
+            default_storage.save(name, ContentFile(data))
+        yield archive_name(payload), data
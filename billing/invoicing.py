@@ -0,0 +1,185 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef, Subquery
+from django.utils import timezone
+
+from billing.ledger import notify_accounts_changed
+from billing.models import (
+    Invoice,
+    InvoiceNumberCounter,
+    InvoiceService,
+    Meter,
+    MeterReading,
+    PersonalAccount,
+)
+from billing.pricing import price_tables
+from core.models import House
+from core.parallel import process_map
+
+CHUNK_SIZE = 1000
+CENT = Decimal("0.01")
+
+
+# ---------- Показания: дельта за период по каждому счётчику дома (один запрос)
+def _meter_deltas(house_id, period_from, period_to):
+    readings = MeterReading.objects.filter(meter=OuterRef("pk")).exclude(
+        status=MeterReading.STATUS_SUSPICIOUS
+    )
+    meters = (
+        Meter.objects.filter(house_id=house_id, is_active=True)
+        .annotate(
+            prev_value=Subquery(
+                readings.filter(date__lt=period_from)
+                .order_by("-date", "-id")
+                .values("value")[:1]
+            ),
+            first_value=Subquery(
+                readings.filter(date__gte=period_from, date__lte=period_to)
+                .order_by("date", "id")
+                .values("value")[:1]
+            ),
+            last_value=Subquery(
+                readings.filter(date__gte=period_from, date__lte=period_to)
+                .order_by("-date", "-id")
+                .values("value")[:1]
+            ),
+        )
+        .values_list(
+            "personal_account_id",
+            "service_id",
+            "prev_value",
+            "first_value",
+            "last_value",
+        )
+    )
+
+    # (лицевой счёт, услуга) -> суммарный расход по всем счётчикам услуги
+    deltas = defaultdict(Decimal)
+    for account_id, service_id, prev, first, last in meters:
+        if last is None:
+            continue  # за период показаний нет — услугу не начисляем
+        start = prev if prev is not None else first
+        deltas[(account_id, service_id)] += max(last - start, Decimal(0))
+    return deltas
+
+
+def bill_house(house_id, period_from, period_to, create_date=None):
+    """Начисляет квитанции активным лицевым счетам дома за период.
+
+    Счета без начислений (нет показаний или услуг тарифа) пропускаются.
+    """
+    create_date = create_date or timezone.localdate()
+
+    accounts = list(
+        PersonalAccount.objects.filter(house_id=house_id, status=True)
+        .filter(
+            ~Exists(
+                Invoice.objects.filter(
+                    personal_account=OuterRef("pk"),
+                    period_from=period_from,
+                    period_to=period_to,
+                )
+            )
+        )
+        .order_by("id")
+        .values_list("id", "section_id", "flat_id", "flat__tariff_id")
+    )
+    if not accounts:
+        return {"house_id": house_id, "invoices": 0, "lines": 0}
+
+    deltas = _meter_deltas(house_id, period_from, period_to)
+    prices = price_tables(tariff_id for *_, tariff_id in accounts)
+
+    services_by_account = defaultdict(list)
+    for (account_id, service_id), quantity in deltas.items():
+        services_by_account[account_id].append((service_id, quantity))
+
+    invoices, lines = [], []
+    for account_id, section_id, flat_id, tariff_id in accounts:
+        invoice_lines = []
+        for service_id, quantity in services_by_account.get(account_id, ()):
+            entry = prices.get(tariff_id, {}).get(service_id)
+            if entry is None:
+                continue  # услуга не входит в тариф квартиры
+            invoice_lines.append(
+                InvoiceService(
+                    service_id=service_id,
+                    unit=entry.unit,
+                    quantity=quantity,
+                    price=entry.price,
+                    currency=entry.currency,
+                    total=(quantity * entry.price).quantize(CENT),
+                )
+            )
+        if not invoice_lines:
+            continue  # начислять нечего — пустую квитанцию не создаём
+        invoices.append(
+            Invoice(
+                create_date=create_date,
+                house_id=house_id,
+                section_id=section_id,
+                flat_id=flat_id,
+                personal_account_id=account_id,
+                period_from=period_from,
+                period_to=period_to,
+                tariff_id=tariff_id,
+                is_posted=False,
+                total_amount=sum((ln.total for ln in invoice_lines), Decimal(0)),
+            )
+        )
+        lines.append(invoice_lines)
+
+    if not invoices:
+        return {"house_id": house_id, "invoices": 0, "lines": 0}
+
+    with transaction.atomic():
+        # номера выдаются в той же транзакции: при откате они не теряются
+        first_number = reserve_numbers(len(invoices))
+        for i, invoice in enumerate(invoices):
+            invoice.invoice_number = first_number + i
+        Invoice.objects.bulk_create(invoices, batch_size=CHUNK_SIZE)
+        services = []
+        for invoice, invoice_lines in zip(invoices, lines):
+            for ln in invoice_lines:
+                ln.invoice_id = invoice.pk
+                services.append(ln)
+        InvoiceService.objects.bulk_create(services, batch_size=CHUNK_SIZE)
+        notify_accounts_changed(i.personal_account_id for i in invoices)
+
+    return {"house_id": house_id, "invoices": len(invoices), "lines": len(services)}
+
+
+# ---------- Номера квитанций: счётчик в отдельной строке под блокировкой,
+# чтобы параллельные процессы и запуски не выдали один номер дважды
+def reserve_numbers(count):
+    """Резервирует count номеров подряд; возвращает первый.
+
+    Вызывается внутри транзакции: строка счётчика остаётся заблокированной
+    до её конца, поэтому другие запуски ждут, а номера идут без пропусков.
+    """
+    counter = InvoiceNumberCounter.objects.select_for_update().filter(pk=1).first()
+    if counter is None:
+        # счётчик ещё не заведён — начинаем после последней квитанции
+        last = Invoice.objects.aggregate(m=Max("invoice_number"))["m"] or 0
+        counter, _ = InvoiceNumberCounter.objects.get_or_create(
+            pk=1, defaults={"last_number": last}
+        )
+        counter = InvoiceNumberCounter.objects.select_for_update().get(pk=1)
+    first = counter.last_number + 1
+    counter.last_number += count
+    counter.save(update_fields=["last_number"])
+    return first
+
+
+def _bill_house_task(args):
+    return bill_house(*args)
+
+
+def run_billing(period_from, period_to, house_ids=None, workers=None, create_date=None):
+    """Запуск начислений по домам; дома раздаются в пул процессов."""
+    if house_ids is None:
+        house_ids = list(House.objects.order_by("id").values_list("id", flat=True))
+    tasks = [(house_id, period_from, period_to, create_date) for house_id in house_ids]
+    return process_map(_bill_house_task, tasks, workers)
@@ -0,0 +1,178 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.dispatch import Signal
+from django.utils import timezone
+
+from billing import debtors
+from billing.models import AccountBalance, AccountTransaction, Invoice
+
+ZERO = Decimal("0.00")
+
+# Массовые операции (bulk_create, QuerySet.update) не шлют сигналы моделей —
+# после них отправляется accounts_changed(account_ids=...), чтобы кэши по
+# лицевым счетам (cabinet.summary) сбросились так же, как после save().
+accounts_changed = Signal()
+
+
+def notify_accounts_changed(account_ids):
+    account_ids = set(account_ids)
+    if account_ids:
+        accounts_changed.send(sender=None, account_ids=account_ids)
+
+
+# ---------- Вклад одной записи в баланс счёта
+def transaction_amount(tx):
+    return tx.amount if tx.is_approved else ZERO
+
+
+def invoice_amount(invoice):
+    return -invoice.total_amount if invoice.is_posted else ZERO
+
+
+# ---------- Полный пересчёт (для создания строки баланса и сверки)
+def compute_balances(account_ids):
+    """Баланс по данным журнала для набора счетов (два агрегирующих запроса)."""
+    balances = {pk: ZERO for pk in account_ids}
+    paid = (
+        AccountTransaction.objects.filter(
+            personal_account_id__in=account_ids, is_approved=True
+        )
+        .values("personal_account_id")
+        .annotate(s=Sum("amount"))
+        .values_list("personal_account_id", "s")
+    )
+    for pk, s in paid:
+        balances[pk] += s
+    charged = (
+        Invoice.objects.filter(personal_account_id__in=account_ids, is_posted=True)
+        .values("personal_account_id")
+        .annotate(s=Sum("total_amount"))
+        .values_list("personal_account_id", "s")
+    )
+    for pk, s in charged:
+        balances[pk] -= s
+    return balances
+
+
+def compute_balance(account_id):
+    return compute_balances([account_id])[account_id]
+
+
+# ---------- Инкрементальное обновление
+def apply_delta(account_id, delta):
+    if not delta:
+        return
+    _apply_delta(account_id, delta)
+    debtors.sync([account_id])
+
+
+def _apply_delta(account_id, delta):
+    updated = AccountBalance.objects.filter(pk=account_id).update(
+        balance=F("balance") + delta, updated_at=timezone.now()
+    )
+    if updated:
+        return
+    # строки ещё нет — считаем баланс целиком, изменение в нём уже учтено
+    try:
+        with transaction.atomic():
+            AccountBalance.objects.create(
+                personal_account_id=account_id, balance=compute_balance(account_id)
+            )
+    except IntegrityError:
+        # параллельно строку уже создали — просто применяем дельту
+        AccountBalance.objects.filter(pk=account_id).update(
+            balance=F("balance") + delta, updated_at=timezone.now()
+        )
+
+
+def apply_change(old, new):
+    """old/new — пары (account_id, вклад) до и после изменения записи."""
+    if old and new and old[0] == new[0]:
+        apply_delta(new[0], new[1] - old[1])
+        return
+    if old:
+        apply_delta(old[0], -old[1])
+    if new:
+        apply_delta(new[0], new[1])
+
+
+def refresh_balances(account_ids):
+    """Пересчёт балансов после массовых операций в обход сигналов
+    (QuerySet.update, bulk_create проведённых записей и т.п.)."""
+    balances = compute_balances(list(account_ids))
+    existing = set(
+        AccountBalance.objects.filter(pk__in=balances).values_list("pk", flat=True)
+    )
+    now = timezone.now()
+    rows = [
+        AccountBalance(personal_account_id=pk, balance=b, updated_at=now)
+        for pk, b in balances.items()
+    ]
+    with transaction.atomic():
+        AccountBalance.objects.bulk_update(
+            [r for r in rows if r.pk in existing],
+            ["balance", "updated_at"],
+            batch_size=1000,
+        )
+        AccountBalance.objects.bulk_create(
+            [r for r in rows if r.pk not in existing], batch_size=1000
+        )
+        # сначала статусы оплаты: от них зависит debt_since в индексе должников
+        allocate_payments(balances)
+        debtors.sync(balances)
+        notify_accounts_changed(balances)
+    return balances
+
+
+# ---------- Статус оплаты квитанций
+def allocate_payments(account_ids):
+    """Проведённые платежи счёта гасят его проведённые квитанции от старых
+    к новым; сохраняет изменившиеся Invoice.payment_status (без сигналов)."""
+    account_ids = list(account_ids)
+    remaining = dict(
+        AccountTransaction.objects.filter(
+            personal_account_id__in=account_ids, is_approved=True
+        )
+        .values("personal_account_id")
+        .annotate(s=Sum("amount"))
+        .values_list("personal_account_id", "s")
+    )
+    invoices = (
+        Invoice.objects.filter(personal_account_id__in=account_ids)
+        .order_by("personal_account_id", "period_from", "id")
+        .values_list(
+            "id", "personal_account_id", "is_posted", "total_amount", "payment_status"
+        )
+    )
+    changed = {}
+    for pk, account_id, is_posted, total, current in invoices.iterator():
+        left = remaining.get(account_id) or ZERO
+        status = Invoice.STATUS_UNPAID
+        if is_posted and left >= total:
+            status = Invoice.STATUS_PAID
+            remaining[account_id] = left - total
+        elif is_posted and left > 0:
+            status = Invoice.STATUS_PARTIAL
+            remaining[account_id] = ZERO
+        if status != current:
+            changed.setdefault(status, []).append(pk)
+    for status, ids in changed.items():
+        for i in range(0, len(ids), 1000):
+            Invoice.objects.filter(pk__in=ids[i : i + 1000]).update(
+                payment_status=status
+            )
+    if changed:
+        # погашена старейшая квитанция — долг считается со следующей
+        debtors.update_since(account_ids)
+        notify_accounts_changed(account_ids)
+
+
+def get_balance(account_id):
+    balance = (
+        AccountBalance.objects.filter(pk=account_id)
+        .values_list("balance", flat=True)
+        .first()
+    )
+    return compute_balance(account_id) if balance is None else balance
@@ -0,0 +1,11 @@
+from django.core.management.base import CommandError
+
+from billing.periods import parse_month
+
+
+def parse_period(value):
+    """Строка ГГГГ-ММ -> (первый и последний день месяца)."""
+    try:
+        return parse_month(value)
+    except ValueError as exc:
+        raise CommandError(str(exc))
@@ -0,0 +1,43 @@
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from billing.anomalies import detect_anomalies
+
+from ._utils import parse_period
+
+
+class Command(BaseCommand):
+    help = "Проверяет новые показания счётчиков за месяц и помечает подозрительные"
+
+    def add_arguments(self, parser):
+        parser.add_argument("period", help="Месяц показаний, ГГГГ-ММ")
+        parser.add_argument("--house", type=int, default=None, help="ID дома")
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только посчитать, статусы не менять",
+        )
+
+    def handle(self, *args, **options):
+        period_start, period_end = parse_period(options["period"])
+        started = time.monotonic()
+        try:
+            stats = detect_anomalies(
+                period_start,
+                period_end,
+                house=options["house"],
+                dry_run=options["dry_run"],
+            )
+        except ImproperlyConfigured as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Проверено: {stats['checked']}, подозрительных: {stats['suspicious']} "
+                f"(откат: {stats['rollback']}, лишняя цифра: {stats['typo']}, "
+                f"всплеск: {stats['spike']}), без оценки (мало истории): "
+                f"{stats['skipped']} за {time.monotonic() - started:.1f} с"
+            )
+        )
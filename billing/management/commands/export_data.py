@@ -0,0 +1,58 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from billing.exports import EXPORTS, FORMATS, export_rows
+
+from ._utils import parse_period
+
+
+class Command(BaseCommand):
+    help = "Выгружает квитанции, транзакции или показания в CSV/XLSX потоком"
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(EXPORTS))
+        parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+        parser.add_argument("--house", type=int, default=None, help="ID дома")
+        parser.add_argument(
+            "--from", dest="period_from", default=None, help="С месяца, ГГГГ-ММ"
+        )
+        parser.add_argument(
+            "--to", dest="period_to", default=None, help="По месяц, ГГГГ-ММ"
+        )
+        parser.add_argument(
+            "--payment-item",
+            default=None,
+            help="Статья (название PaymentItems), только для транзакций",
+        )
+        parser.add_argument(
+            "-o", "--output", default=None, help="Файл (по умолчанию — stdout)"
+        )
+
+    def handle(self, *args, **options):
+        date_from = date_to = None
+        if options["period_from"]:
+            date_from = parse_period(options["period_from"])[0]
+        if options["period_to"]:
+            date_to = parse_period(options["period_to"])[1]
+        try:
+            headers, rows = export_rows(
+                options["kind"],
+                house=options["house"],
+                date_from=date_from,
+                date_to=date_to,
+                payment_item=options["payment_item"],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        stream, _ = FORMATS[options["format"]]
+        if options["output"]:
+            with open(options["output"], "wb") as fh:
+                for chunk in stream(headers, rows):
+                    fh.write(chunk)
+            self.stderr.write(self.style.SUCCESS(f"Выгружено в {options['output']}"))
+        else:
+            for chunk in stream(headers, rows):
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
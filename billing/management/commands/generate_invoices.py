@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from billing.invoicing import run_billing
+
+from ._utils import parse_period
+
+
+class Command(BaseCommand):
+    help = "Формирует квитанции за месяц по показаниям счётчиков и тарифам"
+
+    def add_arguments(self, parser):
+        parser.add_argument("period", help="Месяц начисления, ГГГГ-ММ")
+        parser.add_argument(
+            "--house",
+            type=int,
+            action="append",
+            dest="houses",
+            help="ID дома (можно несколько раз); по умолчанию — все дома",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Количество процессов (по умолчанию — число CPU)",
+        )
+
+    def handle(self, *args, **options):
+        period_from, period_to = parse_period(options["period"])
+        started = time.monotonic()
+        results = run_billing(
+            period_from,
+            period_to,
+            house_ids=options["houses"],
+            workers=options["workers"],
+        )
+        invoices = sum(r["invoices"] for r in results)
+        lines = sum(r["lines"] for r in results)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Домов: {len(results)}, квитанций: {invoices}, строк: {lines} "
+                f"за {time.monotonic() - started:.1f} с"
+            )
+        )
@@ -0,0 +1,35 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from billing.readings_import import BATCH_SIZE, import_readings
+
+
+class Command(BaseCommand):
+    help = "Импортирует показания счётчиков из CSV/XLSX (serial_number, date, value)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Файл CSV или XLSX")
+        parser.add_argument(
+            "--rejects",
+            default=None,
+            help="CSV-файл для отклонённых строк с причиной",
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            stats = import_readings(
+                options["path"],
+                rejects_path=options["rejects"],
+                batch_size=options["batch_size"],
+            )
+        except (OSError, ImproperlyConfigured) as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Строк: {stats['total']}, принято: {stats['accepted']}, "
+                f"отклонено: {stats['rejected']} "
+                f"({stats['seconds']:.1f} с, {stats['rows_per_second']:.0f} строк/с)"
+            )
+        )
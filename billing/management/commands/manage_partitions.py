@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from billing import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Создаёт помесячные секции показаний и транзакций на будущее "
+        "и отсоединяет устаревшие (только PostgreSQL)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            default=3,
+            help="Сколько месяцев вперёд создавать секции (по умолчанию 3)",
+        )
+        parser.add_argument(
+            "--retain",
+            type=int,
+            default=None,
+            help=(
+                "Отсоединять секции показаний старше указанного числа месяцев, "
+                f"не меньше {partitions.MIN_RETAIN_MONTHS}; последнее показание "
+                "счётчика остаётся в таблице (транзакции не отсоединяются)"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Секционирование поддерживается только на PostgreSQL")
+
+        try:
+            created, detached = partitions.maintain(
+                months_ahead=options["ahead"], retain_months=options["retain"]
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        for name in created:
+            self.stdout.write(f"Создана секция {name}")
+        for name in detached:
+            self.stdout.write(f"Отсоединена секция, архивная таблица {name}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Создано: {len(created)}, отсоединено: {len(detached)}")
+        )
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+
+from billing import debtors, ledger
+from billing.models import AccountBalance, PersonalAccount
+from core.parallel import process_map
+
+CHUNK_SIZE = 2000
+
+
+def _compute_chunk(account_ids):
+    return ledger.compute_balances(account_ids)
+
+
+class Command(BaseCommand):
+    help = "Сверяет балансы лицевых счетов с журналом и обновляет индекс должников"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Перезаписать расходящиеся балансы и пересобрать индекс должников",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Количество процессов (по умолчанию — число CPU)",
+        )
+
+    def handle(self, *args, **options):
+        ids = list(PersonalAccount.objects.order_by("id").values_list("id", flat=True))
+        chunks = [ids[i : i + CHUNK_SIZE] for i in range(0, len(ids), CHUNK_SIZE)]
+
+        drift = {}
+        for expected in process_map(_compute_chunk, chunks, options["workers"]):
+            stored = dict(
+                AccountBalance.objects.filter(pk__in=expected).values_list(
+                    "pk", "balance"
+                )
+            )
+            for pk, balance in expected.items():
+                if pk not in stored and not balance:
+                    continue  # строки ещё нет, но и движений по счёту не было
+                if stored.get(pk) != balance:
+                    drift[pk] = (stored.get(pk), balance)
+
+        for pk, (stored, balance) in sorted(drift.items())[:50]:
+            self.stdout.write(f"Счёт {pk}: сохранено {stored}, по журналу {balance}")
+        self.stdout.write(f"Счетов: {len(ids)}, расхождений: {len(drift)}")
+
+        if options["fix"]:
+            if drift:
+                ledger.refresh_balances(drift)
+            for chunk in chunks:
+                debtors.sync(chunk)
+            self.stdout.write(self.style.SUCCESS("Балансы и должники пересчитаны"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from billing import cashbox
+
+from ._utils import parse_period
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает дневной свод кассы по журналу транзакций"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--from", dest="period_from", default=None, help="С месяца, ГГГГ-ММ"
+        )
+        parser.add_argument(
+            "--to", dest="period_to", default=None, help="По месяц, ГГГГ-ММ"
+        )
+
+    def handle(self, *args, **options):
+        date_from = date_to = None
+        if options["period_from"]:
+            date_from = parse_period(options["period_from"])[0]
+        if options["period_to"]:
+            date_to = parse_period(options["period_to"])[1]
+        cashbox.rebuild(date_from, date_to)
+        self.stdout.write(self.style.SUCCESS("Свод кассы пересчитан"))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0004_accountbalance'),
+        ('core', '0005_alter_flat_floor_alter_floor_section_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Debtor',
+            fields=[
+                ('personal_account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='debtor', serialize=False, to='billing.personalaccount')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('debt_since', models.DateField()),
+                ('flat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.flat')),
+                ('floor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.floor')),
+                ('house', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.house')),
+                ('section', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.section')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['house', 'section', 'floor'], name='billing_deb_house_i_704467_idx')],
+            },
+        ),
+    ]
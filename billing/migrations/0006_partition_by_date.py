@@ -0,0 +1,139 @@
+from django.db import migrations
+
+# Декларативное секционирование по диапазону date (PostgreSQL).
+# Таблица пересоздаётся как секционированная с секцией DEFAULT, данные
+# переносятся, индексы и внешние ключи восстанавливаются под прежними
+# именами. Первичный ключ становится (id, date) — этого требует PostgreSQL;
+# для ORM первичным ключом остаётся id. Помесячные секции создаёт команда
+# manage_partitions. На других БД миграция ничего не делает.
+# Откат собирает обычную таблицу из всех секций, включая архивные
+# (отсоединённые manage_partitions --retain), и удаляет секции.
+TABLES = ["billing_meterreading", "billing_accounttransaction"]
+
+
+def _fetch(cursor, sql, params):
+    cursor.execute(sql, params)
+    return cursor.fetchall()
+
+
+def _definitions(schema_editor, table):
+    """(определения индексов, внешние ключи) таблицы, кроме ограничений."""
+    with schema_editor.connection.cursor() as cursor:
+        indexes = _fetch(
+            cursor,
+            "SELECT indexdef FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = %s "
+            "AND indexname NOT IN "
+            "(SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)",
+            [table, table],
+        )
+        foreign_keys = _fetch(
+            cursor,
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [table],
+        )
+    return indexes, foreign_keys
+
+
+def _restore(schema_editor, table, indexes, foreign_keys):
+    for (indexdef,) in indexes:
+        schema_editor.execute(indexdef)
+    for name, definition in foreign_keys:
+        schema_editor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+
+
+def partition_table(schema_editor, table):
+    indexes, foreign_keys = _definitions(schema_editor, table)
+
+    legacy = f"{table}_legacy"
+    schema_editor.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+    schema_editor.execute(
+        f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) "
+        f"PARTITION BY RANGE (date)"
+    )
+    schema_editor.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+    schema_editor.execute(f"INSERT INTO {table} SELECT * FROM {legacy}")
+    schema_editor.execute(f"DROP TABLE {legacy}")
+
+    # identity-столбец нельзя перенести в секционированную таблицу
+    # (до PostgreSQL 17) — заменяем его обычной последовательностью
+    seq = f"{table}_id_seq"
+    schema_editor.execute(f"CREATE SEQUENCE {seq} OWNED BY {table}.id")
+    schema_editor.execute(
+        f"SELECT setval('{seq}', COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+    )
+    schema_editor.execute(
+        f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{seq}')"
+    )
+    schema_editor.execute(
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, date)"
+    )
+    schema_editor.execute(f"CREATE INDEX {table}_date_idx ON {table} (date)")
+    _restore(schema_editor, table, indexes, foreign_keys)
+
+
+def unpartition_table(schema_editor, table):
+    indexes, foreign_keys = _definitions(schema_editor, table)
+    # индексы секционированной таблицы создаются "ON ONLY"; свой индекс
+    # по дате прямая миграция добавила сама
+    indexes = [
+        (indexdef.replace(" ON ONLY ", " ON "),)
+        for (indexdef,) in indexes
+        if f" {table}_date_idx " not in indexdef
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        archives = _fetch(
+            cursor,
+            "SELECT tablename FROM pg_tables "
+            "WHERE schemaname = current_schema() AND tablename LIKE %s",
+            [f"{table}\\_archive\\_%"],
+        )
+
+    partitioned = f"{table}_partitioned"
+    schema_editor.execute(f"ALTER TABLE {table} RENAME TO {partitioned}")
+    schema_editor.execute(f"CREATE TABLE {table} (LIKE {partitioned})")
+    schema_editor.execute(f"INSERT INTO {table} SELECT * FROM {partitioned}")
+    for (archive,) in archives:
+        schema_editor.execute(f"INSERT INTO {table} SELECT * FROM {archive}")
+        schema_editor.execute(f"DROP TABLE {archive}")
+    # вместе с таблицей удаляются секции и последовательность id
+    schema_editor.execute(f"DROP TABLE {partitioned} CASCADE")
+
+    # id снова identity-столбец, как его создаёт Django
+    schema_editor.execute(
+        f"ALTER TABLE {table} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY"
+    )
+    schema_editor.execute(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+        f"COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+    )
+    schema_editor.execute(
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id)"
+    )
+    _restore(schema_editor, table, indexes, foreign_keys)
+
+
+def forwards(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table in TABLES:
+        partition_table(schema_editor, table)
+
+
+def backwards(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table in TABLES:
+        unpartition_table(schema_editor, table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("billing", "0005_debtor"),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
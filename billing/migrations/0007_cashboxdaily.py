@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_rollups(apps, schema_editor):
+    # начальное заполнение свода по уже проведённым транзакциям
+    AccountTransaction = apps.get_model("billing", "AccountTransaction")
+    CashboxDaily = apps.get_model("billing", "CashboxDaily")
+    rows = (
+        AccountTransaction.objects.filter(is_approved=True)
+        .values("date", "type", "manager_id")
+        .annotate(s=Sum("amount"), n=Count("id"))
+        .order_by()
+    )
+    CashboxDaily.objects.bulk_create(
+        (
+            CashboxDaily(
+                date=r["date"],
+                item=r["type"],
+                manager_id=r["manager_id"],
+                amount=r["s"],
+                count=r["n"],
+            )
+            for r in rows.iterator(chunk_size=2000)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0006_partition_by_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CashboxDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('item', models.CharField(max_length=255)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('manager', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cashbox_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'item', 'manager'), name='cashbox_daily_unique')],
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
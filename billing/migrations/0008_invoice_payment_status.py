@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:13
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def allocate_payments(apps, schema_editor):
+    # начальный статус оплаты: платежи гасят проведённые квитанции от старых к новым
+    AccountTransaction = apps.get_model("billing", "AccountTransaction")
+    Invoice = apps.get_model("billing", "Invoice")
+    remaining = dict(
+        AccountTransaction.objects.filter(is_approved=True)
+        .values("personal_account_id")
+        .annotate(s=Sum("amount"))
+        .values_list("personal_account_id", "s")
+    )
+    changed = {}
+    invoices = (
+        Invoice.objects.filter(is_posted=True)
+        .order_by("personal_account_id", "period_from", "id")
+        .values_list("id", "personal_account_id", "total_amount")
+    )
+    for pk, account_id, total in invoices.iterator(chunk_size=2000):
+        left = remaining.get(account_id) or 0
+        if left >= total:
+            changed.setdefault("paid", []).append(pk)
+            remaining[account_id] = left - total
+        elif left > 0:
+            changed.setdefault("partial", []).append(pk)
+            remaining[account_id] = 0
+    for status, ids in changed.items():
+        for i in range(0, len(ids), 1000):
+            Invoice.objects.filter(pk__in=ids[i : i + 1000]).update(
+                payment_status=status
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0007_cashboxdaily'),
+        ('core', '0008_gallery_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='payment_status',
+            field=models.CharField(default='unpaid', max_length=16),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['flat', 'is_posted', '-create_date', '-id'], name='invoice_flat_posted_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['flat', 'payment_status', 'period_to'], name='invoice_flat_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['personal_account', 'period_from', 'id'], name='invoice_account_period_idx'),
+        ),
+        migrations.RunPython(allocate_payments, migrations.RunPython.noop),
+    ]
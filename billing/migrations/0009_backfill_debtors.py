@@ -0,0 +1,73 @@
+from django.db import migrations
+from django.db.models import Min, Sum
+from django.utils import timezone
+
+
+def fill_debtors(apps, schema_editor):
+    # индекс должников по журналу: отрицательный баланс, долг — со старейшей
+    # неоплаченной проведённой квитанции
+    AccountTransaction = apps.get_model("billing", "AccountTransaction")
+    Debtor = apps.get_model("billing", "Debtor")
+    Invoice = apps.get_model("billing", "Invoice")
+    PersonalAccount = apps.get_model("billing", "PersonalAccount")
+
+    balances = {}
+    paid = (
+        AccountTransaction.objects.filter(is_approved=True)
+        .values("personal_account_id")
+        .annotate(s=Sum("amount"))
+        .values_list("personal_account_id", "s")
+    )
+    for pk, s in paid:
+        balances[pk] = balances.get(pk, 0) + s
+    charged = (
+        Invoice.objects.filter(is_posted=True)
+        .values("personal_account_id")
+        .annotate(s=Sum("total_amount"))
+        .values_list("personal_account_id", "s")
+    )
+    for pk, s in charged:
+        balances[pk] = balances.get(pk, 0) - s
+    owing = {pk: -b for pk, b in balances.items() if b < 0}
+    if not owing:
+        return
+
+    since = dict(
+        Invoice.objects.filter(
+            is_posted=True, payment_status__in=("unpaid", "partial")
+        )
+        .values("personal_account_id")
+        .annotate(since=Min("create_date"))
+        .values_list("personal_account_id", "since")
+    )
+    today = timezone.localdate()
+    accounts = PersonalAccount.objects.filter(pk__in=list(owing)).values_list(
+        "pk", "house_id", "section_id", "flat__floor_id", "flat_id"
+    )
+    Debtor.objects.bulk_create(
+        [
+            Debtor(
+                personal_account_id=pk,
+                house_id=house_id,
+                section_id=section_id,
+                floor_id=floor_id,
+                flat_id=flat_id,
+                amount=owing[pk],
+                debt_since=since.get(pk, today),
+            )
+            for pk, house_id, section_id, floor_id, flat_id in accounts.iterator()
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,  # уже заполненные sync() строки не трогаем
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("billing", "0008_invoice_payment_status"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_debtors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def seed_counter(apps, schema_editor):
+    # нумерация продолжается после последней существующей квитанции
+    Invoice = apps.get_model("billing", "Invoice")
+    InvoiceNumberCounter = apps.get_model("billing", "InvoiceNumberCounter")
+    last = Invoice.objects.aggregate(m=Max("invoice_number"))["m"] or 0
+    InvoiceNumberCounter.objects.create(pk=1, last_number=last)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("billing", "0009_backfill_debtors"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InvoiceNumberCounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("last_number", models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_counter, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:57
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("billing", "0010_invoice_number_counter"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tariff",
+            name="price_version",
+            field=models.UUIDField(default=uuid.uuid4, editable=False),
+        ),
+    ]
@@ -1,5 +1,8 @@
+import uuid
+
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 
 class PaymentDetails(models.Model):
@@ -33,6 +36,9 @@ class Tariff(models.Model):
     tariff_name = models.CharField(max_length=255)
     tariff_description = models.TextField()
     last_date = models.DateTimeField()
+    # версия таблицы цен для кэша (billing.pricing): меняется при любой правке
+    # строк тарифа, услуг и единиц измерения
+    price_version = models.UUIDField(default=uuid.uuid4, editable=False)
 
 
 class TariffService(models.Model):
@@ -64,6 +70,10 @@ class Meter(models.Model):
 
 
 class MeterReading(models.Model):
+    STATUS_NEW = "new"
+    STATUS_CHECKED = "checked"
+    STATUS_SUSPICIOUS = "suspicious"  # не попадает в начисления до проверки
+
     number = models.CharField(max_length=255)
     date = models.DateField()
     meter = models.ForeignKey("billing.Meter", on_delete=models.CASCADE)
@@ -72,6 +82,14 @@ class MeterReading(models.Model):
 
 
 class Invoice(models.Model):
+    # Статус оплаты ведёт billing.ledger.allocate_payments: проведённые платежи
+    # счёта гасят проведённые квитанции от старых к новым
+    STATUS_UNPAID = "unpaid"
+    STATUS_PARTIAL = "partial"
+    STATUS_PAID = "paid"
+    OPEN_STATUSES = (STATUS_UNPAID, STATUS_PARTIAL)
+    OVERDUE_AFTER_DAYS = 30  # просрочена, если не оплачена через месяц после периода
+
     invoice_number = (
         models.IntegerField()
     )  # исправлено: invoce_number -> invoice_number
@@ -87,6 +105,26 @@ class Invoice(models.Model):
     tariff = models.ForeignKey("billing.Tariff", on_delete=models.PROTECT)
     is_posted = models.BooleanField()
     total_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    payment_status = models.CharField(max_length=16, default=STATUS_UNPAID)
+
+    class Meta:
+        indexes = [
+            # кабинет: квитанции квартир жителя по дате
+            models.Index(
+                fields=["flat", "is_posted", "-create_date", "-id"],
+                name="invoice_flat_posted_date_idx",
+            ),
+            # кабинет: оплаченные / просроченные
+            models.Index(
+                fields=["flat", "payment_status", "period_to"],
+                name="invoice_flat_status_idx",
+            ),
+            # распределение платежей по счёту (FIFO)
+            models.Index(
+                fields=["personal_account", "period_from", "id"],
+                name="invoice_account_period_idx",
+            ),
+        ]
 
 
 class InvoiceService(models.Model):  # исправлено: InvoiceSerсvice -> InvoiceService
@@ -117,3 +155,66 @@ class AccountTransaction(models.Model):
         on_delete=models.PROTECT,
         related_name="managed_transactions",
     )
+
+
+class AccountBalance(models.Model):
+    # Материализованный баланс лицевого счёта:
+    # проведённые платежи минус проведённые квитанции
+    personal_account = models.OneToOneField(
+        "billing.PersonalAccount",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="balance",
+    )
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class Debtor(models.Model):
+    # Индекс должников: строка есть, пока баланс лицевого счёта отрицательный
+    personal_account = models.OneToOneField(
+        "billing.PersonalAccount",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="debtor",
+    )
+    house = models.ForeignKey("core.House", on_delete=models.CASCADE)
+    section = models.ForeignKey("core.Section", on_delete=models.CASCADE)
+    floor = models.ForeignKey("core.Floor", on_delete=models.CASCADE)
+    flat = models.ForeignKey("core.Flat", on_delete=models.CASCADE)
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    debt_since = models.DateField()
+
+    class Meta:
+        indexes = [models.Index(fields=["house", "section", "floor"])]
+
+    @property
+    def days_overdue(self):
+        return (timezone.localdate() - self.debt_since).days
+
+
+class CashboxDaily(models.Model):
+    # Свод кассы: проведённые транзакции за день по статье и менеджеру.
+    # Ведётся сигналами (billing.cashbox), страница кассы читает только его.
+    date = models.DateField()
+    item = models.CharField(max_length=255)  # AccountTransaction.type — статья
+    manager = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="cashbox_rollups",
+    )
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "item", "manager"], name="cashbox_daily_unique"
+            )
+        ]
+
+
+class InvoiceNumberCounter(models.Model):
+    # Одна строка: последний выданный номер квитанции. Номера выдаёт
+    # billing.invoicing.reserve_numbers под блокировкой этой строки.
+    last_number = models.IntegerField(default=0)
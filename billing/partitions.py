@@ -0,0 +1,147 @@
+import re
+from datetime import date
+
+from django.db import connection, transaction
+
+from billing.anomalies import HISTORY_DAYS
+from billing.models import AccountTransaction, MeterReading
+
+# Таблицы, секционированные по date (миграция 0006_partition_by_date)
+PARTITIONED_MODELS = [MeterReading, AccountTransaction]
+# Старые секции отсоединяются только у показаний: транзакции нужны целиком
+# для баланса лицевых счетов (billing.ledger) и его сверки.
+DETACHABLE_MODELS = [MeterReading]
+# Поиск аномалий берёт историю за HISTORY_DAYS — её не отсоединяем
+MIN_RETAIN_MONTHS = HISTORY_DAYS // 30 + 1
+
+PARTITION_RE = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+def add_months(d, months):
+    y, m = divmod(d.year * 12 + d.month - 1 + months, 12)
+    return date(y, m + 1, 1)
+
+
+def partition_name(table, month_start):
+    return f"{table}_p{month_start:%Y%m}"
+
+
+def attached_partitions(table):
+    """Помесячные секции таблицы: {первое число месяца: имя секции}."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass",
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    result = {}
+    for name in names:
+        match = PARTITION_RE.search(name)
+        if match:
+            result[date(int(match[1]), int(match[2]), 1)] = name
+    return result
+
+
+def default_months(table):
+    """Месяцы, строки которых ещё лежат в секции DEFAULT."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', date)::date FROM {table}_default"
+        )
+        return sorted(row[0] for row in cursor.fetchall())
+
+
+def create_partition(table, month_start):
+    """Создаёт секцию месяца; строки этого месяца из DEFAULT переносятся в неё."""
+    name = partition_name(table, month_start)
+    month_end = add_months(month_start, 1)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {table}_default "
+            f"WHERE date >= %s AND date < %s RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved",
+            [month_start, month_end],
+        )
+        cursor.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+            [month_start, month_end],
+        )
+    return name
+
+
+def _keep_last_readings(cursor, table, name):
+    """Возвращает в таблицу последние показания счётчиков из отсоединённой секции.
+
+    От последнего показания считают расход начисления (billing.invoicing)
+    и проверяют импорт (billing.readings_import), поэтому оно не уходит
+    в архив, пока у счётчика нет более нового. Месяц секции уже не покрыт
+    диапазоном, и строки ложатся в DEFAULT.
+    """
+    newer = (
+        "SELECT 1 FROM {rel} o WHERE o.meter_id = r.meter_id "
+        "AND o.status <> %s AND (o.date, o.id) > (r.date, r.id)"
+    )
+    suspicious = MeterReading.STATUS_SUSPICIOUS
+    cursor.execute(
+        f"WITH kept AS (DELETE FROM {name} r WHERE r.status <> %s "
+        f"AND NOT EXISTS ({newer.format(rel=name)}) "
+        f"AND NOT EXISTS ({newer.format(rel=table)}) RETURNING *) "
+        f"INSERT INTO {table} SELECT * FROM kept",
+        [suspicious, suspicious, suspicious],
+    )
+
+
+def detach_partition(table, month_start):
+    # секция остаётся отдельной архивной таблицей; имя меняем, чтобы
+    # при появлении строк за этот месяц можно было создать секцию заново
+    name = partition_name(table, month_start)
+    archive = f"{table}_archive_{month_start:%Y%m}"
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+        if table == MeterReading._meta.db_table:
+            _keep_last_readings(cursor, table, name)
+        cursor.execute("SELECT to_regclass(%s)", [archive])
+        if cursor.fetchone()[0] is None:
+            cursor.execute(f"ALTER TABLE {name} RENAME TO {archive}")
+        else:
+            # месяц уже архивировали раньше — дописываем строки в архив
+            cursor.execute(f"INSERT INTO {archive} SELECT * FROM {name}")
+            cursor.execute(f"DROP TABLE {name}")
+    return archive
+
+
+def maintain(months_ahead=3, retain_months=None, today=None):
+    """Создаёт секции до текущего месяца + months_ahead и отсоединяет старые.
+
+    Секции показаний отсоединяются не раньше чем через MIN_RETAIN_MONTHS.
+    Возвращает (созданные секции, отсоединённые секции).
+    """
+    if retain_months is not None and retain_months < MIN_RETAIN_MONTHS:
+        raise ValueError(
+            f"Показания нужно хранить не меньше {MIN_RETAIN_MONTHS} месяцев "
+            f"(история для поиска аномалий)"
+        )
+    current = (today or date.today()).replace(day=1)
+    created, detached = [], []
+    for model in PARTITIONED_MODELS:
+        table = model._meta.db_table
+        existing = attached_partitions(table)
+        wanted = set(default_months(table))
+        wanted.update(add_months(current, i) for i in range(months_ahead + 1))
+        cutoff = None
+        if retain_months is not None and model in DETACHABLE_MODELS:
+            cutoff = add_months(current, -retain_months)
+            # запоздавшие строки за архивные месяцы остаются в DEFAULT:
+            # секция для них сразу ушла бы в архив
+            wanted = {m for m in wanted if m >= cutoff}
+        for month_start in sorted(wanted - existing.keys()):
+            created.append(create_partition(table, month_start))
+
+        if cutoff is not None:
+            for month_start in sorted(existing):
+                if month_start < cutoff:
+                    detached.append(detach_partition(table, month_start))
+    return created, detached
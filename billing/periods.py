@@ -0,0 +1,12 @@
+import calendar
+from datetime import date
+
+
+def parse_month(value):
+    """Строка ГГГГ-ММ -> (первый и последний день месяца); ValueError при ошибке."""
+    try:
+        year, month = (int(p) for p in value.split("-"))
+        last_day = calendar.monthrange(year, month)[1]
+    except (AttributeError, ValueError, calendar.IllegalMonthError):
+        raise ValueError(f"Период должен быть в формате ГГГГ-ММ, получено: {value}")
+    return date(year, month, 1), date(year, month, last_day)
@@ -0,0 +1,44 @@
+import uuid
+from collections import namedtuple
+from functools import lru_cache
+from types import MappingProxyType
+
+from billing.models import Tariff, TariffService
+
+PriceEntry = namedtuple("PriceEntry", "price currency unit service_name")
+
+
+# ---------- Скомпилированная таблица цен тарифа
+# Ключ кэша — (id тарифа, price_version): любое изменение строк тарифа, услуги
+# или единицы измерения меняет версию, и все процессы сами переходят на новую
+# таблицу. Дата тарифа (last_date) — поле для пользователей, его не трогаем.
+@lru_cache(maxsize=512)
+def _compile(tariff_id, version):
+    rows = TariffService.objects.filter(tariff_id=tariff_id).values_list(
+        "service_id",
+        "price",
+        "currency",
+        "service__MeasurementUnit__MeasurementUnit_name",
+        "service__Service_name",
+    )
+    return MappingProxyType(
+        {service_id: PriceEntry(*rest) for service_id, *rest in rows}
+    )
+
+
+def price_table(tariff):
+    """service_id -> PriceEntry для экземпляра Tariff (только чтение)."""
+    return _compile(tariff.pk, tariff.price_version)
+
+
+def price_tables(tariff_ids):
+    """tariff_id -> таблица цен; версии тарифов — одним запросом."""
+    versions = Tariff.objects.filter(pk__in=set(tariff_ids)).values_list(
+        "pk", "price_version"
+    )
+    return {pk: _compile(pk, version) for pk, version in versions}
+
+
+def touch_tariffs(**filters):
+    """Новая версия цен тарифов по фильтру -> новый ключ кэша во всех процессах."""
+    Tariff.objects.filter(**filters).update(price_version=uuid.uuid4())
@@ -0,0 +1,217 @@
+import csv
+import io
+import time
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+
+from billing.models import Meter, MeterReading
+
+BATCH_SIZE = 5000
+DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y")
+
+
+# ---------- Чтение файла построчно (CSV / XLSX), без загрузки целиком
+def _iter_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        reader = csv.DictReader(fh)
+        for line_no, row in enumerate(reader, start=2):
+            yield line_no, row
+
+
+def _iter_xlsx(path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImproperlyConfigured("Для импорта XLSX нужен пакет openpyxl")
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [str(h or "").strip() for h in next(rows, ())]
+        for line_no, values in enumerate(rows, start=2):
+            yield line_no, dict(zip(header, values))
+    finally:
+        wb.close()
+
+
+def iter_rows(path):
+    if Path(path).suffix.lower() == ".xlsx":
+        return _iter_xlsx(path)
+    return _iter_csv(path)
+
+
+# ---------- Индекс счётчиков: serial_number -> [id, дата и значение последнего показания]
+def build_meter_index():
+    # подозрительные показания не считаются последними — как и в начислениях
+    last = (
+        MeterReading.objects.filter(meter=OuterRef("pk"))
+        .exclude(status=MeterReading.STATUS_SUSPICIOUS)
+        .order_by("-date", "-id")
+    )
+    rows = (
+        Meter.objects.filter(is_active=True)
+        .annotate(
+            last_date=Subquery(last.values("date")[:1]),
+            last_value=Subquery(last.values("value")[:1]),
+        )
+        .values_list("serial_number", "id", "last_date", "last_value")
+    )
+    return {serial: [meter_id, d, v] for serial, meter_id, d, v in rows}
+
+
+def _parse_date(raw):
+    if isinstance(raw, datetime):
+        return raw.date()
+    if isinstance(raw, date):
+        return raw
+    raw = str(raw or "").strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(raw, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError("неверная дата")
+
+
+def _parse_value(raw):
+    try:
+        value = Decimal(str(raw).strip().replace(",", "."))
+    except (InvalidOperation, AttributeError):
+        raise ValueError("неверное значение")
+    if not value.is_finite():
+        raise ValueError("неверное значение")
+    if value < 0:
+        raise ValueError("отрицательное значение")
+    return value.quantize(Decimal("0.001"))
+
+
+def validate_batch(batch, index):
+    """Возвращает (принятые строки, отклонённые строки) для пачки."""
+    accepted, rejected = [], []
+    for line_no, row in batch:
+        serial = str(row.get("serial_number") or "").strip()
+        try:
+            entry = index.get(serial)
+            if entry is None:
+                raise ValueError("счётчик не найден")
+            reading_date = _parse_date(row.get("date"))
+            value = _parse_value(row.get("value"))
+            meter_id, last_date, last_value = entry
+            if last_date is not None and reading_date < last_date:
+                raise ValueError("дата раньше последнего показания")
+            if last_value is not None and value < last_value:
+                raise ValueError("значение меньше последнего показания")
+        except ValueError as exc:
+            rejected.append((line_no, row, str(exc)))
+            continue
+        # следующие строки того же счётчика сверяются уже с этой
+        entry[1], entry[2] = reading_date, value
+        # колонку status из файла не читаем: импортированное показание
+        # всегда новое и проходит проверку на аномалии (billing.anomalies)
+        accepted.append(
+            (
+                str(row.get("number") or "").strip(),
+                reading_date,
+                meter_id,
+                value,
+                MeterReading.STATUS_NEW,
+            )
+        )
+    return accepted, rejected
+
+
+# ---------- Запись: COPY на PostgreSQL, bulk_create на остальных БД
+def _copy_rows(rows):
+    opts = MeterReading._meta
+    columns = ", ".join(
+        opts.get_field(name).column
+        for name in ("number", "date", "meter", "value", "status")
+    )
+    number = opts.get_field("number").column
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    # пустой номер в CSV для COPY — NULL; FORCE_NOT_NULL оставляет пустую строку
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {opts.db_table} ({columns}) FROM STDIN "
+            f"WITH (FORMAT csv, FORCE_NOT_NULL ({number}))",
+            buf,
+        )
+
+
+def _bulk_create_rows(rows):
+    MeterReading.objects.bulk_create(
+        [
+            MeterReading(
+                number=number, date=d, meter_id=meter_id, value=value, status=status
+            )
+            for number, d, meter_id, value, status in rows
+        ],
+        batch_size=1000,
+    )
+
+
+def write_rows(rows):
+    if not rows:
+        return
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            _copy_rows(rows)
+        else:
+            _bulk_create_rows(rows)
+
+
+def import_readings(path, rejects_path=None, batch_size=BATCH_SIZE):
+    """Потоковый импорт показаний; возвращает статистику прогона."""
+    started = time.monotonic()
+    index = build_meter_index()
+    stats = {"total": 0, "accepted": 0, "rejected": 0}
+
+    rejects_fh = rejects_writer = None
+    if rejects_path:
+        rejects_fh = open(rejects_path, "w", newline="", encoding="utf-8")
+        rejects_writer = csv.writer(rejects_fh)
+        rejects_writer.writerow(["line", "serial_number", "date", "value", "reason"])
+
+    def flush(batch):
+        accepted, rejected = validate_batch(batch, index)
+        write_rows(accepted)
+        stats["accepted"] += len(accepted)
+        stats["rejected"] += len(rejected)
+        if rejects_writer:
+            for line_no, row, reason in rejected:
+                rejects_writer.writerow(
+                    [
+                        line_no,
+                        row.get("serial_number"),
+                        row.get("date"),
+                        row.get("value"),
+                        reason,
+                    ]
+                )
+
+    try:
+        batch = []
+        for item in iter_rows(path):
+            batch.append(item)
+            stats["total"] += 1
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    finally:
+        if rejects_fh:
+            rejects_fh.close()
+
+    stats["seconds"] = time.monotonic() - started
+    stats["rows_per_second"] = (
+        stats["total"] / stats["seconds"] if stats["seconds"] else 0
+    )
+    return stats
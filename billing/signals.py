@@ -0,0 +1,109 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from billing import cashbox, ledger, pricing
+from billing.models import (
+    AccountTransaction,
+    Invoice,
+    MeasurementUnit,
+    Service,
+    TariffService,
+)
+from core import events
+from core.models import Flat
+
+# модель -> функция вклада записи в баланс лицевого счёта
+LEDGER_MODELS = {
+    AccountTransaction: ledger.transaction_amount,
+    Invoice: ledger.invoice_amount,
+}
+
+
+def _ledger_entry(instance):
+    amount = LEDGER_MODELS[type(instance)](instance)
+    return instance.personal_account_id, amount
+
+
+# ---------- Баланс лицевого счёта
+@receiver(pre_save, sender=AccountTransaction)
+@receiver(pre_save, sender=Invoice)
+def remember_ledger_entry(sender, instance, **kwargs):
+    instance._ledger_old = instance._cashbox_old = None
+    instance._posted_old = False
+    if instance.pk and not instance._state.adding:
+        old = sender.objects.filter(pk=instance.pk).first()
+        if old is not None:
+            instance._ledger_old = _ledger_entry(old)
+            instance._posted_old = getattr(old, "is_posted", False)
+            if sender is AccountTransaction:
+                instance._cashbox_old = cashbox.cashbox_entry(old)
+
+
+@receiver(post_save, sender=AccountTransaction)
+@receiver(post_save, sender=Invoice)
+def update_balance_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old, new = getattr(instance, "_ledger_old", None), _ledger_entry(instance)
+    ledger.apply_change(old, new)
+    # у квитанции мог смениться и период — порядок погашения пересчитываем всегда
+    if old != new or sender is Invoice:
+        ledger.allocate_payments({e[0] for e in (old, new) if e})
+    if sender is AccountTransaction:
+        cashbox.apply_change(
+            getattr(instance, "_cashbox_old", None), cashbox.cashbox_entry(instance)
+        )
+    elif instance.is_posted and not getattr(instance, "_posted_old", False):
+        _publish_invoice(instance)
+
+
+def _publish_invoice(invoice):
+    """Проведённая квитанция — владельцу квартиры и персоналу (SSE)."""
+    owner_ids = Flat.objects.filter(pk=invoice.flat_id).values_list(
+        "user_id", flat=True
+    )
+    channels = [events.STAFF_CHANNEL]
+    channels += [events.user_channel(pk) for pk in owner_ids if pk]
+    events.publish(
+        channels,
+        "invoice",
+        {
+            "id": invoice.pk,
+            "number": invoice.invoice_number,
+            "amount": invoice.total_amount,
+            "text": f"Квитанция №{invoice.invoice_number} на {invoice.total_amount}",
+        },
+    )
+
+
+@receiver(post_delete, sender=AccountTransaction)
+@receiver(post_delete, sender=Invoice)
+def update_balance_on_delete(sender, instance, **kwargs):
+    ledger.apply_change(_ledger_entry(instance), None)
+    ledger.allocate_payments([instance.personal_account_id])
+    if sender is AccountTransaction:
+        cashbox.apply_change(cashbox.cashbox_entry(instance), None)
+
+
+# ---------- Версия тарифа для кэша таблиц цен
+@receiver(post_save, sender=TariffService)
+@receiver(post_delete, sender=TariffService)
+def tariff_prices_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    pricing.touch_tariffs(pk=instance.tariff_id)
+
+
+# название услуги и единица измерения тоже входят в таблицу цен
+@receiver(post_save, sender=Service)
+def service_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    pricing.touch_tariffs(tariffservice__service=instance)
+
+
+@receiver(post_save, sender=MeasurementUnit)
+def measurement_unit_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    pricing.touch_tariffs(tariffservice__service__MeasurementUnit=instance)
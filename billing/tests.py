@@ -1 +1,775 @@
-# Create your tests here.
+import csv
+import importlib
+import io
+import os
+import tempfile
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+from xml.etree import ElementTree
+
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from billing import cashbox, debtors, exports, invoice_pdf, ledger, partitions
+from billing.anomalies import score_readings
+from billing.invoicing import bill_house, reserve_numbers
+from billing.models import (
+    AccountBalance,
+    AccountTransaction,
+    CashboxDaily,
+    Debtor,
+    Invoice,
+    InvoiceService,
+    MeasurementUnit,
+    Meter,
+    MeterReading,
+    PersonalAccount,
+    Service,
+    Tariff,
+    TariffService,
+)
+from billing.pricing import price_tables
+from billing.readings_import import build_meter_index, import_readings
+from billing.timeseries import ReadingSeries, month_index, np
+from core.models import Flat, Floor, House, Section, User
+
+PERIOD = (date(2025, 7, 1), date(2025, 7, 31))
+
+
+def readings(meter_id, first_id, values, start=date(2025, 1, 20), step=30):
+    """Строки для ReadingSeries.from_rows: показания раз в step дней."""
+    return [
+        (meter_id, start + timedelta(days=i * step), Decimal(v), first_id + i)
+        for i, v in enumerate(values)
+    ]
+
+
+# ---------- Ряды показаний в массивах NumPy
+class ReadingSeriesTests(SimpleTestCase):
+    def series(self):
+        # счётчик 1: январь, март (пропуск февраля), апрель — два показания
+        # счётчик 2: одно показание в феврале
+        return ReadingSeries.from_rows(
+            [
+                (1, date(2025, 1, 31), Decimal("10.5"), 1),
+                (1, date(2025, 3, 31), Decimal("30.5"), 2),
+                (1, date(2025, 4, 10), Decimal("35"), 3),
+                (1, date(2025, 4, 30), Decimal("40.125"), 4),
+                (2, date(2025, 2, 15), Decimal("7"), 5),
+            ]
+        )
+
+    def test_rows_are_grouped_by_meter(self):
+        series = self.series()
+        self.assertEqual(len(series), 5)
+        self.assertEqual(series.meter_ids.tolist(), [1, 2])
+        self.assertEqual(series.offsets.tolist(), [0, 4, 5])
+        self.assertEqual(series.segment(2), slice(4, 5))
+        self.assertEqual(series.segment(3), slice(0, 0))
+        self.assertEqual(series.to_decimal(series.values[3]), Decimal("40.125"))
+
+    def test_deltas_skip_first_reading_of_each_meter(self):
+        delta, valid = self.series().deltas()
+        self.assertEqual(valid.tolist(), [False, True, True, True, False])
+        self.assertEqual(delta.tolist(), [0, 20000, 4500, 5125, 0])
+
+    def test_month_end_values_take_last_reading_of_month(self):
+        meter_idx, months, values = self.series().month_end_values()
+        jan = month_index(2025, 1)
+        self.assertEqual(meter_idx.tolist(), [0, 0, 0, 1])
+        self.assertEqual(months.tolist(), [jan, jan + 2, jan + 3, jan + 1])
+        self.assertEqual(values.tolist(), [10500, 30500, 40125, 7000])
+
+    def test_monthly_readings_interpolate_inner_gaps_only(self):
+        dec, may = month_index(2024, 12), month_index(2025, 5)
+        grid = self.series().monthly_readings(dec, may)
+        nan = float("nan")
+        np.testing.assert_array_equal(
+            grid,
+            [
+                [nan, 10.5, 20.5, 30.5, 40.125, nan],
+                [nan, nan, 7.0, nan, nan, nan],
+            ],
+        )
+        raw = self.series().monthly_readings(dec, may, fill=False)
+        self.assertTrue(np.isnan(raw[0, 2]))
+
+    def test_monthly_consumption(self):
+        jan = month_index(2025, 1)
+        grid = self.series().monthly_consumption(jan + 1, jan + 3)
+        np.testing.assert_array_equal(grid[0], [10.0, 10.0, 9.625])
+        self.assertTrue(np.isnan(grid[1]).all())
+
+
+# ---------- Поиск аномальных показаний
+class ScoreReadingsTests(SimpleTestCase):
+    def score(self, *meters, pending):
+        series = ReadingSeries.from_rows(sum(meters, []))
+        return score_readings(series, *PERIOD, pending)
+
+    def test_regular_consumption_is_checked(self):
+        # история: 30 ед. за 30 дней; новое показание 2025-07-19 в том же темпе
+        rows = readings(1, 1, [100, 130, 160, 190, 220, 250, 280])
+        checked, suspicious, reasons = self.score(rows, pending=[7])
+        self.assertEqual(checked, [7])
+        self.assertEqual(suspicious, [])
+        self.assertEqual(reasons, {"rollback": 0, "typo": 0, "spike": 0})
+
+    def test_rollback(self):
+        rows = readings(1, 1, [100, 130, 160, 190, 220, 250, 240])
+        checked, suspicious, reasons = self.score(rows, pending=[7])
+        self.assertEqual((checked, suspicious), ([], [7]))
+        self.assertEqual(reasons["rollback"], 1)
+
+    def test_extra_digit(self):
+        # ожидалось 250 + 30 = 280; 2800 — это ×10 от ожидаемого
+        # (от предыдущего 250 — ×11.2, вне TYPO_RATIO)
+        rows = readings(1, 1, [100, 130, 160, 190, 220, 250, 2800])
+        _, suspicious, reasons = self.score(rows, pending=[7])
+        self.assertEqual(suspicious, [7])
+        self.assertEqual(reasons, {"rollback": 0, "typo": 1, "spike": 0})
+
+    def test_spike(self):
+        rows = readings(1, 1, [100, 130, 160, 190, 220, 250, 600])
+        _, suspicious, reasons = self.score(rows, pending=[7])
+        self.assertEqual(suspicious, [7])
+        self.assertEqual(reasons["spike"], 1)
+
+    def test_low_consumption_is_not_a_spike(self):
+        # пустующая квартира: расход 0 — ниже обычного, но не подозрителен
+        rows = readings(1, 1, [100, 130, 160, 190, 220, 250, 250])
+        checked, suspicious, reasons = self.score(rows, pending=[7])
+        self.assertEqual((checked, suspicious), ([7], []))
+        self.assertEqual(sum(reasons.values()), 0)
+
+    def test_short_history_is_left_unscored(self):
+        # два интервала истории — меньше MIN_HISTORY: ни проверено, ни подозрительно
+        for last in (190, 600, 2800):
+            rows = readings(1, 1, [100, 130, 160, last], start=date(2025, 4, 20))
+            self.assertEqual(self.score(rows, pending=[4])[:2], ([], []))
+
+    def test_first_reading_of_meter_is_left_unscored(self):
+        rows = readings(1, 1, [100], start=date(2025, 7, 19))
+        self.assertEqual(self.score(rows, pending=[1])[:2], ([], []))
+
+    def test_rollback_is_caught_with_short_history(self):
+        rows = readings(1, 1, [100, 130, 120], start=date(2025, 5, 20))
+        self.assertEqual(self.score(rows, pending=[3])[:2], ([], [3]))
+
+    def test_meters_scored_independently(self):
+        quiet = readings(1, 1, [100, 130, 160, 190, 220, 250, 280])
+        busy = readings(2, 101, [0, 300, 600, 900, 1200, 1500, 1800])
+        checked, suspicious, _ = self.score(quiet, busy, pending=[7, 107])
+        self.assertEqual(sorted(checked), [7, 107])
+        self.assertEqual(suspicious, [])
+
+    def test_only_pending_readings_are_returned(self):
+        # показание периода уже проверено раньше — в результат не попадает
+        rows = readings(1, 1, [100, 130, 160, 190, 220, 250, 600])
+        checked, suspicious, reasons = self.score(rows, pending=[])
+        self.assertEqual((checked, suspicious), ([], []))
+        self.assertEqual(sum(reasons.values()), 0)
+
+
+# ---------- Баланс лицевого счёта и статус оплаты квитанций
+class AccountTestCase(TestCase):
+    """Один лицевой счёт; квитанции и платежи создаются через ORM с сигналами."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="owner")
+        cls.tariff = Tariff.objects.create(
+            tariff_name="Базовый", tariff_description="", last_date=timezone.now()
+        )
+        cls.house = House.objects.create(house_name="Дом", address="ул. 1")
+        cls.section = Section.objects.create(house=cls.house, section_name="1")
+        floor = Floor.objects.create(section=cls.section, number=1)
+        cls.flat = Flat.objects.create(
+            number_flat=1, square=50, floor=floor, user=cls.user, tariff=cls.tariff
+        )
+        cls.account = PersonalAccount.objects.create(
+            number=1, status=True, house=cls.house, section=cls.section, flat=cls.flat
+        )
+
+    def invoice(self, month, amount, is_posted=True):
+        return Invoice.objects.create(
+            invoice_number=month,
+            create_date=date(2025, month, 1),
+            house=self.house,
+            section=self.section,
+            flat=self.flat,
+            personal_account=self.account,
+            period_from=date(2025, month, 1),
+            period_to=date(2025, month, 28),
+            tariff=self.tariff,
+            is_posted=is_posted,
+            total_amount=Decimal(amount),
+        )
+
+    def pay(self, amount, is_approved=True):
+        return AccountTransaction.objects.create(
+            number="1",
+            date=date(2025, 6, 1),
+            type="Приход",
+            personal_account=self.account,
+            user=self.user,
+            amount=Decimal(amount),
+            comment="",
+            is_approved=is_approved,
+            manager=self.user,
+        )
+
+    def statuses(self):
+        return list(
+            Invoice.objects.order_by("period_from").values_list(
+                "payment_status", flat=True
+            )
+        )
+
+
+class AllocatePaymentsTests(AccountTestCase):
+    def test_oldest_invoices_are_paid_first(self):
+        self.invoice(3, "100.00")
+        self.invoice(1, "100.00")
+        self.invoice(2, "100.00")
+        self.pay("150.00")
+        self.assertEqual(
+            self.statuses(),
+            [Invoice.STATUS_PAID, Invoice.STATUS_PARTIAL, Invoice.STATUS_UNPAID],
+        )
+
+    def test_unposted_invoices_and_payments_are_ignored(self):
+        self.invoice(1, "100.00", is_posted=False)
+        self.invoice(2, "100.00")
+        self.pay("100.00")
+        self.pay("500.00", is_approved=False)
+        self.assertEqual(self.statuses(), [Invoice.STATUS_UNPAID, Invoice.STATUS_PAID])
+
+    def test_bulk_changes(self):
+        # QuerySet.update обходит сигналы — статусы пересчитывает allocate_payments
+        self.invoice(1, "100.00")
+        self.invoice(2, "100.00")
+        payment = self.pay("200.00")
+        AccountTransaction.objects.filter(pk=payment.pk).update(amount=Decimal("50.00"))
+        ledger.allocate_payments([self.account.pk])
+        self.assertEqual(
+            self.statuses(), [Invoice.STATUS_PARTIAL, Invoice.STATUS_UNPAID]
+        )
+
+    def test_debt_since_follows_oldest_open_invoice(self):
+        self.invoice(1, "100.00")
+        self.invoice(2, "100.00")
+        debtor = Debtor.objects.get(personal_account=self.account)
+        self.assertEqual(debtor.debt_since, date(2025, 1, 1))
+
+        self.pay("100.00")
+        debtor.refresh_from_db()
+        self.assertEqual(debtor.debt_since, date(2025, 2, 1))
+
+
+class LedgerTests(AccountTestCase):
+    def balance(self):
+        return AccountBalance.objects.get(pk=self.account.pk).balance
+
+    def test_signals_keep_balance(self):
+        invoice = self.invoice(1, "100.00")
+        self.assertEqual(self.balance(), Decimal("-100.00"))
+        payment = self.pay("60.00")
+        self.assertEqual(self.balance(), Decimal("-40.00"))
+
+        payment.is_approved = False
+        payment.save()
+        self.assertEqual(self.balance(), Decimal("-100.00"))
+        invoice.total_amount = Decimal("80.00")
+        invoice.save()
+        self.assertEqual(self.balance(), Decimal("-80.00"))
+        invoice.delete()
+        self.assertEqual(self.balance(), Decimal("0.00"))
+        self.assertEqual(self.balance(), ledger.compute_balance(self.account.pk))
+
+    def test_unposted_invoice_does_not_charge(self):
+        self.invoice(1, "100.00", is_posted=False)
+        self.assertEqual(ledger.get_balance(self.account.pk), Decimal("0.00"))
+
+    def test_debtor_index_follows_balance(self):
+        self.invoice(1, "100.00")
+        self.assertEqual(Debtor.objects.get().amount, Decimal("100.00"))
+        self.pay("100.00")
+        self.assertFalse(Debtor.objects.exists())
+
+    def test_refresh_after_bulk_changes(self):
+        # QuerySet.update обходит сигналы: баланс, статусы и должников
+        # пересчитывает refresh_balances, статусы — раньше индекса должников
+        self.invoice(1, "100.00", is_posted=False)
+        self.invoice(2, "100.00", is_posted=False)
+        self.pay("100.00")
+        Invoice.objects.update(is_posted=True)
+
+        ledger.refresh_balances([self.account.pk])
+        self.assertEqual(self.balance(), Decimal("-100.00"))
+        self.assertEqual(self.statuses(), [Invoice.STATUS_PAID, Invoice.STATUS_UNPAID])
+        self.assertEqual(Debtor.objects.get().debt_since, date(2025, 2, 1))
+
+    def rebuild(self, *args):
+        out = io.StringIO()
+        call_command("rebuild_balances", *args, workers=1, stdout=out)
+        return out.getvalue()
+
+    def test_rebuild_reports_drift(self):
+        self.invoice(1, "100.00")
+        idle = PersonalAccount.objects.create(
+            number=2,
+            status=True,
+            house=self.house,
+            section=self.section,
+            flat=self.flat,
+        )
+        # у счёта без движений строки баланса нет — это не расхождение
+        self.assertFalse(AccountBalance.objects.filter(pk=idle.pk).exists())
+        self.assertIn("расхождений: 0", self.rebuild())
+
+        AccountBalance.objects.filter(pk=self.account.pk).update(balance=0)
+        self.assertIn("расхождений: 1", self.rebuild())
+        self.rebuild("--fix")
+        self.assertEqual(self.balance(), Decimal("-100.00"))
+        self.assertIn("расхождений: 0", self.rebuild())
+
+
+class DebtorsTests(AccountTestCase):
+    def test_index_follows_balance_and_location(self):
+        self.invoice(1, "100.00")
+        debtor = Debtor.objects.get()
+        self.assertEqual(
+            (debtor.house_id, debtor.section_id, debtor.floor_id, debtor.flat_id),
+            (self.house.pk, self.section.pk, self.flat.floor_id, self.flat.pk),
+        )
+        self.assertEqual(
+            list(debtors.debtor_flat_ids(house=self.house)), [self.flat.pk]
+        )
+        self.assertFalse(debtors.debtors_in(floor=self.flat.floor_id + 1).exists())
+
+    def test_sync_without_open_invoices_dates_debt_today(self):
+        # долг без проведённых квитанций (например, возврат платежа)
+        self.pay("-30.00")
+        debtor = Debtor.objects.get()
+        self.assertEqual(debtor.amount, Decimal("30.00"))
+        self.assertEqual(debtor.debt_since, timezone.localdate())
+
+    def test_backfill_migration(self):
+        backfill = importlib.import_module("billing.migrations.0009_backfill_debtors")
+        self.invoice(1, "100.00")
+        self.invoice(2, "50.00")
+        self.pay("120.00")
+        Debtor.objects.all().delete()
+
+        backfill.fill_debtors(django_apps, None)
+        debtor = Debtor.objects.get()
+        self.assertEqual(debtor.amount, Decimal("30.00"))
+        self.assertEqual(debtor.debt_since, date(2025, 2, 1))
+
+        # повторный прогон не дублирует и не перезаписывает строки
+        Debtor.objects.update(amount=Decimal("1.00"))
+        backfill.fill_debtors(django_apps, None)
+        self.assertEqual(Debtor.objects.get().amount, Decimal("1.00"))
+
+
+# ---------- Свод кассы
+class CashboxTests(AccountTestCase):
+    def rollup(self):
+        return list(CashboxDaily.objects.values_list("date", "amount", "count"))
+
+    def test_rollup_follows_transactions(self):
+        first = self.pay("100")
+        self.pay("50")
+        self.pay("70", is_approved=False)
+        self.assertEqual(self.rollup(), [(date(2025, 6, 1), Decimal("150"), 2)])
+
+        first.amount = Decimal("120")
+        first.save()
+        self.assertEqual(self.rollup(), [(date(2025, 6, 1), Decimal("170"), 2)])
+
+        first.date = date(2025, 6, 2)
+        first.save()
+        self.assertEqual(
+            sorted(self.rollup()),
+            [
+                (date(2025, 6, 1), Decimal("50"), 1),
+                (date(2025, 6, 2), Decimal("120"), 1),
+            ],
+        )
+        first.delete()
+        self.assertEqual(self.rollup(), [(date(2025, 6, 1), Decimal("50"), 1)])
+
+    def test_amount_change_without_row_rebuilds_it_from_ledger(self):
+        tx = self.pay("100")
+        CashboxDaily.objects.all().delete()  # свод разошёлся с журналом
+        tx.amount = Decimal("120")
+        tx.save()
+        # раньше здесь создавалась строка с суммой 20 и количеством 0
+        self.assertEqual(self.rollup(), [(date(2025, 6, 1), Decimal("120"), 1)])
+
+    def test_removal_without_row_creates_nothing(self):
+        tx = self.pay("100")
+        CashboxDaily.objects.all().delete()
+        tx.delete()
+        self.assertEqual(self.rollup(), [])
+
+    def test_rebuild_matches_signals(self):
+        self.pay("100")
+        self.pay("-30").save()
+        expected = self.rollup()
+        CashboxDaily.objects.update(amount=0, count=5)
+        cashbox.rebuild()
+        self.assertEqual(self.rollup(), expected)
+
+
+# ---------- Начисление квитанций
+class MeteredHouseTestCase(TestCase):
+    """Дом с двумя квартирами; счётчик воды с показаниями только у первой."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username="owner")
+        cls.tariff = Tariff.objects.create(
+            tariff_name="Базовый", tariff_description="", last_date=timezone.now()
+        )
+        unit = MeasurementUnit.objects.create(MeasurementUnit_name="м3")
+        cls.service = Service.objects.create(MeasurementUnit=unit, Service_name="Вода")
+        TariffService.objects.create(
+            tariff=cls.tariff,
+            service=cls.service,
+            price=Decimal("12.50"),
+            currency="грн",
+        )
+        cls.house = House.objects.create(house_name="Дом", address="ул. 1")
+        section = Section.objects.create(house=cls.house, section_name="1")
+        floor = Floor.objects.create(section=section, number=1)
+        cls.accounts = []
+        for number in (1, 2):
+            flat = Flat.objects.create(
+                number_flat=number, square=50, floor=floor, user=user, tariff=cls.tariff
+            )
+            cls.accounts.append(
+                PersonalAccount.objects.create(
+                    number=number,
+                    status=True,
+                    house=cls.house,
+                    section=section,
+                    flat=flat,
+                )
+            )
+        # счётчик только у первой квартиры
+        account = cls.accounts[0]
+        meter = Meter.objects.create(
+            house=cls.house,
+            section=section,
+            flat=account.flat,
+            personal_account=account,
+            service=cls.service,
+            serial_number="SN1",
+            installation_date=date(2025, 1, 1),
+            is_active=True,
+        )
+        for d, value in ((date(2025, 6, 25), 100), (date(2025, 7, 25), 110)):
+            MeterReading.objects.create(
+                number="1", date=d, meter=meter, value=Decimal(value), status="checked"
+            )
+
+
+class BillHouseTests(MeteredHouseTestCase):
+    def test_accounts_without_charges_are_skipped(self):
+        result = bill_house(self.house.pk, *PERIOD)
+        self.assertEqual(result["invoices"], 1)
+        invoice = Invoice.objects.get()
+        self.assertEqual(invoice.personal_account, self.accounts[0])
+        self.assertEqual(invoice.total_amount, Decimal("125.00"))
+        self.assertEqual(InvoiceService.objects.get().quantity, Decimal("10"))
+
+    def test_repeated_run_does_not_duplicate(self):
+        bill_house(self.house.pk, *PERIOD)
+        self.assertEqual(bill_house(self.house.pk, *PERIOD)["invoices"], 0)
+        self.assertEqual(Invoice.objects.count(), 1)
+
+    def test_numbers_continue_from_counter(self):
+        first = reserve_numbers(3)
+        bill_house(self.house.pk, *PERIOD)
+        self.assertEqual(Invoice.objects.get().invoice_number, first + 3)
+        self.assertEqual(reserve_numbers(1), first + 4)
+
+
+# ---------- Таблица цен тарифа
+class PriceTableTests(MeteredHouseTestCase):
+    def table(self):
+        return price_tables([self.tariff.pk])[self.tariff.pk][self.service.pk]
+
+    def test_price_change_gives_new_table(self):
+        self.assertEqual(self.table().price, Decimal("12.50"))
+        TariffService.objects.filter(tariff=self.tariff).update(price=Decimal("15"))
+        self.assertEqual(self.table().price, Decimal("12.50"))  # update() без сигналов
+        row = TariffService.objects.get(tariff=self.tariff)
+        row.price = Decimal("15")
+        row.save()
+        self.assertEqual(self.table().price, Decimal("15.00"))
+
+    def test_service_and_unit_renames_give_new_table(self):
+        self.assertEqual(self.table()[2:], ("м3", "Вода"))
+        self.service.Service_name = "Холодная вода"
+        self.service.save()
+        self.assertEqual(self.table().service_name, "Холодная вода")
+        unit = self.service.MeasurementUnit
+        unit.MeasurementUnit_name = "куб. м"
+        unit.save()
+        self.assertEqual(self.table().unit, "куб. м")
+
+    def test_tariff_date_is_not_touched(self):
+        last_date = self.tariff.last_date
+        row = TariffService.objects.get(tariff=self.tariff)
+        row.price = Decimal("15")
+        row.save()
+        self.service.save()
+        self.tariff.refresh_from_db()
+        self.assertEqual(self.tariff.last_date, last_date)
+
+
+# ---------- PDF квитанций
+class RenderPdfTests(MeteredHouseTestCase):
+    def setUp(self):
+        invoice_pdf._font.cache_clear()
+        self.addCleanup(invoice_pdf._font.cache_clear)
+        bill_house(self.house.pk, *PERIOD)
+        [self.payload] = invoice_pdf.invoice_payloads(Invoice.objects.all())
+
+    def test_renders_pdf(self):
+        self.assertEqual(self.payload["lines"][0][0], "Вода")
+        self.assertTrue(invoice_pdf.render_pdf(self.payload).startswith(b"%PDF"))
+
+    @override_settings(INVOICE_PDF_FONT=None)
+    def test_missing_cyrillic_font_is_an_error(self):
+        with mock.patch.object(invoice_pdf, "FONT_CANDIDATES", ["/nonexistent.ttf"]):
+            with self.assertRaises(ImproperlyConfigured):
+                invoice_pdf.render_pdf(self.payload)
+
+
+# ---------- Выгрузки CSV/XLSX
+class ExportTests(MeteredHouseTestCase):
+    NS = {"s": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+    def sheet_rows(self, data):
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            self.assertEqual(
+                zf.namelist(),
+                [
+                    "[Content_Types].xml",
+                    "_rels/.rels",
+                    "xl/workbook.xml",
+                    "xl/_rels/workbook.xml.rels",
+                    "xl/worksheets/sheet1.xml",
+                ],
+            )
+            root = ElementTree.fromstring(zf.read("xl/worksheets/sheet1.xml"))
+        rows = []
+        for row in root.iterfind("s:sheetData/s:row", self.NS):
+            cells = []
+            for cell in row.iterfind("s:c", self.NS):
+                if cell.get("t") == "inlineStr":
+                    cells.append(cell.findtext("s:is/s:t", namespaces=self.NS))
+                else:
+                    cells.append(cell.findtext("s:v", namespaces=self.NS))
+            rows.append(cells)
+        return rows
+
+    def test_xlsx_cells(self):
+        rows = [(1, Decimal("12.50"), True, None, "a<b & \x01c", date(2025, 7, 1))]
+        data = b"".join(exports.stream_xlsx(["ID", "Сумма"], iter(rows)))
+        self.assertEqual(
+            self.sheet_rows(data),
+            [["ID", "Сумма"], ["1", "12.50", "да", None, "a<b & c", "2025-07-01"]],
+        )
+
+    def test_xlsx_opens_in_openpyxl(self):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            self.skipTest("openpyxl не установлен")
+        headers, rows = exports.export_rows("readings", house=self.house.pk)
+        data = b"".join(exports.stream_xlsx(headers, rows))
+        sheet = load_workbook(io.BytesIO(data), read_only=True).active
+        values = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(values[0][:3], ("ID", "Номер", "Дата"))
+        self.assertEqual([row[7] for row in values[1:]], [100, 110])
+
+    def test_xlsx_rows_are_streamed_in_batches(self):
+        rows = ((i, f"строка {i}") for i in range(exports.CHUNK_SIZE * 2 + 1))
+        sheet = exports._sheet(["ID", "Текст"], rows)
+        next(sheet)  # заголовок
+        self.assertEqual(next(sheet).count(b"<row>"), exports.CHUNK_SIZE)
+
+    def test_csv_has_bom_and_semicolons(self):
+        headers, rows = exports.export_rows(
+            "readings", house=self.house.pk, date_from=date(2025, 7, 1)
+        )
+        lines = b"".join(exports.stream_csv(headers, rows)).decode().splitlines()
+        self.assertTrue(lines[0].startswith("\ufeffID;Номер;Дата"))
+        self.assertEqual(len(lines), 2)
+        self.assertIn(";2025-07-25;", lines[1])
+
+    def readings_csv(self):
+        return b"".join(exports.stream_csv(*exports.export_rows("readings")))
+
+    async def test_view_streams_under_asgi(self):
+        admin = await User.objects.acreate(username="admin", is_superuser=True)
+        await self.async_client.aforce_login(admin)
+        response = await self.async_client.get(
+            reverse("adminpanel:export", args=["readings"])
+        )
+        # асинхронный итератор: ASGI-обработчик не собирает выгрузку в список
+        self.assertTrue(response.is_async)
+        data = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(data, await sync_to_async(self.readings_csv)())
+
+    def test_payment_item_filter_only_for_transactions(self):
+        with self.assertRaises(ValueError):
+            exports.export_rows("readings", payment_item="Вода")
+
+
+# ---------- Импорт показаний
+class ImportReadingsTests(MeteredHouseTestCase):
+    def import_rows(self, rows):
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, "w", newline="", encoding="utf-8") as fh:
+            writer = csv.DictWriter(fh, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        return import_readings(path)
+
+    def test_status_column_is_ignored(self):
+        # файл не может пометить показания проверенными в обход billing.anomalies
+        stats = self.import_rows(
+            [
+                {
+                    "serial_number": "SN1",
+                    "date": "2025-08-25",
+                    "value": "120",
+                    "status": "checked",
+                },
+                {
+                    "serial_number": "SN1",
+                    "date": "26.08.2025",
+                    "value": "121",
+                    "status": "suspicious",
+                },
+            ]
+        )
+        self.assertEqual(stats["accepted"], 2)
+        imported = MeterReading.objects.filter(date__gte=date(2025, 8, 1))
+        self.assertEqual(
+            set(imported.values_list("status", flat=True)), {MeterReading.STATUS_NEW}
+        )
+
+    def test_invalid_rows_are_rejected(self):
+        stats = self.import_rows(
+            [
+                {"serial_number": "SN404", "date": "2025-08-25", "value": "120"},
+                {"serial_number": "SN1", "date": "2025-07-01", "value": "120"},
+                {"serial_number": "SN1", "date": "2025-08-25", "value": "90"},
+                {"serial_number": "SN1", "date": "2025-08-25", "value": "abc"},
+                {"serial_number": "SN1", "date": "2025-08-25", "value": "120"},
+            ]
+        )
+        self.assertEqual((stats["accepted"], stats["rejected"]), (1, 4))
+
+
+# ---------- Секционирование показаний по дате (только PostgreSQL)
+@skipUnless(connection.vendor == "postgresql", "секции есть только на PostgreSQL")
+class PartitionTests(MeteredHouseTestCase):
+    TODAY = date(2025, 7, 15)
+    TABLE = MeterReading._meta.db_table
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.meter = Meter.objects.get(serial_number="SN1")
+        MeterReading.objects.create(
+            number="0", date=date(2023, 1, 10), meter=cls.meter, value=50
+        )
+        # у второго счётчика показания только в давних месяцах
+        cls.old_meter = Meter.objects.create(
+            house=cls.house,
+            section=cls.meter.section,
+            flat=cls.accounts[1].flat,
+            personal_account=cls.accounts[1],
+            service=cls.service,
+            serial_number="SN2",
+            installation_date=date(2023, 1, 1),
+            is_active=True,
+        )
+        for d, value, status in (
+            (date(2023, 2, 10), 5, "checked"),
+            (date(2023, 3, 10), 1, "suspicious"),
+        ):
+            MeterReading.objects.create(
+                number="1", date=d, meter=cls.old_meter, value=value, status=status
+            )
+
+    def archived(self, month_start):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT meter_id, date FROM {self.TABLE}_archive_{month_start:%Y%m}"
+            )
+            return cursor.fetchall()
+
+    def test_partitions_take_rows_from_default(self):
+        created, detached = partitions.maintain(months_ahead=1, today=self.TODAY)
+        self.assertEqual(detached, [])
+        self.assertIn(f"{self.TABLE}_p202508", created)
+        self.assertIn(f"{self.TABLE}_p202301", created)
+        self.assertEqual(partitions.default_months(self.TABLE), [])
+        self.assertEqual(MeterReading.objects.count(), 5)
+
+    def test_detach_keeps_last_reading_of_each_meter(self):
+        partitions.maintain(months_ahead=0, today=self.TODAY)
+        _, detached = partitions.maintain(
+            months_ahead=0,
+            retain_months=partitions.MIN_RETAIN_MONTHS,
+            today=self.TODAY,
+        )
+        self.assertEqual(len(detached), 3)
+        self.assertEqual(
+            self.archived(date(2023, 1, 1)), [(self.meter.pk, date(2023, 1, 10))]
+        )
+        # последнее неподозрительное показание SN2 осталось в DEFAULT,
+        # подозрительное ушло в архив
+        self.assertEqual(self.archived(date(2023, 2, 1)), [])
+        self.assertEqual(
+            self.archived(date(2023, 3, 1)), [(self.old_meter.pk, date(2023, 3, 10))]
+        )
+        self.assertEqual(
+            list(self.old_meter.meterreading_set.values_list("date", flat=True)),
+            [date(2023, 2, 10)],
+        )
+        self.assertEqual(partitions.default_months(self.TABLE), [date(2023, 2, 1)])
+        self.assertEqual(build_meter_index()["SN2"][2], Decimal(5))
+
+        # повторный прогон ничего не меняет
+        self.assertEqual(
+            partitions.maintain(
+                months_ahead=0,
+                retain_months=partitions.MIN_RETAIN_MONTHS,
+                today=self.TODAY,
+            ),
+            ([], []),
+        )
+
+    def test_short_retention_is_refused(self):
+        with self.assertRaises(ValueError):
+            partitions.maintain(retain_months=3, today=self.TODAY)
+        self.assertEqual(partitions.attached_partitions(self.TABLE), {})
@@ -0,0 +1,177 @@
+from array import array
+from datetime import date
+from decimal import Decimal
+
+from django.core.exceptions import ImproperlyConfigured
+
+from billing.models import MeterReading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SCALE = 1000  # MeterReading.value хранится с 3 знаками после запятой
+EPOCH = date(1970, 1, 1).toordinal()
+
+
+def require_numpy():
+    if np is None:
+        raise ImproperlyConfigured("Для работы с рядами показаний нужен пакет numpy")
+
+
+def month_index(year, month):
+    """Номер месяца от 1970-01, как у datetime64[M]."""
+    return (year - 1970) * 12 + month - 1
+
+
+class ReadingSeries:
+    """История показаний множества счётчиков в плотных массивах NumPy.
+
+    Показания отсортированы по (счётчик, дата, id) и лежат подряд: строки
+    счётчика meter_ids[k] — это срез offsets[k]:offsets[k + 1].
+    Даты — дни от 1970-01-01 (int32), значения — value × 1000 (int64).
+    """
+
+    def __init__(self, meter_ids, offsets, days, values, reading_ids):
+        self.meter_ids = meter_ids
+        self.offsets = offsets
+        self.days = days
+        self.values = values
+        self.reading_ids = reading_ids
+
+    # ---------- Загрузка одним запросом
+    @classmethod
+    def load(cls, meters=None, house=None, date_from=None, date_to=None, queryset=None):
+        require_numpy()
+        qs = MeterReading.objects.all() if queryset is None else queryset
+        if meters is not None:
+            qs = qs.filter(meter__in=meters)
+        if house is not None:
+            qs = qs.filter(meter__house=house)
+        if date_from is not None:
+            qs = qs.filter(date__gte=date_from)
+        if date_to is not None:
+            qs = qs.filter(date__lte=date_to)
+        rows = qs.order_by("meter_id", "date", "id").values_list(
+            "meter_id", "date", "value", "id"
+        )
+        return cls.from_rows(rows.iterator(chunk_size=10000))
+
+    @classmethod
+    def from_rows(cls, rows):
+        """rows — (meter_id, date, value, reading_id), отсортированные по счётчику и дате."""
+        require_numpy()
+        # array("q") копит столбцы компактно, без списка Python-объектов
+        meter_col, day_col, value_col, id_col = (array("q") for _ in range(4))
+        for meter_id, d, value, reading_id in rows:
+            meter_col.append(meter_id)
+            day_col.append(d.toordinal() - EPOCH)
+            value_col.append(int(value * SCALE))
+            id_col.append(reading_id)
+
+        meters = np.frombuffer(meter_col, dtype=np.int64)
+        is_start = np.ones(len(meters), dtype=bool)
+        is_start[1:] = meters[1:] != meters[:-1]
+        starts = np.flatnonzero(is_start)
+        return cls(
+            meter_ids=meters[starts],
+            offsets=np.append(starts, len(meters)).astype(np.int64),
+            days=np.frombuffer(day_col, dtype=np.int64).astype(np.int32),
+            values=np.frombuffer(value_col, dtype=np.int64),
+            reading_ids=np.frombuffer(id_col, dtype=np.int64),
+        )
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def meter_index(self):
+        """Для каждой строки — номер счётчика в meter_ids."""
+        return np.repeat(np.arange(len(self.meter_ids)), np.diff(self.offsets))
+
+    def segment(self, meter_id):
+        k = np.searchsorted(self.meter_ids, meter_id)
+        if k == len(self.meter_ids) or self.meter_ids[k] != meter_id:
+            return slice(0, 0)
+        return slice(int(self.offsets[k]), int(self.offsets[k + 1]))
+
+    @staticmethod
+    def to_decimal(scaled):
+        return Decimal(int(scaled)) / SCALE
+
+    # ---------- Расход между соседними показаниями
+    def deltas(self):
+        """(расход, маска): расход к предыдущему показанию того же счётчика.
+
+        Для первого показания каждого счётчика предыдущего нет — маска False.
+        """
+        delta = np.zeros(len(self.values), dtype=np.int64)
+        delta[1:] = np.diff(self.values)
+        valid = np.ones(len(self.values), dtype=bool)
+        valid[self.offsets[:-1]] = False
+        delta[~valid] = 0
+        return delta, valid
+
+    # ---------- Помесячно
+    def month_end_values(self):
+        """Последнее показание счётчика в каждом месяце.
+
+        Возвращает (номер счётчика, месяц от 1970-01, значение) — по строке
+        на каждую пару (счётчик, месяц), где есть показания.
+        """
+        months = self.days.astype("datetime64[D]").astype("datetime64[M]")
+        months = months.astype(np.int64)
+        meter_idx = self.meter_index
+        last = np.ones(len(self.values), dtype=bool)
+        last[:-1] = (meter_idx[1:] != meter_idx[:-1]) | (months[1:] != months[:-1])
+        return meter_idx[last], months[last], self.values[last]
+
+    def monthly_readings(self, month_from, month_to, fill=True):
+        """Матрица счётчики × месяцы [month_from, month_to] показаний на конец месяца.
+
+        Пропуски между известными месяцами заполняются линейной интерполяцией
+        (fill=True); до первого и после последнего известного месяца — NaN.
+        Значения в единицах счётчика (float64).
+        """
+        n_months = month_to - month_from + 1
+        grid = np.full((len(self.meter_ids), n_months), np.nan)
+        meter_idx, months, values = self.month_end_values()
+        inside = (months >= month_from) & (months <= month_to)
+        grid[meter_idx[inside], months[inside] - month_from] = values[inside] / SCALE
+        if fill:
+            grid = _interpolate_rows(grid)
+        return grid
+
+    def monthly_consumption(self, month_from, month_to, fill=True):
+        """Расход за каждый месяц [month_from, month_to] по всем счётчикам разом.
+
+        Берётся разница показаний на конец месяца и на конец предыдущего,
+        поэтому матрица строится с месяца month_from - 1.
+        """
+        grid = self.monthly_readings(month_from - 1, month_to, fill=fill)
+        return np.diff(grid, axis=1)
+
+
+def _interpolate_rows(grid):
+    """Линейная интерполяция NaN внутри каждой строки, без экстраполяции."""
+    n_rows, n_cols = grid.shape
+    if not n_cols:
+        return grid
+    known = ~np.isnan(grid)
+    cols = np.broadcast_to(np.arange(n_cols), grid.shape)
+
+    # индекс ближайшего известного столбца слева и справа
+    prev_idx = np.maximum.accumulate(np.where(known, cols, -1), axis=1)
+    next_idx = np.where(known, cols, n_cols)
+    next_idx = np.minimum.accumulate(next_idx[:, ::-1], axis=1)[:, ::-1]
+
+    inner = ~known & (prev_idx >= 0) & (next_idx < n_cols)
+    rows = np.broadcast_to(np.arange(n_rows)[:, None], grid.shape)
+    r, c = rows[inner], cols[inner]
+    p, n = prev_idx[inner], next_idx[inner]
+    left, right = grid[r, p], grid[r, n]
+
+    out = grid.copy()
+    out[r, c] = left + (right - left) * (c - p) / (n - p)
+    return out
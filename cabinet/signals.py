@@ -0,0 +1,117 @@
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from billing.ledger import accounts_changed
+from billing.models import AccountTransaction, Invoice, PersonalAccount
+from cabinet import summary
+from core.models import Flat
+from support.models import Message
+
+
+def _invalidate_on_commit(user_ids):
+    # после коммита — чтобы параллельный запрос не закэшировал старые данные
+    user_ids = set(user_ids)
+    if user_ids:
+        transaction.on_commit(lambda: summary.invalidate(user_ids))
+
+
+def _account_owners(account_ids):
+    return PersonalAccount.objects.filter(pk__in=account_ids).values_list(
+        "flat__user_id", flat=True
+    )
+
+
+# ---------- Квитанции и транзакции: владелец квартиры лицевого счёта
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+def invoice_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _invalidate_on_commit(
+        Flat.objects.filter(pk=instance.flat_id).values_list("user_id", flat=True)
+    )
+
+
+@receiver(post_save, sender=AccountTransaction)
+@receiver(post_delete, sender=AccountTransaction)
+def transaction_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _invalidate_on_commit(_account_owners([instance.personal_account_id]))
+
+
+# массовые пересчёты балансов, статусов оплаты и начисления (billing.ledger)
+@receiver(accounts_changed)
+def accounts_changed_in_bulk(sender, account_ids, **kwargs):
+    _invalidate_on_commit(_account_owners(account_ids))
+
+
+# ---------- Лицевые счета: владелец и новой, и прежней квартиры
+@receiver(pre_save, sender=PersonalAccount)
+def remember_account_owner(sender, instance, **kwargs):
+    instance._summary_old_user = None
+    if instance.pk and not instance._state.adding:
+        instance._summary_old_user = _account_owners([instance.pk]).first()
+
+
+@receiver(post_save, sender=PersonalAccount)
+@receiver(post_delete, sender=PersonalAccount)
+def account_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _invalidate_on_commit(
+        [
+            *Flat.objects.filter(pk=instance.flat_id).values_list("user_id", flat=True),
+            getattr(instance, "_summary_old_user", None),
+        ]
+    )
+
+
+# ---------- Квартиры: и новый, и прежний владелец
+@receiver(pre_save, sender=Flat)
+def remember_flat_owner(sender, instance, **kwargs):
+    instance._summary_old_user = None
+    if instance.pk and not instance._state.adding:
+        instance._summary_old_user = (
+            Flat.objects.filter(pk=instance.pk)
+            .values_list("user_id", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Flat)
+@receiver(post_delete, sender=Flat)
+def flat_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _invalidate_on_commit(
+        [instance.user_id, getattr(instance, "_summary_old_user", None)]
+    )
+
+
+# ---------- Сообщения: получатели
+@receiver(post_save, sender=Message)
+@receiver(pre_delete, sender=Message)
+def message_changed(sender, instance, raw=False, **kwargs):
+    if raw or not instance.pk:
+        return
+    # pre_delete: после удаления связи с получателями уже не прочитать
+    _invalidate_on_commit(instance.recipients.values_list("pk", flat=True))
+
+
+@receiver(m2m_changed, sender=Message.recipients.through)
+def message_recipients_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":
+        if reverse:
+            _invalidate_on_commit([instance.pk])
+        else:
+            _invalidate_on_commit(instance.recipients.values_list("pk", flat=True))
+    elif action in ("post_add", "post_remove"):
+        _invalidate_on_commit([instance.pk] if reverse else pk_set or ())
@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from billing.ledger import compute_balances
+from billing.models import Invoice, PersonalAccount
+from core.models import Flat
+from support.models import Message
+
+# Сводка жителя для главной страницы кабинета: собирается четырьмя запросами,
+# хранится в кэше по пользователю и сбрасывается сигналами (cabinet.signals).
+KEY = "cabinet:summary:{}"
+LATEST_INVOICES = 5
+LATEST_MESSAGES = 5
+
+
+def _timeout():
+    return getattr(settings, "CABINET_SUMMARY_TIMEOUT", 60 * 60)
+
+
+def build_summary(user_id):
+    flats = list(
+        Flat.objects.filter(user_id=user_id)
+        .order_by("floor__section__house__house_name", "number_flat")
+        .values(
+            "id",
+            "number_flat",
+            "square",
+            "floor__number",
+            "floor__section__section_name",
+            "floor__section__house__house_name",
+            "floor__section__house__address",
+            "tariff__tariff_name",
+        )
+    )
+
+    accounts = list(
+        PersonalAccount.objects.filter(flat__user_id=user_id)
+        .order_by("number")
+        .values("id", "number", "status", "flat_id", "balance__balance")
+    )
+    # счёт без материализованного баланса — досчитываем по журналу
+    missing = [a["id"] for a in accounts if a["balance__balance"] is None]
+    computed = compute_balances(missing) if missing else {}
+    for account in accounts:
+        balance = account.pop("balance__balance")
+        account["balance"] = computed[account["id"]] if balance is None else balance
+
+    invoices = list(
+        # черновики из generate_invoices жителю не показываем — как в разделе счетов
+        Invoice.objects.filter(flat__user_id=user_id, is_posted=True)
+        .order_by("-create_date", "-id")
+        .values(
+            "id",
+            "invoice_number",
+            "create_date",
+            "period_from",
+            "period_to",
+            "total_amount",
+            "is_posted",
+            "flat__number_flat",
+        )[:LATEST_INVOICES]
+    )
+
+    messages = list(
+        Message.objects.filter(recipients=user_id)
+        .order_by("-created_at", "-id")
+        .values("id", "Subject", "created_at")[:LATEST_MESSAGES]
+    )
+
+    return {
+        "flats": flats,
+        "accounts": accounts,
+        "invoices": invoices,
+        "latest_messages": messages,
+    }
+
+
+def get_summary(user_id):
+    key = KEY.format(user_id)
+    summary = cache.get(key)
+    if summary is None:
+        summary = build_summary(user_id)
+        cache.set(key, summary, _timeout())
+    return summary
+
+
+def invalidate(user_ids):
+    keys = [KEY.format(pk) for pk in set(user_ids) if pk is not None]
+    if keys:
+        cache.delete_many(keys)
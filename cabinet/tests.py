@@ -1 +1,79 @@
-# Create your tests here.
+from decimal import Decimal
+
+from django.core.cache import cache
+
+from billing import ledger
+from billing import tests as billing_tests
+from billing.invoicing import bill_house
+from billing.models import AccountTransaction, Invoice
+from cabinet import summary
+from core.models import User
+
+
+# ---------- Сброс сводки жителя после массовых операций
+class SummaryInvalidationTests(billing_tests.MeteredHouseTestCase):
+    def setUp(self):
+        self.owner = self.accounts[0].flat.user
+        cache.delete(self.key(self.owner))
+        summary.get_summary(self.owner.pk)
+
+    def key(self, user):
+        return summary.KEY.format(user.pk)
+
+    def assertInvalidated(self, user=None):
+        self.assertIsNone(cache.get(self.key(user or self.owner)))
+
+    def test_summary_is_cached(self):
+        self.assertIsNotNone(cache.get(self.key(self.owner)))
+
+    def test_bill_house(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            bill_house(self.house.pk, *billing_tests.PERIOD)
+        self.assertInvalidated()
+
+    def test_refresh_balances(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ledger.refresh_balances([self.accounts[0].pk])
+        self.assertInvalidated()
+
+    def test_allocate_payments_after_bulk_update(self):
+        bill_house(self.house.pk, *billing_tests.PERIOD)
+        # проведение квитанций и платёж — массово, в обход сигналов моделей
+        Invoice.objects.update(is_posted=True)
+        AccountTransaction.objects.bulk_create(
+            [
+                AccountTransaction(
+                    number="1",
+                    date=billing_tests.PERIOD[1],
+                    type="Приход",
+                    personal_account=self.accounts[0],
+                    user=self.owner,
+                    amount=Decimal("500"),
+                    comment="",
+                    is_approved=True,
+                    manager=self.owner,
+                )
+            ]
+        )
+        summary.get_summary(self.owner.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            ledger.allocate_payments([self.accounts[0].pk])
+        self.assertEqual(Invoice.objects.get().payment_status, Invoice.STATUS_PAID)
+        self.assertInvalidated()
+
+    def test_account_moved_to_another_owner(self):
+        other = User.objects.create(username="neighbour")
+        summary.get_summary(other.pk)
+        flat = self.accounts[1].flat
+        flat.user = other
+        with self.captureOnCommitCallbacks(execute=True):
+            flat.save()
+        summary.get_summary(self.owner.pk)
+        summary.get_summary(other.pk)
+
+        account = self.accounts[0]
+        account.flat = flat
+        with self.captureOnCommitCallbacks(execute=True):
+            account.save()
+        self.assertInvalidated(self.owner)
+        self.assertInvalidated(other)
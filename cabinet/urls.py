@@ -11,6 +11,8 @@ urlpatterns = [
     path("tariffs/", views.tariffs_active, name="tariffs_active"),
     path("tariffs/archive/", views.tariffs_archive, name="tariffs_archive"),
     path("messages/", views.messages_list, name="messages_list"),
+    path("messages/<int:pk>/", views.message_detail, name="message_detail"),
+    path("messages/read/", views.messages_mark_read, name="messages_mark_read"),
     path("service/", views.service_request, name="service_request"),
     path("profile/", views.profile, name="profile"),
 ]
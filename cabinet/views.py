@@ -1,23 +1,77 @@
-from django.shortcuts import render
+from datetime import timedelta
+
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import get_object_or_404, redirect, render
+from django.utils import timezone
+from django.views.decorators.http import require_POST
+
+from billing.models import Invoice
+from core.pagination import keyset_page
+from support import inbox
+from support.models import InboxItem
+
+from . import summary
+
+BILLS_PAGE_SIZE = 20
+BILLS_ORDERING = ("-create_date", "-id")
+MESSAGES_PAGE_SIZE = 20
 
 
 def dashboard(request):
-    return render(request, "cabinet/dashboard.html")
+    # сводка жителя — из кэша (cabinet.summary), сбрасывается сигналами
+    ctx = {}
+    if request.user.is_authenticated:
+        ctx = summary.get_summary(request.user.pk)
+    return render(request, "cabinet/dashboard.html", ctx)
+
+
+# ---------- Квитанции жителя (keyset-страницы по индексам Invoice)
+def _bills(request, title, **filters):
+    rows, next_cursor = [], None
+    if request.user.is_authenticated:
+        qs = Invoice.objects.filter(
+            flat__user=request.user, is_posted=True, **filters
+        ).values(
+            "id",
+            "invoice_number",
+            "create_date",
+            "period_from",
+            "period_to",
+            "total_amount",
+            "payment_status",
+            "flat__number_flat",
+            "personal_account__number",
+        )
+        rows, next_cursor = keyset_page(
+            qs, BILLS_ORDERING, request.GET.get("after"), BILLS_PAGE_SIZE
+        )
+    return render(
+        request,
+        "cabinet/bills.html",
+        {
+            "title": title,
+            "rows": rows,
+            "next_cursor": next_cursor,
+            "is_first_page": not request.GET.get("after"),
+        },
+    )
 
 
 def bills_list(request):
-    return render(request, "cabinet/placeholder.html", {"title": "Квитанции — все"})
+    return _bills(request, "Квитанции — все")
 
 
 def bills_paid(request):
-    return render(
-        request, "cabinet/placeholder.html", {"title": "Квитанции — оплаченные"}
-    )
+    return _bills(request, "Квитанции — оплаченные", payment_status=Invoice.STATUS_PAID)
 
 
 def bills_overdue(request):
-    return render(
-        request, "cabinet/placeholder.html", {"title": "Квитанции — просроченные"}
+    due = timezone.localdate() - timedelta(days=Invoice.OVERDUE_AFTER_DAYS)
+    return _bills(
+        request,
+        "Квитанции — просроченные",
+        payment_status__in=Invoice.OPEN_STATUSES,
+        period_to__lt=due,
     )
 
 
@@ -31,8 +85,42 @@ def tariffs_archive(request):
     return render(request, "cabinet/placeholder.html", {"title": "Тарифы — архив"})
 
 
+# ---------- Входящие сообщения (support.InboxItem)
 def messages_list(request):
-    return render(request, "cabinet/placeholder.html", {"title": "Сообщения"})
+    rows, next_cursor = [], None
+    if request.user.is_authenticated:
+        qs = InboxItem.objects.filter(user=request.user).values(
+            "id", "read_at", "message_id", "message__Subject", "message__created_at"
+        )
+        rows, next_cursor = keyset_page(
+            qs, ("-id",), request.GET.get("after"), MESSAGES_PAGE_SIZE
+        )
+    return render(
+        request,
+        "cabinet/messages/list.html",
+        {
+            "rows": rows,
+            "next_cursor": next_cursor,
+            "is_first_page": not request.GET.get("after"),
+        },
+    )
+
+
+@login_required
+def message_detail(request, pk):
+    item = get_object_or_404(
+        InboxItem.objects.select_related("message"), user=request.user, message_id=pk
+    )
+    if item.read_at is None:
+        inbox.mark_read(request.user.pk, [pk])
+    return render(request, "cabinet/messages/detail.html", {"message": item.message})
+
+
+@login_required
+@require_POST
+def messages_mark_read(request):
+    inbox.mark_read(request.user.pk)
+    return redirect("cabinet:messages_list")
 
 
 def service_request(request):
@@ -0,0 +1,29 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "BACKGROUND_WORKERS", 4),
+    thread_name_prefix="background",
+)
+
+
+def _run(fn, args, kwargs):
+    close_old_connections()
+    try:
+        return fn(*args, **kwargs)
+    except Exception:
+        logger.exception("Фоновая задача %s завершилась с ошибкой", fn.__name__)
+        raise
+    finally:
+        # у потока пула своё соединение с БД — не оставляем его открытым
+        connections.close_all()
+
+
+def submit(fn, *args, **kwargs):
+    """Выполнить fn в фоновом потоке, вне цикла запрос-ответ."""
+    return _executor.submit(_run, fn, args, kwargs)
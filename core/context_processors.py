@@ -0,0 +1,6 @@
+from django.core.handlers.asgi import ASGIRequest
+
+
+def events(request):
+    """SSE-поток есть только под ASGI — иначе шаблоны не подключают EventSource."""
+    return {"sse_enabled": isinstance(request, ASGIRequest)}
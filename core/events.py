@@ -0,0 +1,174 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# События для SSE-потока (core.views.events). Публикуют синхронные сигналы,
+# команды и фоновые задачи, читают асинхронные подписчики — все соединения
+# живут в одном цикле событий ASGI-сервера. Бэкенд брокера задаётся
+# EVENTS_BROKER; у него два метода: publish(channel, message) и
+# subscribe(channels, timeout).
+STAFF_CHANNEL = "staff"
+
+
+def user_channel(user_id):
+    return f"user:{user_id}"
+
+
+class LocalBroker:
+    """Брокер в памяти процесса.
+
+    Доставляет события только подписчикам этого же процесса — годится для
+    тестов и разработки; между процессами события передаёт PostgresBroker.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = {}  # канал -> {(loop, очередь)}
+
+    def publish(self, channel, message):
+        with self._lock:
+            targets = list(self._subscribers.get(channel, ()))
+        for loop, queue in targets:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, message)
+            except RuntimeError:
+                pass  # цикл подписчика уже закрыт
+
+    async def subscribe(self, channels, timeout=None):
+        """Асинхронный поток сообщений; None — если за timeout ничего не пришло."""
+        queue = asyncio.Queue(self.queue_size)
+        entry = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            for channel in channels:
+                self._subscribers.setdefault(channel, set()).add(entry)
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout)
+                except TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                for channel in channels:
+                    subscribers = self._subscribers.get(channel)
+                    if subscribers is not None:
+                        subscribers.discard(entry)
+                        if not subscribers:
+                            del self._subscribers[channel]
+
+
+class PostgresBroker(LocalBroker):
+    """Общий брокер на LISTEN/NOTIFY PostgreSQL.
+
+    publish() шлёт NOTIFY из любого процесса (веб-воркер, команда, фоновая
+    задача). В процессе с подписчиками один поток держит соединение с LISTEN
+    и раздаёт пришедшие события локальным очередям.
+    """
+
+    pg_channel = "myhouse24_events"
+
+    def __init__(self, queue_size=100, using="default"):
+        super().__init__(queue_size)
+        self.using = using
+        self._listener = None
+
+    def publish(self, channel, message):
+        payload = json.dumps(
+            {"channel": channel, "message": message},
+            cls=DjangoJSONEncoder,
+            ensure_ascii=False,
+        )
+        with connections[self.using].cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.pg_channel, payload])
+
+    async def subscribe(self, channels, timeout=None):
+        self._start_listener()
+        async for message in super().subscribe(channels, timeout):
+            yield message
+
+    def _start_listener(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(
+                    target=self._listen, name="events-listener", daemon=True
+                )
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            wrapper = connections[self.using]
+            conn = None
+            try:
+                # отдельное соединение: соединения Django привязаны к потокам
+                conn = wrapper.get_new_connection(wrapper.get_connection_params())
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.pg_channel}")
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        data = json.loads(conn.notifies.pop(0).payload)
+                        LocalBroker.publish(self, data["channel"], data["message"])
+            except Exception:
+                logger.exception("Соединение LISTEN потеряно, переподключение")
+                time.sleep(5)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+
+def _offer(queue, message):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        # медленный клиент: пропускаем событие, а не копим память
+        logger.warning("Очередь подписчика переполнена, событие пропущено")
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(
+        getattr(settings, "EVENTS_BROKER", "core.events.LocalBroker")
+    )()
+
+
+def publish(channels, event, data):
+    """Отправить событие в каналы после коммита текущей транзакции."""
+    channels = set(channels)
+    if not channels:
+        return
+    message = {"event": event, "data": data}
+
+    def send():
+        broker = get_broker()
+        for channel in channels:
+            broker.publish(channel, message)
+
+    # брокер недоступен — теряем событие, а не ломаем сохранение
+    transaction.on_commit(send, robust=True)
+
+
+async def stream(channels):
+    """Тело ответа text/event-stream: события и периодический keep-alive."""
+    keepalive = getattr(settings, "EVENTS_KEEPALIVE", 15)
+    yield "retry: 5000\n\n"
+    async for message in get_broker().subscribe(channels, timeout=keepalive):
+        if message is None:
+            yield ": keep-alive\n\n"
+            continue
+        data = json.dumps(message["data"], cls=DjangoJSONEncoder, ensure_ascii=False)
+        yield f"event: {message['event']}\ndata: {data}\n\n"
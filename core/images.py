@@ -0,0 +1,87 @@
+import io
+import logging
+from contextlib import contextmanager
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from core import background
+from core.models import Gallery
+
+logger = logging.getLogger(__name__)
+
+# формат варианта -> (формат Pillow, параметры сохранения)
+VARIANT_FORMATS = {
+    "jpg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+}
+
+
+def _save(storage, name, data):
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(data))
+
+
+@contextmanager
+def discard_on_error(saved):
+    """Удаляет файлы из saved (FieldFile), если блок завершился ошибкой.
+
+    Оборачивает transaction.atomic(): при откате строки исчезают, а уже
+    записанные в хранилище файлы — нет.
+    """
+    try:
+        yield saved
+    except BaseException:
+        for f in saved:
+            f.storage.delete(f.name)
+        raise
+
+
+def make_variants(gallery_id):
+    """Создаёт уменьшенную копию и WebP рядом с оригиналом изображения."""
+    gallery = Gallery.objects.filter(pk=gallery_id).first()
+    if gallery is None or not gallery.image:
+        return
+    storage = gallery.image.storage
+
+    try:
+        with storage.open(gallery.image.name, "rb") as fh:
+            img = ImageOps.exif_transpose(Image.open(fh))
+            img = ImageOps.fit(img.convert("RGB"), gallery.size, Image.LANCZOS)
+    except OSError:
+        # файл пропал или это не изображение — остаётся оригинал без вариантов
+        logger.warning(
+            "Не удалось прочитать изображение %s (галерея %s)",
+            gallery.image.name,
+            gallery_id,
+            exc_info=True,
+        )
+        return
+
+    for ext, (fmt, params) in VARIANT_FORMATS.items():
+        buf = io.BytesIO()
+        img.save(buf, fmt, **params)
+        _save(storage, gallery.variant_name(ext), buf.getvalue())
+
+    Gallery.objects.filter(pk=gallery_id).update(variants_ready=True)
+
+
+def gallery_files(gallery):
+    """Имена оригинала и всех вариантов изображения в хранилище."""
+    if not gallery.image:
+        return []
+    return [gallery.image.name] + [gallery.variant_name(ext) for ext in VARIANT_FORMATS]
+
+
+def delete_files(storage, names):
+    for name in names:
+        try:
+            storage.delete(name)
+        except OSError:
+            logger.warning("Не удалось удалить файл %s", name, exc_info=True)
+
+
+def schedule_variants(gallery_ids):
+    for pk in gallery_ids:
+        background.submit(make_variants, pk)
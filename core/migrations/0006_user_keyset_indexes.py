@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0005_alter_flat_floor_alter_floor_section_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['last_name', 'first_name', 'id'], name='core_user_last_na_79a1a5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['email', 'id'], name='core_user_email_802795_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations
+
+# icontains на PostgreSQL компилируется в UPPER("col"::text) LIKE UPPER('%...%'),
+# поэтому индексируем то же выражение. На других БД (SQLite для локальной
+# разработки) и без расширения pg_trgm миграция ничего не делает —
+# фильтры работают как раньше.
+INDEXES = {
+    "core_house_name_trgm": "house_name",
+    "core_house_address_trgm": "address",
+}
+
+
+def _pg_trgm_available(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    # без contrib-расширения индексы не создаём — поиск работает, но без индекса
+    if not _pg_trgm_available(schema_editor.connection):
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, column in INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON core_house "
+            f"USING gin ((UPPER({column}::text)) gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name in INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_user_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
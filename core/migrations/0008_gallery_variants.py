@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_house_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gallery',
+            name='slot',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='gallery',
+            name='variants_ready',
+            field=models.BooleanField(default=False),
+        ),
+    ]
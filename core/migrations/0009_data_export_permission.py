@@ -0,0 +1,25 @@
+from django.db import migrations
+
+CODE = "data_export"
+NAME = "Выгрузка данных"
+
+
+def create_permission(apps, schema_editor):
+    # право для массовых выгрузок (экспорт CSV/XLSX, архив квитанций дома)
+    Permission = apps.get_model("core", "Permission")
+    Permission.objects.get_or_create(code=CODE, defaults={"name": NAME})
+
+
+def delete_permission(apps, schema_editor):
+    apps.get_model("core", "Permission").objects.filter(code=CODE).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_gallery_variants"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_permission, delete_permission),
+    ]
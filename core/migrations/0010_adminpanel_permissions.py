@@ -0,0 +1,54 @@
+from django.db import migrations
+
+# разделы админки: код права -> название в матрице ролей
+SECTIONS = {
+    "statistics": "Статистика",
+    "cashbox": "Касса",
+    "invoices": "Квитанции на оплату",
+    "accounts": "Лицевые счета",
+    "flats": "Квартиры",
+    "owners": "Владельцы квартир",
+    "houses": "Дома",
+    "messages": "Сообщения",
+    "master_requests": "Заявки вызова мастера",
+    "meters": "Счётчики",
+    "site_management": "Управление сайтом",
+    "system_settings": "Настройки системы",
+    "users": "Пользователи",
+    "roles": "Роли",
+    "payment_details": "Платёжные реквизиты",
+    "payment_items": "Статьи платежей",
+}
+
+
+def create_permissions(apps, schema_editor):
+    # До этой миграции разделы админки не проверяли права. Чтобы сотрудники
+    # не потеряли доступ после обновления, новые права получают все роли;
+    # дальше их сужают в матрице ролей.
+    Permission = apps.get_model("core", "Permission")
+    Role = apps.get_model("core", "Role")
+    taken = set(Permission.objects.values_list("name", flat=True))
+    created = []
+    for code, name in SECTIONS.items():
+        if Permission.objects.filter(code=code).exists():
+            continue
+        if name in taken:
+            name = f"{name} ({code})"  # название уже занято правом с другим кодом
+        created.append(Permission.objects.create(code=code, name=name))
+    for role in Role.objects.all():
+        role.permissions.add(*created)
+
+
+def delete_permissions(apps, schema_editor):
+    apps.get_model("core", "Permission").objects.filter(code__in=SECTIONS).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_data_export_permission"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_permissions, delete_permissions),
+    ]
@@ -1,3 +1,5 @@
+import posixpath
+
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.conf import settings
@@ -29,6 +31,13 @@ class User(AbstractUser):
         "core.Role", on_delete=models.SET_NULL, null=True, blank=True
     )
 
+    class Meta(AbstractUser.Meta):
+        # индексы под keyset-пагинацию таблицы пользователей
+        indexes = [
+            models.Index(fields=["last_name", "first_name", "id"]),
+            models.Index(fields=["email", "id"]),
+        ]
+
 
 class House(models.Model):
     house_name = models.CharField(max_length=255)
@@ -57,5 +66,34 @@ class Flat(models.Model):
 
 
 class Gallery(models.Model):  # исправлено: Galery -> Gallery
+    # размеры слотов как в GalleryForm: #1 — 522x350, остальные — 248x160
+    SLOT_SIZES = {1: (522, 350)}
+    DEFAULT_SIZE = (248, 160)
+
     house = models.ForeignKey(House, on_delete=models.CASCADE, related_name="gallery")
     image = models.ImageField(upload_to="core/gallery/")
+    slot = models.PositiveSmallIntegerField(default=1)
+    variants_ready = models.BooleanField(default=False)
+
+    @property
+    def size(self):
+        return self.SLOT_SIZES.get(self.slot, self.DEFAULT_SIZE)
+
+    def variant_name(self, ext):
+        stem, _ = posixpath.splitext(self.image.name)
+        w, h = self.size
+        return f"{stem}_{w}x{h}.{ext}"
+
+    def variant_url(self, ext):
+        # пока фоновая обработка не закончилась — отдаём оригинал
+        if not self.variants_ready:
+            return self.image.url
+        return self.image.storage.url(self.variant_name(ext))
+
+    @property
+    def resized_url(self):
+        return self.variant_url("jpg")
+
+    @property
+    def webp_url(self):
+        return self.variant_url("webp")
@@ -0,0 +1,96 @@
+import base64
+import json
+from datetime import date, datetime
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+
+# ---------- Keyset (seek) пагинация
+# Страница выбирается условием "после последней строки предыдущей страницы"
+# по индексируемым полям сортировки, поэтому глубокие страницы стоят столько же,
+# сколько первая. Курсор — значения полей сортировки последней строки.
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Нельзя сериализовать {type(value)} в курсор")
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), default=_json_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        return None
+    return values if isinstance(values, list) else None
+
+
+def _seek_filter(ordering, values):
+    # (a, b, id) > (x, y, z)  =>  a > x OR (a = x AND b > y) OR (a = x AND b = y AND id > z)
+    q = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        cond = {f.lstrip("-"): v for f, v in zip(ordering[:i], values[:i])}
+        cond[f"{name}__{lookup}"] = values[i]
+        q |= Q(**cond)
+    return q
+
+
+def keyset_page(qs, ordering, cursor=None, size=25):
+    """Одна страница keyset-пагинации.
+
+    ordering — поля сортировки с одним направлением, последнее должно быть
+    уникальным (обычно "id" / "-id"). Возвращает (строки, курсор следующей
+    страницы или None).
+    """
+    ordering = list(ordering)
+    values = decode_cursor(cursor) if cursor else None
+    if values is not None and len(values) == len(ordering):
+        qs = qs.filter(_seek_filter(ordering, values))
+
+    rows = list(qs.order_by(*ordering)[: size + 1])
+    has_more = len(rows) > size
+    rows = rows[:size]
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        get = last.get if isinstance(last, dict) else lambda f: getattr(last, f)
+        next_cursor = encode_cursor(get(f.lstrip("-")) for f in ordering)
+    return rows, next_cursor
+
+
+# ---------- Пагинатор с оценкой количества строк
+class EstimatedCountPaginator(Paginator):
+    """Для больших нефильтрованных списков на PostgreSQL берёт количество
+    строк из статистики планировщика (pg_class.reltuples) вместо COUNT(*).
+    Маленькие таблицы, отфильтрованные выборки и другие БД считаются точно."""
+
+    exact_threshold = 10000
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if (
+            isinstance(qs, QuerySet)
+            and not qs.query.where
+            and connections[qs.db].vendor == "postgresql"
+        ):
+            with connections[qs.db].cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [qs.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= self.exact_threshold:
+                return row[0]
+        return super().count
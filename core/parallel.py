@@ -0,0 +1,117 @@
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django import db
+
+_shared = {}  # имя -> долгоживущий пул
+_shared_lock = threading.Lock()
+
+
+def _init_worker():
+    # дочерний процесс не должен использовать сокет БД родителя
+    db.connections.close_all()
+
+
+def imap_bounded(pool, func, tasks, window):
+    """Результаты func по задачам в порядке задач; в работе не больше window.
+
+    Следующая задача отправляется в пул, только когда забирают результат,
+    поэтому медленный потребитель не копит готовые результаты в памяти.
+    """
+    pending = deque()
+    try:
+        for task in tasks:
+            pending.append(pool.submit(func, task))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # потребитель бросил итерацию — не считаем то, что уже не нужно
+        for future in pending:
+            future.cancel()
+
+
+def process_imap(func, tasks, workers=None):
+    """Как process_map, но результаты отдаются по мере готовности (в порядке задач)."""
+    tasks = list(tasks)
+    workers = workers or multiprocessing.cpu_count()
+    if (
+        workers <= 1
+        or len(tasks) <= 1
+        or "fork" not in multiprocessing.get_all_start_methods()
+    ):
+        for t in tasks:
+            yield func(t)
+        return
+
+    db.connections.close_all()
+    workers = min(workers, len(tasks))
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=_init_worker,
+    ) as pool:
+        yield from imap_bounded(pool, func, tasks, 2 * workers)
+
+
+def process_map(func, tasks, workers=None):
+    """map() по пулу процессов; результаты в порядке задач.
+
+    Пул создаётся через fork — воркеры наследуют настроенный Django без
+    повторного setup(). Там, где fork недоступен, или при одном воркере
+    задачи выполняются в текущем процессе.
+    """
+    return list(process_imap(func, tasks, workers))
+
+
+class SharedPool:
+    """Пул процессов, который пересоздаётся, если сломался.
+
+    Когда воркер падает (OOM killer, segfault), ProcessPoolExecutor больше
+    не принимает задачи и бросает BrokenProcessPool — тогда submit
+    поднимает новый пул и отправляет задачу в него. Задачи, отправленные
+    в сломанный пул, завершаются с BrokenProcessPool у вызывающего.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._pool = self._create()
+
+    def _create(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=django.setup,
+        )
+
+    def submit(self, fn, *args, **kwargs):
+        pool = self._pool
+        try:
+            return pool.submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            with self._lock:
+                # пул мог уже пересоздать другой поток
+                if self._pool is pool:
+                    self._pool = self._create()
+                    pool.shutdown(wait=False, cancel_futures=True)
+            return self._pool.submit(fn, *args, **kwargs)
+
+
+def shared_pool(name, workers):
+    """Долгоживущий пул процессов на весь процесс сервера, общий для запросов.
+
+    Воркеры запускаются через spawn (fork из многопоточного сервера
+    небезопасен) и настраивают Django сами. Сломанный пул пересоздаётся
+    при следующей отправке задачи (SharedPool).
+    """
+    with _shared_lock:
+        pool = _shared.get(name)
+        if pool is None:
+            pool = _shared[name] = SharedPool(workers)
+        return pool
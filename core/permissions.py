@@ -0,0 +1,87 @@
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+
+from core.models import Permission
+
+# Скомпилированные наборы прав ролей: frozenset кодов Permission.code.
+# Хранятся в процессе и в общем кэше; общий номер версии в кэше
+# сбрасывает оба уровня при любом изменении ролей/прав.
+VERSION_KEY = "core:perms:version"
+CACHE_TIMEOUT = 60 * 60 * 24
+
+_local = {}  # role_id -> (версия, frozenset кодов)
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # ключ вытеснен/ещё не создан — новая версия не совпадёт ни с одной старой
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def role_permissions(role_id):
+    """Коды прав роли без запросов к БД, пока набор не изменился."""
+    if role_id is None:
+        return frozenset()
+    version = _version()
+    hit = _local.get(role_id)
+    if hit and hit[0] == version:
+        return hit[1]
+
+    key = f"core:perms:{version}:{role_id}"
+    codes = cache.get(key)
+    if codes is None:
+        codes = frozenset(
+            Permission.objects.filter(roles=role_id).values_list("code", flat=True)
+        )
+        cache.set(key, codes, CACHE_TIMEOUT)
+    _local[role_id] = (version, codes)
+    return codes
+
+
+def invalidate():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), None)
+    _local.clear()
+
+
+def has_permission(user, code):
+    if not user.is_authenticated or not user.is_active:
+        return False
+    if user.is_superuser:
+        return True
+    return code in role_permissions(user.role_id)
+
+
+# ---------- Проверка доступа во views
+def role_permission_required(code):
+    """Декоратор функциональной view: 403, если у роли пользователя нет права."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not has_permission(request.user, code):
+                raise PermissionDenied
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class RolePermissionRequiredMixin:
+    permission_code = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.permission_code and not has_permission(
+            request.user, self.permission_code
+        ):
+            raise PermissionDenied
+        return super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,42 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core import images, permissions
+from core.models import Gallery, Permission, Role
+
+
+# ---------- Сброс скомпилированных наборов прав ролей
+@receiver(m2m_changed, sender=Role.permissions.through)
+def role_permissions_changed(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        permissions.invalidate()
+
+
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+@receiver(post_delete, sender=Role)
+def permission_changed(sender, **kwargs):
+    permissions.invalidate()
+
+
+# ---------- Файлы галереи: оригинал и варианты уходят вместе со строкой
+def _delete_after_commit(storage, names):
+    # при откате строка вернётся — файлы удаляем только после коммита
+    if names:
+        transaction.on_commit(lambda: images.delete_files(storage, names))
+
+
+@receiver(pre_save, sender=Gallery)
+def gallery_image_replaced(sender, instance, **kwargs):
+    if not instance.pk:
+        return
+    old = sender.objects.filter(pk=instance.pk).first()
+    if old is not None and old.image and old.image.name != instance.image.name:
+        instance.variants_ready = False  # варианты нового файла ещё не готовы
+        _delete_after_commit(old.image.storage, images.gallery_files(old))
+
+
+@receiver(post_delete, sender=Gallery)
+def gallery_deleted(sender, instance, **kwargs):
+    _delete_after_commit(instance.image.storage, images.gallery_files(instance))
@@ -0,0 +1,40 @@
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+# StreamingHttpResponse отдаёт по кускам только итератор «своего» вида:
+# под ASGI синхронный итератор сначала целиком собирается в список
+# (sync_to_async(list)), под WSGI так же собирается асинхронный. Выгрузки
+# пишутся синхронно (ORM, пул рендера), поэтому под ASGI каждый следующий
+# кусок берётся из генератора в sync-потоке, а отдаётся асинхронно.
+
+_END = object()
+
+
+def _next(iterator):
+    return next(iterator, _END)
+
+
+async def aiter_sync(iterable):
+    """Асинхронный итератор над синхронным: каждый шаг — через sync_to_async.
+
+    thread_sensitive: все шаги идут в одном потоке, где живут соединение
+    с БД и серверный курсор генератора.
+    """
+    iterator = iter(iterable)
+    step = sync_to_async(_next, thread_sensitive=True)
+    try:
+        while (chunk := await step(iterator)) is not _END:
+            yield chunk
+    finally:
+        # клиент оборвал загрузку — закрываем генератор (курсор, файлы) там же
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=True)()
+
+
+def streaming_response(request, content, **kwargs):
+    """StreamingHttpResponse, который отдаёт content по кускам под WSGI и ASGI."""
+    if isinstance(request, ASGIRequest):
+        content = aiter_sync(content)
+    return StreamingHttpResponse(content, **kwargs)
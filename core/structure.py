@@ -0,0 +1,113 @@
+from django.db import transaction
+from django.db.models import Case, ProtectedError, Value, When
+
+from core.models import Flat, Floor, Section
+
+
+def _refuse_if_flats(flats):
+    # каскад молча удалил бы квартиры вместе с лицевыми счетами и показаниями
+    flats = flats.order_by("id")
+    if flats.exists():
+        raise ProtectedError(
+            "Нельзя удалить секцию или этаж, в которых есть квартиры", flats
+        )
+
+
+def _merge_floors(duplicates):
+    """Переносит всё, что ссылается на дубли этажей, на оставшийся этаж.
+
+    duplicates — {id дубля: id этажа, который остаётся}; по одному UPDATE
+    на каждую модель со ссылкой на этаж.
+    """
+    whens = [When(floor_id=dup, then=Value(keep)) for dup, keep in duplicates.items()]
+    for rel in Floor._meta.related_objects:
+        rel.related_model._base_manager.filter(
+            **{f"{rel.field.name}__in": list(duplicates)}
+        ).update(**{rel.field.name: Case(*whens)})
+
+
+def apply_house_structure(house, sections, floor_numbers):
+    """Приводит сетку секций × этажей дома к заданной.
+
+    sections — пары (id или None, название) в порядке формы. Секция
+    сопоставляется по id, а без него — по названию среди ещё не занятых;
+    совпавшие переименовываются, несопоставленные удаляются, остальные
+    создаются. Этажи, номера которых остались, сохраняются вместе с
+    квартирами; квартиры дублей этажа переносятся на оставшийся. Удалить
+    секцию или этаж с квартирами нельзя — ProtectedError. Все изменения —
+    пачками, число запросов не зависит от размера сетки.
+    """
+    floor_numbers = list(dict.fromkeys(floor_numbers))  # без дублей, порядок тот же
+
+    with transaction.atomic():
+        existing = {s.pk: s for s in Section.objects.filter(house=house).order_by("id")}
+        matched = {}  # позиция в форме -> существующая секция
+        for i, (pk, name) in enumerate(sections):
+            if pk in existing:
+                matched[i] = existing.pop(pk)
+        by_name = {}
+        for section in existing.values():
+            by_name.setdefault(section.section_name, []).append(section)
+        for i, (pk, name) in enumerate(sections):
+            if i not in matched and by_name.get(name):
+                section = by_name[name].pop(0)
+                matched[i] = existing.pop(section.pk)
+
+        kept, renamed = [], []
+        for i, section in sorted(matched.items()):
+            name = sections[i][1]
+            if section.section_name != name:
+                section.section_name = name
+                renamed.append(section)
+            kept.append(section)
+        if renamed:
+            Section.objects.bulk_update(renamed, ["section_name"])
+
+        # удаляем только то, что пользователь действительно убрал
+        if existing:
+            _refuse_if_flats(Flat.objects.filter(floor__section__in=list(existing)))
+            Section.objects.filter(pk__in=list(existing)).delete()
+
+        created = Section.objects.bulk_create(
+            [
+                Section(house=house, section_name=name)
+                for i, (pk, name) in enumerate(sections)
+                if i not in matched
+            ]
+        )
+
+        # этажи существующих секций: что оставить, что удалить
+        wanted = set(floor_numbers)
+        present = {s.pk: {} for s in kept}  # секция -> {номер: id этажа}
+        stale, duplicates = [], {}
+        if kept:
+            rows = (
+                Floor.objects.filter(section__in=kept)
+                .order_by("id")
+                .values_list("id", "section_id", "number")
+            )
+            for floor_id, section_id, number in rows:
+                if number not in wanted:
+                    stale.append(floor_id)
+                elif number in present[section_id]:
+                    duplicates[floor_id] = present[section_id][number]
+                else:
+                    present[section_id][number] = floor_id
+        if stale:
+            _refuse_if_flats(Flat.objects.filter(floor__in=stale))
+        if duplicates:
+            _merge_floors(duplicates)
+        if stale or duplicates:
+            Floor.objects.filter(pk__in=stale + list(duplicates)).delete()
+
+        Floor.objects.bulk_create(
+            [
+                Floor(section_id=section.pk, number=number)
+                for section in kept + created
+                for number in floor_numbers
+                if number not in present.get(section.pk, ())
+            ],
+            batch_size=1000,
+        )
+
+    return kept + created
@@ -1 +1,429 @@
-# Create your tests here.
+import asyncio
+import base64
+import io
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from types import SimpleNamespace
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db.models import ProtectedError, Q
+from django.test import (
+    AsyncRequestFactory,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from billing.models import Tariff
+from core import events
+from core.images import discard_on_error, gallery_files, make_variants
+from core.models import Flat, Floor, Gallery, House, Section, User
+from core.pagination import _seek_filter, decode_cursor, encode_cursor, keyset_page
+from core.parallel import SharedPool, imap_bounded
+from core.streaming import aiter_sync, streaming_response
+from core.structure import apply_house_structure
+from core.zipstream import stream_zip
+
+
+# ---------- Keyset пагинация
+class SeekFilterTests(SimpleTestCase):
+    def test_single_field(self):
+        self.assertEqual(_seek_filter(["id"], [5]), Q(id__gt=5))
+        self.assertEqual(_seek_filter(["-id"], [5]), Q(id__lt=5))
+
+    def test_compound_ordering(self):
+        self.assertEqual(
+            _seek_filter(["-house_name", "id"], ["Б", 7]),
+            Q(house_name__lt="Б") | Q(house_name="Б", id__gt=7),
+        )
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(["Дом", 3])), ["Дом", 3])
+
+    def test_broken_cursor(self):
+        self.assertIsNone(decode_cursor("не-курсор"))
+        # корректный base64, но не список значений
+        token = base64.urlsafe_b64encode(b'{"id":1}').decode()
+        self.assertIsNone(decode_cursor(token))
+        self.assertIsNone(decode_cursor(""))
+
+
+class KeysetPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # повторяющиеся названия: порядок между ними решает id
+        for name in "ВБАБВАБ":
+            House.objects.create(house_name=name, address="ул. 1")
+
+    def pages(self, ordering, size):
+        qs = House.objects.all()
+        cursor, result = None, []
+        while True:
+            rows, cursor = keyset_page(qs, ordering, cursor, size)
+            result.append([h.pk for h in rows])
+            if cursor is None:
+                return result
+
+    def test_pages_cover_all_rows_in_order(self):
+        ordering = ["-house_name", "id"]
+        expected = list(House.objects.order_by(*ordering).values_list("pk", flat=True))
+        pages = self.pages(ordering, 3)
+        self.assertEqual([len(p) for p in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_last_full_page_has_no_cursor(self):
+        pages = self.pages(["id"], 7)
+        self.assertEqual(len(pages), 1)
+        self.assertEqual(len(pages[0]), 7)
+
+    def test_values_rows(self):
+        qs = House.objects.values("house_name", "id")
+        rows, cursor = keyset_page(qs, ["house_name", "id"], size=2)
+        self.assertEqual([r["house_name"] for r in rows], ["А", "А"])
+        rows, _ = keyset_page(qs, ["house_name", "id"], cursor, size=2)
+        self.assertEqual([r["house_name"] for r in rows], ["Б", "Б"])
+
+    def test_foreign_cursor_starts_from_first_page(self):
+        # курсор с другим числом полей сортировки игнорируется
+        first, _ = keyset_page(House.objects.all(), ["id"], size=2)
+        rows, _ = keyset_page(
+            House.objects.all(), ["id"], encode_cursor(["А", 1]), size=2
+        )
+        self.assertEqual(rows, first)
+
+
+# ---------- Потоковый ZIP
+class StreamZipTests(SimpleTestCase):
+    def read(self, chunks):
+        return zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+
+    def test_bytes_and_chunked_files(self):
+        files = [
+            ("a.txt", b"alpha"),
+            ("b/c.pdf", iter([b"part1-", b"part2"])),
+            ("empty.txt", b""),
+        ]
+        archive = self.read(stream_zip(files))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.namelist(), ["a.txt", "b/c.pdf", "empty.txt"])
+        self.assertEqual(archive.read("b/c.pdf"), b"part1-part2")
+        self.assertEqual(archive.read("empty.txt"), b"")
+
+    def test_files_are_consumed_lazily(self):
+        consumed = []
+
+        def files():
+            for i in range(3):
+                consumed.append(i)
+                yield f"{i}.txt", b"x" * 1000
+
+        stream = stream_zip(files())
+        next(stream)
+        # первый кусок отдан до того, как запрошены остальные файлы
+        self.assertEqual(consumed, [0])
+        list(stream)
+        self.assertEqual(consumed, [0, 1, 2])
+
+    def test_empty_archive(self):
+        self.assertEqual(self.read(stream_zip([])).namelist(), [])
+
+
+# ---------- Потоковые ответы под WSGI и ASGI
+class StreamingResponseTests(SimpleTestCase):
+    def chunks(self, consumed, closed=None):
+        try:
+            for i in range(3):
+                consumed.append(i)
+                yield f"{i}".encode()
+        finally:
+            if closed is not None:
+                closed.append(True)
+
+    def test_wsgi_keeps_sync_iterator(self):
+        consumed = []
+        request = RequestFactory().get("/")
+        response = streaming_response(request, self.chunks(consumed))
+        self.assertFalse(response.is_async)
+        stream = iter(response)
+        self.assertEqual(next(stream), b"0")
+        self.assertEqual(consumed, [0])
+
+    async def test_asgi_streams_without_buffering(self):
+        consumed = []
+        request = AsyncRequestFactory().get("/")
+        response = streaming_response(request, self.chunks(consumed))
+        self.assertTrue(response.is_async)
+        stream = aiter(response)
+        self.assertEqual(await anext(stream), b"0")
+        # остальное не собрано в список заранее
+        self.assertEqual(consumed, [0])
+        self.assertEqual([chunk async for chunk in stream], [b"1", b"2"])
+
+    async def test_abandoned_stream_closes_generator(self):
+        consumed, closed = [], []
+        stream = aiter_sync(self.chunks(consumed, closed))
+        self.assertEqual(await anext(stream), b"0")
+        await stream.aclose()
+        self.assertEqual(closed, [True])
+        self.assertEqual(consumed, [0])
+
+
+# ---------- SSE-поток событий
+@override_settings(EVENTS_BROKER="core.events.LocalBroker", EVENTS_KEEPALIVE=5)
+class EventsViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="owner")
+        cls.url = reverse("events")
+
+    def setUp(self):
+        events.get_broker.cache_clear()
+        self.addCleanup(events.get_broker.cache_clear)
+
+    def test_wsgi_gets_no_content(self):
+        self.client.force_login(self.user)
+        response = self.client.get(self.url)
+        # 204 — EventSource больше не переподключается
+        self.assertEqual(response.status_code, 204)
+
+    async def test_anonymous_is_refused(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+    async def subscribe(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b"retry: 5000\n\n")
+        # подписка оформляется при запросе следующего куска
+        chunk = asyncio.ensure_future(anext(stream))
+        channel = events.user_channel(self.user.pk)
+        while channel not in events.get_broker()._subscribers:
+            await asyncio.sleep(0)
+        return stream, chunk
+
+    def publish(self, *args):
+        # событие уходит в брокер только после коммита транзакции
+        with self.captureOnCommitCallbacks(execute=True):
+            events.publish(*args)
+
+    async def test_event_is_delivered_to_user(self):
+        stream, chunk = await self.subscribe()
+        await sync_to_async(self.publish)(
+            [events.user_channel(self.user.pk), events.STAFF_CHANNEL],
+            "message",
+            {"count": 1, "text": "Новое сообщение"},
+        )
+        self.assertEqual(
+            (await asyncio.wait_for(chunk, 1)).decode(),
+            'event: message\ndata: {"count": 1, "text": "Новое сообщение"}\n\n',
+        )
+        # клиент отключился: ASGI-обработчик отменяет ожидание следующего события
+        waiting = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual(events.get_broker()._subscribers, {})
+
+    @override_settings(EVENTS_KEEPALIVE=0.01)
+    async def test_keepalive_when_idle(self):
+        stream, chunk = await self.subscribe()
+        self.assertEqual(await asyncio.wait_for(chunk, 1), b": keep-alive\n\n")
+        await stream.aclose()
+
+
+# ---------- Пул с ограниченным окном
+class ImapBoundedTests(SimpleTestCase):
+    def test_results_in_task_order_with_bounded_window(self):
+        submitted = []
+
+        def tasks():
+            for i in range(10):
+                submitted.append(i)
+                yield i
+
+        with ThreadPoolExecutor(2) as pool:
+            results = imap_bounded(pool, lambda x: x * x, tasks(), window=3)
+            self.assertEqual(next(results), 0)
+            # до первого результата отправлено не больше window задач
+            self.assertEqual(submitted, [0, 1, 2])
+            self.assertEqual(list(results), [i * i for i in range(1, 10)])
+
+
+class SharedPoolTests(SimpleTestCase):
+    @mock.patch("core.parallel.ProcessPoolExecutor")
+    def test_broken_pool_is_rebuilt_on_submit(self, executor):
+        broken, fresh = mock.Mock(), mock.Mock()
+        broken.submit.side_effect = BrokenProcessPool("воркер упал")
+        executor.side_effect = [broken, fresh]
+
+        pool = SharedPool(2)
+        future = pool.submit(abs, -1)
+
+        self.assertIs(future, fresh.submit.return_value)
+        fresh.submit.assert_called_once_with(abs, -1)
+        broken.shutdown.assert_called_once_with(wait=False, cancel_futures=True)
+        # следующие задачи идут в новый пул без пересоздания
+        pool.submit(abs, -2)
+        self.assertEqual(executor.call_count, 2)
+
+
+# ---------- Сетка секций и этажей дома
+class HouseStructureTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="owner")
+        cls.tariff = Tariff.objects.create(
+            tariff_name="Базовый", tariff_description="", last_date=timezone.now()
+        )
+
+    def setUp(self):
+        self.house = House.objects.create(house_name="Дом", address="ул. 1")
+        apply_house_structure(self.house, [(None, "S1"), (None, "S2")], [1, 2])
+
+    def grid(self):
+        return sorted(
+            Floor.objects.filter(section__house=self.house).values_list(
+                "section__section_name", "number"
+            )
+        )
+
+    def section(self, name):
+        return Section.objects.get(house=self.house, section_name=name)
+
+    def settle(self, section_name, number):
+        floor = Floor.objects.get(section=self.section(section_name), number=number)
+        return Flat.objects.create(
+            number_flat=1, square=50, floor=floor, user=self.user, tariff=self.tariff
+        )
+
+    def test_rename_keeps_floors_and_flats(self):
+        flat = self.settle("S1", 1)
+        s1, s2 = self.section("S1"), self.section("S2")
+        apply_house_structure(self.house, [(s1.pk, "A"), (s2.pk, "B")], [1, 2, 3])
+        self.assertEqual(
+            self.grid(),
+            [("A", 1), ("A", 2), ("A", 3), ("B", 1), ("B", 2), ("B", 3)],
+        )
+        flat.refresh_from_db()
+        self.assertEqual(flat.floor.section_id, s1.pk)
+
+    def test_removing_empty_section_and_floor(self):
+        s2 = self.section("S2")
+        apply_house_structure(self.house, [(s2.pk, "S2")], [2])
+        self.assertEqual(self.grid(), [("S2", 2)])
+
+    def test_refuses_to_drop_floor_with_flats(self):
+        flat = self.settle("S1", 2)
+        s1, s2 = self.section("S1"), self.section("S2")
+        with self.assertRaises(ProtectedError):
+            apply_house_structure(self.house, [(s1.pk, "S1"), (s2.pk, "S2")], [1])
+        self.assertTrue(Flat.objects.filter(pk=flat.pk).exists())
+        self.assertEqual(len(self.grid()), 4)
+
+    def test_refuses_to_drop_section_with_flats(self):
+        self.settle("S2", 1)
+        with self.assertRaises(ProtectedError):
+            apply_house_structure(self.house, [(self.section("S1").pk, "S1")], [1, 2])
+        self.assertEqual(len(self.grid()), 4)
+
+    def test_duplicate_floors_are_merged_with_their_flats(self):
+        s1 = self.section("S1")
+        duplicate = Floor.objects.create(section=s1, number=1)
+        flat = Flat.objects.create(
+            number_flat=7,
+            square=40,
+            floor=duplicate,
+            user=self.user,
+            tariff=self.tariff,
+        )
+        apply_house_structure(
+            self.house, [(s1.pk, "S1"), (self.section("S2").pk, "S2")], [1, 2]
+        )
+        self.assertEqual(len(self.grid()), 4)
+        flat.refresh_from_db()
+        self.assertEqual(
+            flat.floor, Floor.objects.get(section=s1, number=1), "квартира на дубле"
+        )
+
+
+class DiscardOnErrorTests(SimpleTestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.storage = FileSystemStorage(location=root)
+
+    def save(self, name):
+        # как FieldFile: хранилище и имя файла в нём
+        name = self.storage.save(name, ContentFile(b"data"))
+        return SimpleNamespace(storage=self.storage, name=name)
+
+    def test_files_removed_on_error(self):
+        with self.assertRaises(ProtectedError):
+            with discard_on_error([]) as saved:
+                saved.append(self.save("a.jpg"))
+                raise ProtectedError("откат", [])
+        self.assertFalse(self.storage.exists("a.jpg"))
+
+    def test_files_kept_on_success(self):
+        with discard_on_error([]) as saved:
+            saved.append(self.save("a.jpg"))
+        self.assertTrue(self.storage.exists("a.jpg"))
+
+
+# ---------- Варианты изображений галереи
+class GalleryFilesTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.enterContext(override_settings(MEDIA_ROOT=root))
+        self.house = House.objects.create(house_name="Дом", address="ул. 1")
+
+    def upload(self, slot=2):
+        buf = io.BytesIO()
+        Image.new("RGB", (600, 400), "red").save(buf, "JPEG")
+        gallery = Gallery(house=self.house, slot=slot)
+        gallery.image.save("house.jpg", ContentFile(buf.getvalue()))
+        make_variants(gallery.pk)
+        gallery.refresh_from_db()
+        return gallery
+
+    def exists(self, names):
+        storage = Gallery._meta.get_field("image").storage
+        return [storage.exists(name) for name in names]
+
+    def test_variants_created(self):
+        gallery = self.upload()
+        self.assertTrue(gallery.variants_ready)
+        self.assertEqual(self.exists(gallery_files(gallery)), [True, True, True])
+        self.assertTrue(gallery.webp_url.endswith("_248x160.webp"))
+
+    def test_files_removed_after_delete_commits(self):
+        gallery = self.upload()
+        names = gallery_files(gallery)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.house.delete()  # галерея удаляется каскадом
+        self.assertEqual(self.exists(names), [False, False, False])
+
+    def test_replaced_image_files_removed(self):
+        gallery = self.upload()
+        old = gallery_files(gallery)
+        with self.captureOnCommitCallbacks(execute=True):
+            gallery.image.save("other.jpg", ContentFile(b"new"))
+        self.assertEqual(self.exists(old), [False, False, False])
+        gallery.refresh_from_db()
+        self.assertFalse(gallery.variants_ready)
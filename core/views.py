@@ -1,6 +1,29 @@
-from django.http import HttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+
+from core import events as event_stream
 
 
 # Create your views here.
 def index(request):
     return HttpResponse("Проект запущен! ✅")
+
+
+async def events(request):
+    """SSE-поток событий пользователя; персонал слушает и общий канал."""
+    if not isinstance(request, ASGIRequest):
+        # под WSGI поток занял бы поток воркера навсегда; 204 — EventSource
+        # больше не переподключается
+        return HttpResponse(status=204)
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    channels = [event_stream.user_channel(user.pk)]
+    if user.is_staff:
+        channels.append(event_stream.STAFF_CHANNEL)
+    response = StreamingHttpResponse(
+        event_stream.stream(channels), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx не должен буферизовать поток
+    return response
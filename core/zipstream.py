@@ -0,0 +1,44 @@
+import zipfile
+
+
+class _Sink:
+    """Несмещаемый поток для ZipFile: копит записанное до выдачи клиенту."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+
+def stream_zip(files, compression=zipfile.ZIP_DEFLATED, compresslevel=1):
+    """Отдаёт ZIP-архив кусками по мере поступления файлов.
+
+    files — итерируемое пар (имя в архиве, содержимое), где содержимое —
+    bytes или итератор кусков bytes (такой файл пишется и отдаётся по частям,
+    не собираясь целиком). Поток без seek, поэтому размеры пишутся в
+    дескрипторах после данных, а центральный каталог — в конце.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(
+        sink, "w", compression=compression, compresslevel=compresslevel
+    ) as archive:
+        for name, data in files:
+            if isinstance(data, (bytes, bytearray)):
+                archive.writestr(name, data)
+            else:
+                # размер заранее неизвестен — сразу ZIP64
+                with archive.open(name, "w", force_zip64=True) as fh:
+                    for chunk in data:
+                        fh.write(chunk)
+                        yield from sink.drain()
+            yield from sink.drain()
+    yield from sink.drain()
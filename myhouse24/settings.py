@@ -72,12 +72,22 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "support.context_processors.unread_messages",
+                "core.context_processors.events",
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = "myhouse24.wsgi.application"
+# SSE-поток /events/ работает только под ASGI:
+#   uvicorn myhouse24.asgi:application --workers 4
+# Выгрузки (ZIP квитанций, CSV/XLSX) отдаются потоком под обоими серверами
+# (core.streaming), отдельный WSGI-сервер для загрузок не нужен.
+ASGI_APPLICATION = "myhouse24.asgi.application"
+
+# События для SSE передаются между процессами через LISTEN/NOTIFY
+EVENTS_BROKER = config("EVENTS_BROKER", default="core.events.PostgresBroker")
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -93,6 +103,31 @@ DATABASES = {
     }
 }
 
+# Кэш общий для всех процессов (веб-воркеры, команды, фоновые задачи):
+# в нём версии прав ролей, счётчики непрочитанных, прогресс рассылок,
+# снимок дашборда и версии страниц сайта. Без REDIS_URL (локальная
+# разработка, один процесс) — кэш в памяти процесса.
+REDIS_URL = config("REDIS_URL", default="")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "myhouse24",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "KEY_PREFIX": "myhouse24",
+        }
+    }
+
+# Версия сборки (например, хеш коммита) в ключах кэша страниц сайта;
+# без неё версия считается по шаблонам (pages.cache.build_version)
+BUILD_ID = config("BUILD_ID", default="")
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -19,11 +19,14 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core import views as core_views
+
 urlpatterns = [
     # path('admin/', admin.site.urls),           # Админка Django
     path("", include("pages.urls")),  # Публичный сайт
     path("cabinet/", include("cabinet.urls")),  # Личный кабинет пользователя
     path("adminpanel/", include("adminpanel.urls")),
+    path("events/", core_views.events, name="events"),  # SSE-поток (ASGI)
 ]
 
 if settings.DEBUG:
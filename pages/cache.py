@@ -0,0 +1,119 @@
+import hashlib
+import time
+from functools import lru_cache, wraps
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template import engines
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+# Готовые страницы публичного сайта: тело, ETag и Last-Modified в кэше.
+# У каждой страницы свой номер версии — время последнего изменения контента
+# в наносекундах; сигналы (pages.signals) меняют его при правке моделей,
+# и запись со старой версией считается промахом — даже если её дописал
+# запрос, начавший рендер до изменения. Ключи включают версию сборки:
+# после выката новых шаблонов (в том числе страниц без моделей, как
+# «Условия») процессы с новым кодом не видят старых записей.
+PAGE_KEY = "pages:page:{build}:{name}"
+VERSION_KEY = "pages:version:{build}:{name}"
+
+
+def _timeout():
+    return getattr(settings, "PAGE_CACHE_TIMEOUT", 60 * 60 * 24)
+
+
+@lru_cache(maxsize=None)
+def build_version():
+    """BUILD_ID из настроек, а без него — хеш шаблонов проекта."""
+    build = getattr(settings, "BUILD_ID", "")
+    if build:
+        return build
+    digest = hashlib.md5(usedforsecurity=False)
+    for engine in engines.all():
+        for directory in map(Path, getattr(engine, "dirs", ())):
+            for path in sorted(directory.rglob("*")):
+                if path.is_file():
+                    digest.update(str(path.relative_to(directory)).encode())
+                    digest.update(path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+def _keys(name):
+    build = build_version()
+    key = PAGE_KEY.format(build=build, name=name)
+    return key, VERSION_KEY.format(build=build, name=name)
+
+
+def _version(version_key, cached):
+    version = cached.get(version_key)
+    if version is None:
+        # момент изменения неизвестен (кэш очищен, новая сборка) — считаем
+        # контент изменившимся сейчас: Last-Modified не раньше настоящего
+        cache.add(version_key, time.time_ns(), None)
+        version = cache.get(version_key)
+    return version
+
+
+def invalidate(names):
+    for name in set(names):
+        # новая версия — момент изменения; старые записи с ней не совпадут
+        cache.set(_keys(name)[1], time.time_ns(), None)
+
+
+def _store(key, version, response):
+    content = response.content
+    entry = {
+        "version": version,
+        "content": content,
+        "content_type": response["Content-Type"],
+        "etag": quote_etag(hashlib.md5(content, usedforsecurity=False).hexdigest()),
+        # время изменения контента, а не записи: перерендер после вытеснения
+        # из кэша не сдвигает Last-Modified
+        "last_modified": version // 10**9,
+    }
+    cache.set(key, entry, _timeout())
+    return entry
+
+
+def cached_page(name):
+    """Отдаёт страницу из кэша и отвечает 304 на условные GET.
+
+    Кэшируются только GET/HEAD без параметров запроса и только ответы 200;
+    страница не должна зависеть от пользователя.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD") or request.GET:
+                return view(request, *args, **kwargs)
+            key, version_key = _keys(name)
+            cached = cache.get_many([key, version_key])
+            version = _version(version_key, cached)
+            entry = cached.get(key)
+            if entry is None or entry["version"] != version:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.streaming:
+                    return response
+                entry = _store(key, version, response)
+
+            response = HttpResponse(
+                entry["content"], content_type=entry["content_type"]
+            )
+            response["ETag"] = entry["etag"]
+            response["Last-Modified"] = http_date(entry["last_modified"])
+            # браузер переспрашивает каждый раз, но получает 304 без тела
+            patch_cache_control(response, no_cache=True)
+            return get_conditional_response(
+                request,
+                etag=entry["etag"],
+                last_modified=entry["last_modified"],
+                response=response,
+            )
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,38 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from pages import cache
+from pages.models import (
+    SEO,
+    AboutPage,
+    AboutPageGallery,
+    Contact,
+    ImageBlock,
+    ShowcasePage,
+    TariffPage,
+)
+
+# модель контента -> страницы, которые её показывают
+PAGE_MODELS = {
+    SEO: ("home", "about", "services", "contacts"),
+    ShowcasePage: ("home",),
+    TariffPage: ("services",),
+    ImageBlock: ("home", "services"),
+    AboutPage: ("about",),
+    AboutPageGallery: ("about",),
+    Contact: ("contacts",),
+}
+
+
+# ---------- Сброс кэша страниц сайта при правке контента
+def content_changed(sender, raw=False, **kwargs):
+    if raw:
+        return
+    names = PAGE_MODELS[sender]
+    # после коммита — чтобы параллельный запрос не закэшировал старый контент
+    transaction.on_commit(lambda: cache.invalidate(names))
+
+
+for model in PAGE_MODELS:
+    post_save.connect(content_changed, sender=model)
+    post_delete.connect(content_changed, sender=model)
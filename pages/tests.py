@@ -1 +1,122 @@
-# Create your tests here.
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils.http import http_date
+
+from pages import cache as page_cache
+from pages.models import SEO
+
+T0 = 1_750_000_000 * 10**9  # наносекунды, как версия страницы
+
+
+# ---------- Кэш страниц сайта: ETag/304 и сброс
+@override_settings(BUILD_ID="test")
+class CachedPageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        page_cache.build_version.cache_clear()
+        self.addCleanup(page_cache.build_version.cache_clear)
+        self.rendered = []
+        self.body = "Условия"
+
+        @page_cache.cached_page("terms")
+        def view(request):
+            self.rendered.append(request.method)
+            return HttpResponse(self.body)
+
+        self.view = view
+        self.factory = RequestFactory()
+        patcher = mock.patch.object(page_cache.time, "time_ns", return_value=T0)
+        self.time_ns = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, path="/", **headers):
+        return self.view(self.factory.get(path, headers=headers))
+
+    def test_page_is_rendered_once(self):
+        first = self.get()
+        second = self.get()
+        self.assertEqual(second.content, "Условия".encode())
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertEqual(second["Last-Modified"], http_date(T0 // 10**9))
+        self.assertIn("no-cache", second["Cache-Control"])
+        self.assertEqual(self.rendered, ["GET"])
+
+    def test_conditional_get(self):
+        etag = self.get()["ETag"]
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(self.get(if_none_match='"other"').status_code, 200)
+        since = http_date(T0 // 10**9)
+        self.assertEqual(self.get(if_modified_since=since).status_code, 304)
+        self.assertEqual(self.rendered, ["GET"])
+
+    def test_post_and_query_string_bypass_cache(self):
+        self.get()
+        self.view(self.factory.post("/"))
+        self.get("/?page=2")
+        self.assertEqual(self.rendered, ["GET", "POST", "GET"])
+
+    def test_invalidate_renders_new_content(self):
+        old = self.get()
+        self.body = "Новые условия"
+        self.time_ns.return_value = T0 + 3600 * 10**9
+        page_cache.invalidate(["terms"])
+
+        response = self.get(if_none_match=old["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, "Новые условия".encode())
+        self.assertEqual(response["Last-Modified"], http_date(T0 // 10**9 + 3600))
+        self.assertEqual(len(self.rendered), 2)
+
+    def test_eviction_keeps_last_modified(self):
+        self.get()
+        cache.delete(page_cache._keys("terms")[0])
+        self.time_ns.return_value = T0 + 3600 * 10**9
+        response = self.get(if_modified_since=http_date(T0 // 10**9))
+        # перерендер того же контента — не изменение
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(self.rendered), 2)
+
+    def test_new_build_does_not_see_old_entries(self):
+        self.get()
+        with override_settings(BUILD_ID="next"):
+            page_cache.build_version.cache_clear()
+            self.get()
+        self.assertEqual(len(self.rendered), 2)
+
+    def test_build_version_follows_templates(self):
+        with tempfile.TemporaryDirectory() as directory:
+            template = Path(directory, "pages", "terms.html")
+            template.parent.mkdir()
+            template.write_text("v1")
+            templates = [
+                {
+                    "BACKEND": "django.template.backends.django.DjangoTemplates",
+                    "DIRS": [directory],
+                }
+            ]
+            with override_settings(BUILD_ID="", TEMPLATES=templates):
+                page_cache.build_version.cache_clear()
+                before = page_cache.build_version()
+                template.write_text("v2")
+                page_cache.build_version.cache_clear()
+                self.assertNotEqual(page_cache.build_version(), before)
+
+    def test_model_change_invalidates_its_pages_only(self):
+        self.get()
+        page_cache.invalidate(["home"])  # чужая страница
+        self.get()
+        self.assertEqual(len(self.rendered), 1)
+
+        version_key = page_cache._keys("home")[1]
+        self.time_ns.return_value = T0 + 1
+        with self.captureOnCommitCallbacks(execute=True):
+            SEO.objects.create(title="Сайт", description="", keywords="")
+        self.assertEqual(cache.get(version_key), T0 + 1)
+        self.assertEqual(cache.get(page_cache._keys("terms")[1]), T0)
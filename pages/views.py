@@ -1,24 +1,60 @@
 from django.shortcuts import render
 
+from pages.cache import cached_page
+from pages.models import AboutPage, Contact, ImageBlock, ShowcasePage, TariffPage
 
+# Страницы сайта меняются редко и не зависят от пользователя: ответы
+# кэшируются целиком (pages.cache), сбрасываются сигналами (pages.signals).
+
+
+def _page(model):
+    return model.objects.select_related("SEO").order_by("id").first()
+
+
+@cached_page("home")
 def index(request):
-    return render(request, "pages/index.html")
+    page = _page(ShowcasePage)
+    blocks = ImageBlock.objects.filter(ShowcasePage=page) if page else []
+    return render(
+        request,
+        "pages/index.html",
+        {"page": page, "seo": page and page.SEO, "blocks": list(blocks)},
+    )
 
 
+@cached_page("about")
 def about(request):
-    return render(request, "pages/about.html")
+    page = _page(AboutPage)
+    gallery = page.aboutpagegallery_set.order_by("id") if page else []
+    return render(
+        request,
+        "pages/about.html",
+        {"page": page, "seo": page and page.SEO, "gallery": list(gallery)},
+    )
 
 
+@cached_page("services")
 def services(request):
-    return render(request, "pages/services.html")
+    page = _page(TariffPage)
+    blocks = ImageBlock.objects.filter(TariffPage=page) if page else []
+    return render(
+        request,
+        "pages/services.html",
+        {"page": page, "seo": page and page.SEO, "blocks": list(blocks)},
+    )
 
 
+# моделей у страницы нет — меняется только с шаблоном, то есть с версией сборки
+@cached_page("terms")
 def terms(request):
     return render(request, "pages/terms.html")
 
 
+@cached_page("contacts")
 def contacts(request):
-    return render(request, "pages/contacts.html")
-
-
-# Create your views here.
+    contact = _page(Contact)
+    return render(
+        request,
+        "pages/contacts.html",
+        {"contact": contact, "seo": contact and contact.SEO},
+    )
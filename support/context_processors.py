@@ -0,0 +1,9 @@
+from support import inbox
+
+
+def unread_messages(request):
+    """Значок непрочитанных: считается лениво — только если шаблон его выводит."""
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {"unread_messages_count": lambda: inbox.unread_count(user.pk)}
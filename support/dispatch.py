@@ -0,0 +1,182 @@
+import math
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core import events
+from support.models import MasterRequest
+from support.signals import publish_request
+
+# Распределение заявок на мастеров. Визит занимает один слот сетки рабочего
+# дня; занятые слоты мастера хранятся как отсортированные непересекающиеся
+# блоки (смежные и пересекающиеся склеиваются), поэтому проверка конфликта и поиск
+# ближайшего свободного слота — бинарный поиск, а не перебор заявок.
+HORIZON_DAYS = 14
+
+
+def _slot():
+    return timedelta(minutes=getattr(settings, "MASTER_SLOT_MINUTES", 60))
+
+
+def _work_hours():
+    start, end = getattr(settings, "MASTER_WORK_HOURS", (9, 18))
+    return time(start), time(end)
+
+
+class MasterSchedule:
+    """Занятость одного мастера: блоки [starts[i], ends[i]) по возрастанию."""
+
+    def __init__(self, slot, work_hours):
+        self.slot = slot
+        self.work_start, self.work_end = work_hours
+        self.starts = []
+        self.ends = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def book(self, start):
+        """Занимает [start, start + slot).
+
+        Визит может быть не по сетке (назначен вручную) или пересекаться
+        с уже занятым временем (два визита мастера на одно время) — все
+        блоки, которые он задевает или которых касается, склеиваются в один.
+        """
+        end = start + self.slot
+        # блоки lo..hi-1: конец не раньше start и начало не позже end
+        lo = bisect_left(self.ends, start)
+        hi = bisect_right(self.starts, end)
+        if lo < hi:
+            start = min(start, self.starts[lo])
+            end = max(end, self.ends[hi - 1])
+        self.starts[lo:hi] = [start]
+        self.ends[lo:hi] = [end]
+
+    def align(self, moment):
+        """Ближайшее начало слота рабочего дня не раньше moment."""
+        moment = timezone.localtime(moment)
+        day_start = timezone.make_aware(
+            datetime.combine(moment.date(), self.work_start)
+        )
+        if moment <= day_start:
+            return day_start
+        steps = math.ceil((moment - day_start) / self.slot)
+        start = day_start + steps * self.slot
+        day_end = timezone.make_aware(datetime.combine(moment.date(), self.work_end))
+        if start + self.slot > day_end:
+            return timezone.make_aware(
+                datetime.combine(moment.date() + timedelta(days=1), self.work_start)
+            )
+        return start
+
+    def next_free(self, moment):
+        """Ближайший свободный слот не раньше moment.
+
+        Из занятого блока сразу переходим к его концу; блоки склеены,
+        так что прыжков не больше, чем блоков до найденного слота.
+        """
+        start = self.align(moment)
+        while True:
+            i = bisect_right(self.starts, start) - 1
+            if i >= 0 and self.ends[i] > start:
+                start = self.align(self.ends[i])
+            elif i + 1 < len(self.starts) and self.starts[i + 1] < start + self.slot:
+                # визит, назначенный вручную не по сетке
+                start = self.align(self.ends[i + 1])
+            else:
+                return start
+
+
+def load_schedules(master_ids, since):
+    """Расписания мастеров по уже назначенным открытым заявкам."""
+    slot, hours = _slot(), _work_hours()
+    schedules = {pk: MasterSchedule(slot, hours) for pk in master_ids}
+    booked = (
+        MasterRequest.objects.filter(
+            master_id__in=master_ids, scheduled_time__gte=since
+        )
+        .exclude(status__in=MasterRequest.CLOSED_STATUSES)
+        .order_by("scheduled_time")
+        .values_list("master_id", "scheduled_time")
+    )
+    for master_id, start in booked.iterator():
+        schedules[master_id].book(timezone.localtime(start))
+    return schedules
+
+
+def dispatch_pending(now=None, horizon_days=HORIZON_DAYS):
+    """Назначает новым заявкам мастера нужной роли и время визита.
+
+    Заявки обрабатываются по желаемому времени; каждой достаётся мастер,
+    у которого раньше всех свободен слот не раньше желаемого времени
+    (при равенстве — менее загруженный). Всё сохраняется одним bulk_update.
+    """
+    now = now or timezone.now()
+    horizon = now + timedelta(days=horizon_days)
+    stats = {"assigned": 0, "no_master": 0, "no_slot": 0}
+
+    with transaction.atomic():
+        pending = MasterRequest.objects.filter(
+            status=MasterRequest.STATUS_NEW, master__isnull=True
+        ).order_by("preferred_time", "id")
+        if connection.features.has_select_for_update_skip_locked:
+            # параллельный запуск не возьмёт те же заявки
+            pending = pending.select_for_update(skip_locked=True, of=("self",))
+        pending = list(
+            pending.only("id", "user_id", "master_type_id", "preferred_time")
+        )
+        if not pending:
+            return stats
+
+        masters_by_role = {}
+        masters = get_user_model().objects.filter(
+            role_id__in={r.master_type_id for r in pending}, is_active=True
+        )
+        for pk, role_id in masters.values_list("pk", "role_id"):
+            masters_by_role.setdefault(role_id, []).append(pk)
+        schedules = load_schedules(
+            [pk for ids in masters_by_role.values() for pk in ids], now
+        )
+
+        assigned = []
+        for request in pending:
+            candidates = masters_by_role.get(request.master_type_id)
+            if not candidates:
+                stats["no_master"] += 1
+                continue
+            earliest = max(request.preferred_time, now)
+            slot, _, master_id = min(
+                (schedules[pk].next_free(earliest), len(schedules[pk]), pk)
+                for pk in candidates
+            )
+            if slot >= horizon:
+                stats["no_slot"] += 1
+                continue
+            schedules[master_id].book(slot)
+            request.master_id = master_id
+            request.scheduled_time = slot
+            request.status = MasterRequest.STATUS_ASSIGNED
+            assigned.append(request)
+
+        MasterRequest.objects.bulk_update(
+            assigned, ["master", "scheduled_time", "status"], batch_size=500
+        )
+        # bulk_update не шлёт post_save — события публикуем сами,
+        # персоналу одним итогом на весь прогон
+        for request in assigned:
+            publish_request(request, staff=False)
+        if assigned:
+            events.publish(
+                [events.STAFF_CHANNEL],
+                "dispatch",
+                {
+                    "count": len(assigned),
+                    "text": f"Распределено заявок: {len(assigned)}",
+                },
+            )
+    stats["assigned"] = len(assigned)
+    return stats
@@ -0,0 +1,151 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router, transaction
+from django.db.models.signals import m2m_changed
+from django.utils import timezone
+
+from billing.debtors import debtor_flat_ids
+from core import background
+from core.models import Flat
+from support.models import Message
+
+# Рассылка сообщения: адресаты выбираются одним запросом, строки связи
+# recipients пишутся пачками bulk_create; большие рассылки уходят в фон,
+# прогресс лежит в кэше и отдаётся отправителю. Завершение отмечается
+# в Message.delivered_at; прерванную рассылку (перезапуск процесса)
+# продолжает resume_fanouts — уже записанные получатели пропускаются.
+CHUNK_SIZE = 1000
+PROGRESS_KEY = "support:fanout:{}"
+PROGRESS_TIMEOUT = 60 * 60 * 24
+
+
+def _background_threshold():
+    return getattr(settings, "MESSAGE_FANOUT_BACKGROUND", 500)
+
+
+def audience(message):
+    """id владельцев квартир, попадающих под адресацию сообщения."""
+    flats = Flat.objects.filter(floor__section__house=message.house_id)
+    if message.section_id:
+        flats = flats.filter(floor__section=message.section_id)
+    if message.floor_id:
+        flats = flats.filter(floor=message.floor_id)
+    if message.flat_id:
+        flats = flats.filter(pk=message.flat_id)
+    if message.only_debtors:
+        flats = flats.filter(
+            pk__in=debtor_flat_ids(
+                message.house_id, message.section_id, message.floor_id, message.flat_id
+            )
+        )
+    return flats.values_list("user_id", flat=True).distinct().order_by("user_id")
+
+
+def _set_progress(message_id, **state):
+    cache.set(PROGRESS_KEY.format(message_id), state, PROGRESS_TIMEOUT)
+
+
+def progress(message_id):
+    state = cache.get(PROGRESS_KEY.format(message_id))
+    if state is None:
+        # кэш мог потеряться — завершённую рассылку видно по сообщению
+        delivered = Message.objects.filter(
+            pk=message_id, delivered_at__isnull=False
+        ).exists()
+        if delivered:
+            done = Message.recipients.through.objects.filter(
+                message_id=message_id
+            ).count()
+            state = {"status": "done", "total": done, "done": done}
+    return state
+
+
+def _write_chunk(message, user_ids):
+    """Добавляет получателей пачки; возвращает число новых."""
+    Through = Message.recipients.through
+    with transaction.atomic():
+        # блокировка сообщения: параллельный запуск той же рассылки ждёт,
+        # и уведомление о каждом получателе уходит ровно один раз
+        Message.objects.select_for_update().filter(pk=message.pk).exists()
+        existing = set(
+            Through.objects.filter(
+                message_id=message.pk, user_id__in=user_ids
+            ).values_list("user_id", flat=True)
+        )
+        new_ids = [pk for pk in user_ids if pk not in existing]
+        if not new_ids:
+            return 0
+        Through.objects.bulk_create(
+            [Through(message_id=message.pk, user_id=pk) for pk in new_ids]
+        )
+        # bulk_create не шлёт m2m_changed — отправляем сами, чтобы сработали
+        # подписчики (сброс сводок кабинета, события SSE и т.п.)
+        m2m_changed.send(
+            sender=Through,
+            instance=message,
+            action="post_add",
+            reverse=False,
+            model=get_user_model(),
+            pk_set=set(new_ids),
+            using=router.db_for_write(Through),
+        )
+    return len(new_ids)
+
+
+def fan_out(message_id, total=None):
+    """Записывает получателей сообщения; возвращает число новых.
+
+    Повторный запуск продолжает прерванную рассылку: уже записанные
+    получатели не дублируются и уведомления им не повторяются.
+    """
+    message = Message.objects.get(pk=message_id)
+    if message.delivered_at is not None:
+        return 0
+    user_ids = audience(message)
+    if total is None:
+        total = user_ids.count()
+    done = added = 0
+    _set_progress(message_id, status="running", total=total, done=0)
+    try:
+        chunk = []
+        for user_id in user_ids.iterator(chunk_size=CHUNK_SIZE):
+            chunk.append(user_id)
+            if len(chunk) == CHUNK_SIZE:
+                added += _write_chunk(message, chunk)
+                done += len(chunk)
+                chunk = []
+                _set_progress(message_id, status="running", total=total, done=done)
+        if chunk:
+            added += _write_chunk(message, chunk)
+            done += len(chunk)
+        Message.objects.filter(pk=message_id).update(delivered_at=timezone.now())
+    except Exception:
+        _set_progress(message_id, status="failed", total=total, done=done)
+        raise
+    _set_progress(message_id, status="done", total=total, done=done)
+    return added
+
+
+def resume_pending():
+    """Продолжает незавершённые рассылки (после перезапуска); id сообщений."""
+    ids = list(
+        Message.objects.filter(delivered_at__isnull=True)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    for message_id in ids:
+        fan_out(message_id)
+    return ids
+
+
+def deliver(message):
+    """Рассылка сразу или в фоне — по размеру аудитории; возвращает прогресс."""
+    total = audience(message).count()
+    if total <= _background_threshold():
+        fan_out(message.pk, total)
+    else:
+        _set_progress(message.pk, status="queued", total=total, done=0)
+        # фоновый поток должен видеть уже закоммиченное сообщение
+        transaction.on_commit(lambda: background.submit(fan_out, message.pk, total))
+    return progress(message.pk)
@@ -0,0 +1,39 @@
+from django.core.cache import cache
+from django.utils import timezone
+
+from support.models import InboxItem
+
+# Счётчик непрочитанных хранится в кэше без срока: сбрасывается при доставке
+# (support.signals) и уменьшается при прочтении, считается по индексу
+# (user, read_at) только после сброса.
+UNREAD_KEY = "support:unread:{}"
+
+
+def unread_count(user_id):
+    key = UNREAD_KEY.format(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = InboxItem.objects.filter(user_id=user_id, read_at__isnull=True).count()
+        cache.set(key, count, None)
+    return count
+
+
+def invalidate(user_ids):
+    keys = [UNREAD_KEY.format(pk) for pk in set(user_ids)]
+    if keys:
+        cache.delete_many(keys)
+
+
+def mark_read(user_id, message_ids=None):
+    """Отмечает сообщения прочитанными (все — если message_ids не задан)."""
+    items = InboxItem.objects.filter(user_id=user_id, read_at__isnull=True)
+    if message_ids is not None:
+        items = items.filter(message_id__in=message_ids)
+    marked = items.update(read_at=timezone.now())
+    if marked:
+        try:
+            if cache.decr(UNREAD_KEY.format(user_id), marked) < 0:
+                invalidate([user_id])
+        except ValueError:
+            pass  # счётчика нет в кэше — посчитается при следующем обращении
+    return marked
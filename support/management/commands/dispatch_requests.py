@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from support import dispatch
+
+
+class Command(BaseCommand):
+    help = "Распределяет новые заявки по мастерам и свободным слотам"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--horizon",
+            type=int,
+            default=dispatch.HORIZON_DAYS,
+            help="На сколько дней вперёд искать слот",
+        )
+
+    def handle(self, *args, **options):
+        stats = dispatch.dispatch_pending(horizon_days=options["horizon"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Назначено заявок: {stats['assigned']}; "
+                f"нет мастера нужного типа: {stats['no_master']}; "
+                f"нет слота в горизонте: {stats['no_slot']}"
+            )
+        )
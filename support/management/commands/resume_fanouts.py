@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from support import fanout
+
+
+class Command(BaseCommand):
+    help = (
+        "Продолжает рассылки сообщений, прерванные перезапуском "
+        "(запускать после деплоя или по расписанию)"
+    )
+
+    def handle(self, *args, **options):
+        ids = fanout.resume_pending()
+        self.stdout.write(self.style.SUCCESS(f"Продолжено рассылок: {len(ids)}"))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_gallery_variants'),
+        ('support', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='message',
+            name='flat',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='core.flat'),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='floor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='core.floor'),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='section',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='core.section'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Автоматическая таблица Message.recipients становится явной моделью
+    # InboxItem: в БД таблица и её ограничения остаются как есть, добавляются
+    # только read_at и индекс (user, read_at).
+
+    dependencies = [
+        ("support", "0002_message_optional_target"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name="InboxItem",
+                    fields=[
+                        (
+                            "id",
+                            models.BigAutoField(
+                                auto_created=True,
+                                primary_key=True,
+                                serialize=False,
+                                verbose_name="ID",
+                            ),
+                        ),
+                        (
+                            "message",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                to="support.message",
+                            ),
+                        ),
+                        (
+                            "user",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                to=settings.AUTH_USER_MODEL,
+                            ),
+                        ),
+                    ],
+                    options={
+                        "db_table": "support_message_recipients",
+                        "unique_together": {("message", "user")},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name="message",
+                    name="recipients",
+                    field=models.ManyToManyField(
+                        through="support.InboxItem", to=settings.AUTH_USER_MODEL
+                    ),
+                ),
+            ],
+            database_operations=[],
+        ),
+        migrations.AddField(
+            model_name="inboxitem",
+            name="read_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="inboxitem",
+            index=models.Index(
+                fields=["user", "read_at"], name="support_inbox_user_read_idx"
+            ),
+        ),
+    ]
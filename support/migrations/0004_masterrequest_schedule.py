@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_gallery_variants'),
+        ('support', '0003_inboxitem'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='masterrequest',
+            name='scheduled_time',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='masterrequest',
+            name='master',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='master_requests', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='masterrequest',
+            index=models.Index(fields=['status', 'preferred_time'], name='masterrequest_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='masterrequest',
+            index=models.Index(fields=['master', 'scheduled_time'], name='masterrequest_master_slot_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:06
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_delivered(apps, schema_editor):
+    # прежние рассылки шли без отметки о завершении; считаем их завершёнными,
+    # иначе resume_fanouts разослал бы старые сообщения новым жильцам
+    Message = apps.get_model("support", "Message")
+    Message.objects.update(delivered_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0004_masterrequest_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='delivered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_delivered, migrations.RunPython.noop),
+    ]
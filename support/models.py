@@ -6,15 +6,56 @@ class Message(models.Model):
     Subject = models.CharField(max_length=255)
     Body = models.TextField()
     created_at = models.DateTimeField()
-    recipients = models.ManyToManyField(settings.AUTH_USER_MODEL)
+    recipients = models.ManyToManyField(
+        settings.AUTH_USER_MODEL, through="support.InboxItem"
+    )
+    # адресаты: весь дом или уточнение до секции / этажа / квартиры
     house = models.ForeignKey("core.House", on_delete=models.PROTECT)
-    section = models.ForeignKey("core.Section", on_delete=models.PROTECT)
-    floor = models.ForeignKey("core.Floor", on_delete=models.PROTECT)
-    flat = models.ForeignKey("core.Flat", on_delete=models.PROTECT)
+    section = models.ForeignKey(
+        "core.Section", on_delete=models.PROTECT, null=True, blank=True
+    )
+    floor = models.ForeignKey(
+        "core.Floor", on_delete=models.PROTECT, null=True, blank=True
+    )
+    flat = models.ForeignKey(
+        "core.Flat", on_delete=models.PROTECT, null=True, blank=True
+    )
     only_debtors = models.BooleanField()
+    # рассылка получателям завершена (support.fanout); пока пусто — её
+    # можно продолжить командой resume_fanouts
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+
+class InboxItem(models.Model):
+    # Входящие жителя: строка связи Message.recipients с отметкой о прочтении.
+    # Таблица — прежняя автоматическая таблица M2M.
+    message = models.ForeignKey(Message, on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "support_message_recipients"
+        unique_together = [("message", "user")]
+        indexes = [
+            models.Index(fields=["user", "read_at"], name="support_inbox_user_read_idx")
+        ]
 
 
 class MasterRequest(models.Model):
+    STATUS_NEW = "new"
+    STATUS_ASSIGNED = "assigned"  # назначен мастер и время (support.dispatch)
+    STATUS_IN_PROGRESS = "in_progress"
+    STATUS_DONE = "done"
+    STATUS_CANCELLED = "cancelled"
+    CLOSED_STATUSES = (STATUS_DONE, STATUS_CANCELLED)
+    STATUS_LABELS = {
+        STATUS_NEW: "новая",
+        STATUS_ASSIGNED: "назначен мастер",
+        STATUS_IN_PROGRESS: "в работе",
+        STATUS_DONE: "выполнена",
+        STATUS_CANCELLED: "отменена",
+    }
+
     flat = models.ForeignKey("core.Flat", on_delete=models.PROTECT)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT)
     master_type = models.ForeignKey("core.Role", on_delete=models.PROTECT)
@@ -26,4 +67,20 @@ class MasterRequest(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.PROTECT,
         related_name="master_requests",
-    )  # staff
+        null=True,
+        blank=True,
+    )  # staff; пусто, пока заявку не распределили
+    scheduled_time = models.DateTimeField(null=True, blank=True)  # начало визита
+
+    class Meta:
+        indexes = [
+            # очередь нераспределённых заявок
+            models.Index(
+                fields=["status", "preferred_time"], name="masterrequest_queue_idx"
+            ),
+            # занятые слоты мастера
+            models.Index(
+                fields=["master", "scheduled_time"],
+                name="masterrequest_master_slot_idx",
+            ),
+        ]
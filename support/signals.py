@@ -0,0 +1,82 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from core import events
+from support import inbox
+from support.models import MasterRequest, Message
+
+
+def _invalidate_on_commit(user_ids):
+    user_ids = set(user_ids)
+    if user_ids:
+        transaction.on_commit(lambda: inbox.invalidate(user_ids))
+
+
+# ---------- Счётчики непрочитанных: доставка и удаление сообщений
+@receiver(m2m_changed, sender=Message.recipients.through)
+def recipients_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":
+        if reverse:
+            _invalidate_on_commit([instance.pk])
+        else:
+            _invalidate_on_commit(instance.recipients.values_list("pk", flat=True))
+    elif action in ("post_add", "post_remove"):
+        _invalidate_on_commit([instance.pk] if reverse else pk_set or ())
+    if action == "post_add" and pk_set:
+        if reverse:
+            events.publish(
+                [events.user_channel(instance.pk)],
+                "message",
+                {"count": len(pk_set), "text": "Новое сообщение"},
+            )
+        else:
+            events.publish(
+                map(events.user_channel, pk_set),
+                "message",
+                {"id": instance.pk, "count": 1, "text": instance.Subject},
+            )
+
+
+@receiver(pre_delete, sender=Message)
+def message_deleted(sender, instance, **kwargs):
+    _invalidate_on_commit(instance.recipients.values_list("pk", flat=True))
+
+
+# ---------- События SSE: смена статуса заявки мастеру
+def publish_request(request, staff=True):
+    """Статус заявки — жителю, мастеру и (если staff) общему каналу персонала."""
+    channels = [events.user_channel(request.user_id)]
+    if request.master_id:
+        channels.append(events.user_channel(request.master_id))
+    if staff:
+        channels.append(events.STAFF_CHANNEL)
+    label = MasterRequest.STATUS_LABELS.get(request.status, request.status)
+    events.publish(
+        channels,
+        "request",
+        {
+            "id": request.pk,
+            "status": request.status,
+            "scheduled_time": request.scheduled_time,
+            "text": f"Заявка №{request.pk}: {label}",
+        },
+    )
+
+
+@receiver(pre_save, sender=MasterRequest)
+def remember_request_status(sender, instance, **kwargs):
+    instance._status_old = None
+    if instance.pk and not instance._state.adding:
+        instance._status_old = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list("status", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=MasterRequest)
+def request_status_changed(sender, instance, created, raw=False, **kwargs):
+    if raw or (not created and instance._status_old == instance.status):
+        return
+    publish_request(instance)
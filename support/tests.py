@@ -1 +1,311 @@
-# Create your tests here.
+from datetime import datetime, time, timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from billing.models import Tariff
+from core.models import Flat, Floor, House, Section, User
+from support import fanout, inbox
+from support.context_processors import unread_messages
+from support.dispatch import MasterSchedule
+from support.models import InboxItem, Message
+
+SLOT = timedelta(hours=1)
+HOURS = (time(9), time(18))
+
+
+def at(day, hour, minute=0):
+    return timezone.make_aware(datetime(2025, 3, day, hour, minute))
+
+
+class MasterScheduleTests(SimpleTestCase):
+    def setUp(self):
+        self.schedule = MasterSchedule(SLOT, HOURS)
+
+    def blocks(self):
+        return list(zip(self.schedule.starts, self.schedule.ends))
+
+    # ---------- book
+    def test_book_separate_slots(self):
+        self.schedule.book(at(3, 14))
+        self.schedule.book(at(3, 10))
+        self.assertEqual(
+            self.blocks(), [(at(3, 10), at(3, 11)), (at(3, 14), at(3, 15))]
+        )
+
+    def test_book_merges_adjacent_slots(self):
+        self.schedule.book(at(3, 10))
+        self.schedule.book(at(3, 11))  # к левому блоку
+        self.schedule.book(at(3, 9))  # к правому блоку
+        self.assertEqual(self.blocks(), [(at(3, 9), at(3, 12))])
+
+    def test_book_fills_gap_between_blocks(self):
+        self.schedule.book(at(3, 9))
+        self.schedule.book(at(3, 11))
+        self.schedule.book(at(3, 10))
+        self.assertEqual(self.blocks(), [(at(3, 9), at(3, 12))])
+        self.assertEqual(len(self.schedule), 1)
+
+    def test_book_same_slot_twice(self):
+        self.schedule.book(at(3, 10))
+        self.schedule.book(at(3, 10))
+        self.assertEqual(self.blocks(), [(at(3, 10), at(3, 11))])
+
+    def test_book_nested_in_block(self):
+        for hour in (9, 10, 11):
+            self.schedule.book(at(3, hour))
+        self.schedule.book(at(3, 10))
+        self.schedule.book(at(3, 9, 30))
+        self.assertEqual(self.blocks(), [(at(3, 9), at(3, 12))])
+
+    def test_book_off_grid_overlapping_block(self):
+        self.schedule.book(at(3, 10, 30))
+        self.schedule.book(at(3, 10))  # задевает блок слева
+        self.schedule.book(at(3, 11))  # задевает блок справа
+        self.assertEqual(self.blocks(), [(at(3, 10), at(3, 12))])
+
+    def test_book_off_grid_bridges_blocks(self):
+        self.schedule.book(at(3, 9))
+        self.schedule.book(at(3, 10, 45))
+        self.schedule.book(at(3, 14))
+        self.schedule.book(at(3, 10))  # касается первого блока, задевает второй
+        self.assertEqual(
+            self.blocks(), [(at(3, 9), at(3, 11, 45)), (at(3, 14), at(3, 15))]
+        )
+
+    def test_book_swallows_several_blocks(self):
+        schedule = MasterSchedule(timedelta(hours=3), HOURS)
+        schedule.book(at(3, 9))
+        schedule.book(at(3, 12, 30))
+        schedule.book(at(3, 10))  # внутри первого и второго блоков
+        self.assertEqual(
+            list(zip(schedule.starts, schedule.ends)), [(at(3, 9), at(3, 15, 30))]
+        )
+
+    # ---------- next_free
+    def test_next_free_empty_schedule_aligns_to_grid(self):
+        self.assertEqual(self.schedule.next_free(at(3, 7)), at(3, 9))
+        self.assertEqual(self.schedule.next_free(at(3, 10, 20)), at(3, 11))
+
+    def test_next_free_after_working_day_moves_to_next_morning(self):
+        self.assertEqual(self.schedule.next_free(at(3, 17, 30)), at(4, 9))
+
+    def test_next_free_skips_busy_block(self):
+        for hour in (9, 10, 11):
+            self.schedule.book(at(3, hour))
+        self.assertEqual(self.schedule.next_free(at(3, 9)), at(3, 12))
+        self.assertEqual(self.schedule.next_free(at(3, 13)), at(3, 13))
+
+    def test_next_free_skips_off_grid_visit(self):
+        # визит назначен вручную на 10:30 — слоты 10:00 и 11:00 пересекаются с ним
+        self.schedule.book(at(3, 10, 30))
+        self.assertEqual(self.schedule.next_free(at(3, 10)), at(3, 12))
+
+    def test_next_free_after_overlapping_visits(self):
+        self.schedule.book(at(3, 10))
+        self.schedule.book(at(3, 10, 30))
+        self.schedule.book(at(3, 10))
+        self.assertEqual(self.schedule.next_free(at(3, 10)), at(3, 12))
+        self.assertEqual(self.schedule.next_free(at(3, 9)), at(3, 9))
+
+    def test_next_free_busy_until_end_of_day(self):
+        for hour in range(9, 18):
+            self.schedule.book(at(3, hour))
+        self.assertEqual(self.schedule.next_free(at(3, 9)), at(4, 9))
+
+
+# ---------- Рассылка сообщений
+class FanOutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tariff = Tariff.objects.create(
+            tariff_name="Базовый", tariff_description="", last_date=timezone.now()
+        )
+        cls.house = House.objects.create(house_name="Дом", address="ул. 1")
+        section = Section.objects.create(house=cls.house, section_name="1")
+        floor = Floor.objects.create(section=section, number=1)
+        cls.users = []
+        for number in range(1, 6):
+            user = User.objects.create(username=f"owner{number}")
+            Flat.objects.create(
+                number_flat=number, square=50, floor=floor, user=user, tariff=tariff
+            )
+            cls.users.append(user)
+
+    def setUp(self):
+        self.message = Message.objects.create(
+            Subject="Вода",
+            Body="Отключение воды",
+            created_at=timezone.now(),
+            house=self.house,
+            only_debtors=False,
+        )
+        cache.delete(fanout.PROGRESS_KEY.format(self.message.pk))
+        self.notified = []
+
+        def receiver(sender, action, pk_set, **kwargs):
+            if action == "post_add":
+                self.notified.extend(pk_set)
+
+        m2m_changed.connect(receiver, sender=Message.recipients.through)
+        self.addCleanup(
+            m2m_changed.disconnect, receiver, sender=Message.recipients.through
+        )
+
+    def recipients(self):
+        return sorted(self.message.recipients.values_list("pk", flat=True))
+
+    def test_delivers_once_and_marks_completion(self):
+        self.assertEqual(fanout.fan_out(self.message.pk), 5)
+        self.message.refresh_from_db()
+        self.assertIsNotNone(self.message.delivered_at)
+        self.assertEqual(self.recipients(), [u.pk for u in self.users])
+
+        self.assertEqual(fanout.fan_out(self.message.pk), 0)
+        self.assertEqual(sorted(self.notified), [u.pk for u in self.users])
+
+    @mock.patch.object(fanout, "CHUNK_SIZE", 2)
+    def test_interrupted_fan_out_resumes_without_resending(self):
+        write_chunk = fanout._write_chunk
+        calls = []
+
+        def crash_on_second_chunk(message, user_ids):
+            calls.append(user_ids)
+            if len(calls) == 2:
+                raise RuntimeError("процесс остановлен")
+            return write_chunk(message, user_ids)
+
+        with (
+            mock.patch.object(fanout, "_write_chunk", crash_on_second_chunk),
+            self.assertRaises(RuntimeError),
+        ):
+            fanout.fan_out(self.message.pk)
+        self.assertEqual(fanout.progress(self.message.pk)["status"], "failed")
+        self.assertEqual(len(self.recipients()), 2)
+
+        self.assertEqual(fanout.resume_pending(), [self.message.pk])
+        self.assertEqual(self.recipients(), [u.pk for u in self.users])
+        # каждый житель получил уведомление ровно один раз
+        self.assertEqual(sorted(self.notified), [u.pk for u in self.users])
+        self.assertEqual(fanout.resume_pending(), [])
+
+    def test_progress_survives_lost_cache(self):
+        fanout.fan_out(self.message.pk)
+        cache.delete(fanout.PROGRESS_KEY.format(self.message.pk))
+        self.assertEqual(
+            fanout.progress(self.message.pk), {"status": "done", "total": 5, "done": 5}
+        )
+
+
+# ---------- Счётчик непрочитанных
+class UnreadCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.house = House.objects.create(house_name="Дом", address="ул. 1")
+        cls.user = User.objects.create(username="owner")
+        cls.other = User.objects.create(username="neighbour")
+
+    def setUp(self):
+        inbox.invalidate([self.user.pk, self.other.pk])
+
+    def send(self, *users):
+        message = Message.objects.create(
+            Subject="Вода",
+            Body="Отключение воды",
+            created_at=timezone.now(),
+            house=self.house,
+            only_debtors=False,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            message.recipients.add(*(users or [self.user]))
+        return message
+
+    def cached(self, user=None):
+        return cache.get(inbox.UNREAD_KEY.format((user or self.user).pk))
+
+    def test_count_is_cached(self):
+        self.send()
+        self.send()
+        self.assertEqual(inbox.unread_count(self.user.pk), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(inbox.unread_count(self.user.pk), 2)
+
+    def test_delivery_resets_counter_of_recipients_only(self):
+        self.send()
+        self.assertEqual(inbox.unread_count(self.user.pk), 1)
+        self.assertEqual(inbox.unread_count(self.other.pk), 0)
+
+        self.send(self.user)
+        self.assertIsNone(self.cached())
+        self.assertEqual(self.cached(self.other), 0)
+        self.assertEqual(inbox.unread_count(self.user.pk), 2)
+
+    def test_mark_read_decrements_without_recount(self):
+        first = self.send()
+        self.send()
+        inbox.unread_count(self.user.pk)
+
+        self.assertEqual(inbox.mark_read(self.user.pk, [first.pk]), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(inbox.unread_count(self.user.pk), 1)
+        # повторное прочтение ничего не меняет
+        self.assertEqual(inbox.mark_read(self.user.pk, [first.pk]), 0)
+        self.assertEqual(inbox.mark_read(self.user.pk), 1)
+        self.assertEqual(inbox.unread_count(self.user.pk), 0)
+
+    def test_mark_read_without_cached_counter(self):
+        self.send()
+        self.assertEqual(inbox.mark_read(self.user.pk), 1)
+        self.assertIsNone(self.cached())
+        self.assertEqual(inbox.unread_count(self.user.pk), 0)
+
+    def test_stale_counter_below_zero_is_dropped(self):
+        self.send()
+        self.send()
+        cache.set(inbox.UNREAD_KEY.format(self.user.pk), 1, None)
+        inbox.mark_read(self.user.pk)
+        self.assertIsNone(self.cached())
+        self.assertEqual(inbox.unread_count(self.user.pk), 0)
+
+    def test_deleting_message_resets_counter(self):
+        message = self.send(self.user, self.other)
+        self.assertEqual(inbox.unread_count(self.user.pk), 1)
+        self.assertEqual(inbox.unread_count(self.other.pk), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            message.delete()
+        self.assertEqual(inbox.unread_count(self.user.pk), 0)
+        self.assertEqual(inbox.unread_count(self.other.pk), 0)
+
+    def test_removing_recipient_resets_counter(self):
+        message = self.send(self.user, self.other)
+        inbox.unread_count(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            message.recipients.remove(self.user)
+        self.assertEqual(inbox.unread_count(self.user.pk), 0)
+
+    def test_opening_message_marks_it_read(self):
+        message = self.send()
+        self.send()
+        self.client.force_login(self.user)
+        self.assertEqual(inbox.unread_count(self.user.pk), 2)
+
+        url = reverse("cabinet:message_detail", args=[message.pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.cached(), 1)
+        self.assertIsNotNone(
+            InboxItem.objects.get(user=self.user, message=message).read_at
+        )
+
+        self.client.post(reverse("cabinet:messages_mark_read"))
+        self.assertEqual(self.cached(), 0)
+
+    def test_badge_is_not_counted_unless_rendered(self):
+        request = mock.Mock(user=self.user)
+        with self.assertNumQueries(0):
+            context = unread_messages(request)
+        self.send()
+        self.assertEqual(context["unread_messages_count"](), 1)